@@ -0,0 +1,144 @@
+"""Compare the memory used by PersonF1 against the old dict-based layout
+
+Builds the same synthetic people (from rows shaped like normal.db's
+fetched_* tables, so nothing is requested from F1) with both layouts and
+reports what tracemalloc saw for each.
+
+    python benchmarks/person_memory.py --people 50000
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import sys
+import tracemalloc
+
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.fellowshipone import PersonF1  # noqa: E402
+
+logging.SUCCESS = 25
+logger = logging.getLogger()
+setattr(logger, 'success', lambda message, *args: logger._log(logging.SUCCESS, message, args))
+
+FIRST_NAMES = ['james', 'mary', 'john', 'patricia', 'robert', 'jennifer', 'michael', 'linda', 'maria', 'jose']
+LAST_NAMES = ['smith', 'johnson', 'williams', 'garcia', 'rodriguez', 'martinez', 'lee', 'perez', 'kim', 'nguyen']
+STREETS = ['Main St', 'Broadway', 'Knickerbocker Ave', 'Myrtle Ave', 'Cypress Ave', 'Wyckoff Ave']
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-n", "--people", dest="people", type=int, default=50000)
+parser.add_argument("--seed", dest="seed", type=int, default=0)
+
+
+class NullExporter:
+    def write(self, dataset, row):
+        pass
+
+
+class LegacyPersonF1:
+    """PersonF1 as it was: an instance __dict__ and a dict for each contact"""
+    def __init__(self, person, details, communications, addresses):
+        self.error = False
+        self.id = person['id']
+        self.household_id = person['household_id']
+        self.local = True
+
+        self.first_name = details["firstName"].capitalize()
+        self.middle_name = (details["middleName"] or '').capitalize()
+        self.last_name = details["lastName"].capitalize()
+        self.goes_by_name = (details["goesByName"] or '').capitalize()
+        self.gender = details["gender"]
+        self.dob = details["dateOfBirth"]
+        self.status = details["status"]
+        self.marital_status = details["maritalStatus"]
+        self.last_updated = datetime.strptime(details["lastUpdatedDate"], '%Y-%m-%dT%H:%M:%S')
+
+        self.emails = []
+        self.phones = []
+        for communication in communications:
+            if communication["communicationGeneralType"] == "Telephone":
+                self.phones.append({"number": communication["communicationValue"], "type": communication["communicationType"]})
+            else:
+                self.emails.append({"email": communication["communicationValue"], "type": communication["communicationType"]})
+
+        self.addresses = []
+        for address in addresses:
+            self.addresses.append({
+                "address1": address["address1"] or '',
+                "address2": address["address2"] or '',
+                "city": address["city"] or '',
+                "zip": address["postalCode"] or '',
+                "state": address["stProvince"] or '',
+            })
+
+
+def synthetic_rows(count, seed):
+    """Rows for count people, shaped like iter_people's output"""
+    rand = random.Random(seed)
+    for person_id in range(1, count + 1):
+        first_name = rand.choice(FIRST_NAMES)
+        last_name = rand.choice(LAST_NAMES)
+        person = {'id': str(person_id), 'household_id': str(person_id // 3 + 1)}
+        details = {
+            "firstName": first_name,
+            "middleName": '',
+            "lastName": last_name,
+            "goesByName": '',
+            "gender": rand.choice(['Male', 'Female']),
+            "dateOfBirth": f"{rand.randint(1930, 2015)}-{rand.randint(1, 12):02}-{rand.randint(1, 28):02}T00:00:00",
+            "status": rand.choice(['CTG', 'CTB', 'Member']),
+            "maritalStatus": rand.choice(['Married', 'Single', None]),
+            "lastUpdatedDate": "2019-06-01T12:00:00",
+        }
+
+        communications = [
+            {"communicationGeneralType": "Telephone", "communicationValue": f"(718) {rand.randint(200, 999)}-{rand.randint(0, 9999):04}",
+             "communicationType": "Mobile Phone"},
+            {"communicationGeneralType": "Telephone", "communicationValue": f"718-{rand.randint(200, 999)}-{rand.randint(0, 9999):04}",
+             "communicationType": "Home Phone"},
+            {"communicationGeneralType": "Email", "communicationValue": f"{first_name}.{last_name}{person_id}@Example.com",
+             "communicationType": "Email"},
+        ]
+        addresses = [
+            {"address1": f"{rand.randint(1, 2000)} {rand.choice(STREETS)}", "address2": rand.choice(['', 'Apt 2']),
+             "address3": None, "city": "Brooklyn", "postalCode": "11237", "stProvince": "NY"},
+        ]
+        yield person, details, communications, addresses
+
+
+def measure(build, rows):
+    """Peak and retained bytes while building every person"""
+    gc.collect()
+    tracemalloc.start()
+    people = [build(row) for row in rows]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del people
+    return current, peak
+
+
+def main():
+    args = parser.parse_args()
+    logger.setLevel(logging.ERROR)
+
+    # Build the rows up front so only the people themselves are measured
+    rows = list(synthetic_rows(args.people, args.seed))
+    exporter = NullExporter()
+
+    layouts = [
+        ('dict-based', lambda row: LegacyPersonF1(*row)),
+        ('slotted', lambda row: PersonF1(row[0], exporter, True, *row[1:])),
+    ]
+
+    print(f"{args.people} people")
+    for name, build in layouts:
+        current, peak = measure(build, rows)
+        print(f"{name:>12}: {current / 2 ** 20:8.1f} MiB retained, {peak / 2 ** 20:8.1f} MiB peak, "
+              f"{current / args.people:6.0f} bytes/person")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,28 @@
 #!/usr/local/bin/python3
 import argparse
-import csv
+import collections
 import datetime
 import enlighten
+import functools
 import logging
+import signal
 import sys
-import sqlite3
+import threading
+import utils.database as database
+import utils.f1_search as f1_search
+import utils.names as names
 import utils.pco as pco
-
-from sqlite3 import Error
-from utils.fellowshipone import PersonF1
+import utils.transport as transport
+
+from concurrent.futures import ThreadPoolExecutor
+from utils.cache import ResponseCache
+from utils.duplicates import DuplicateIndex, person_keys
+from utils.export import FORMATS, Exporter
+from utils.fellowshipone import PersonF1, f1
+from utils.geocoder import CensusBackend, GazetteerBackend, Geocoder
+from utils.journal import Journal
+from utils.metrics import metrics
+from utils.plan import PlanWriter, read_plan
 from utils.rainbow_logger import RainbowLoggingHandler
 
 
@@ -19,9 +32,54 @@ parser.add_argument("-l", dest="local", action="store_true")
 parser.add_argument("-s", dest="start", type=int, default=0)
 parser.add_argument("-e", dest="end", type=int, default=-1)
 parser.add_argument("-i", "--ids", nargs="+", dest="ids")
+parser.add_argument("-w", "--workers", dest="workers", type=int, default=8,
+                    help="Number of people fetched from F1 at the same time")
+parser.add_argument("-p", "--senders", dest="senders", type=int, default=4,
+                    help="Number of people sent to PCO at the same time")
+parser.add_argument("--dedupe", dest="dedupe", choices=["index", "window"], default="index",
+                    help="Check duplicates against everyone on normalized details (index), or only nearby "
+                         "people exactly as the original windowed check did (window)")
+parser.add_argument("--bulk-fetch", dest="bulk_fetch", action="store_true",
+                    help="Fill normal.db with F1's People Search, 100 people a request, then run locally (implies -l)")
+parser.add_argument("--bulk-since", dest="bulk_since", metavar="YYYY-MM-DD",
+                    help="With --bulk-fetch, also refresh everyone F1 says was updated since this date")
+parser.add_argument("--prefetch-pco", dest="prefetch_pco", action="store_true",
+                    help="Download every PCO person up front instead of searching for each one")
+parser.add_argument("--cache", dest="cache", default="data_files/f1_cache.db",
+                    help="SQLite file used to cache F1 responses")
+parser.add_argument("--no-cache", dest="no_cache", action="store_true",
+                    help="Always go to F1 and don't store responses")
+parser.add_argument("--refresh-cache", dest="refresh_cache", action="store_true",
+                    help="Ignore cached F1 responses but store the new ones")
+parser.add_argument("--invalidate-cache", dest="invalidate_cache", action="append", default=[],
+                    metavar="ENDPOINT", help="Drop cached F1 responses starting with ENDPOINT (e.g. /v1/People/123)")
+parser.add_argument("--geocode-cache", dest="geocode_cache", default="data_files/geocode_cache.db",
+                    help="SQLite file used to cache geocoded addresses")
+parser.add_argument("--gazetteer", dest="gazetteer",
+                    help="Geocode offline from a CSV/SQLite gazetteer instead of the Census geocoder")
+parser.add_argument("--name-rules", dest="name_rules",
+                    help="JSON file of the rules used to reject bad names")
+parser.add_argument("-r", "--resume", dest="resume", action="store_true",
+                    help="Skip people the journal says are done and retry the rest")
+parser.add_argument("--plan", dest="plan", metavar="FILE",
+                    help="Write what would change in PCO to FILE instead of sending anything (implies --prefetch-pco)")
+parser.add_argument("--apply", dest="apply", metavar="FILE",
+                    help="Make the changes in a plan written by --plan without reading from F1 or PCO")
+parser.add_argument("--metrics", dest="metrics", default="out_files/metrics.json",
+                    help="Where to write request counts and latencies at exit (.prom/.txt for Prometheus text, JSON otherwise)")
+parser.add_argument("--export-format", dest="export_formats", nargs="+", choices=FORMATS, default=["csv"],
+                    help="Formats the out_files datasets are written in (Parquet needs pyarrow)")
+parser.add_argument("-q", "--queue-depth", dest="queue_depth", type=int, default=100,
+                    help="Maximum number of people waiting between stages")
+
+# How many people on either side of a person are checked for duplicates
+DUPLICATE_WINDOW = 20
 
 logger = logging.getLogger()
 
+# Counters are updated from the sender threads as well as the main thread
+counter_lock = threading.Lock()
+
 
 def main():
     args = parser.parse_args()
@@ -49,200 +107,412 @@ def main():
     file_handler.setFormatter(formatter)
     logger.addHandler(file_handler)
 
-    # Create an output file for each type of data
-    people_csv = open('out_files/people.csv', mode='w')
-    people_csv_writer = csv.writer(people_csv, delimiter=',')
-    contacts_csv = open('out_files/contacts.csv', mode='w')
-    contacts_csv_writer = csv.writer(contacts_csv, delimiter=',')
-    addresses_csv = open('out_files/addresses.csv', mode='w')
-    addresses_csv_writer = csv.writer(addresses_csv, delimiter=',')
-    attributes_csv = open('out_files/attributes.csv', mode='w')
-    attributes_csv_writer = csv.writer(attributes_csv, delimiter=',')
+    # Buffer exported rows and write them out in blocks. Resumed runs and
+    #   applied plans add to the exports of the run before them
+    exporter = Exporter('out_files', args.export_formats, append=args.resume or bool(args.apply))
+
+    # Stop on SIGTERM the way Ctrl-C stops, so buffered rows and the journal are written
+    signal.signal(signal.SIGTERM, stop)
+
+    # Cache F1 responses between runs
+    if not args.no_cache:
+        f1.cache = ResponseCache(args.cache, refresh=args.refresh_cache)
+        for endpoint in args.invalidate_cache:
+            f1.cache.invalidate(endpoint)
+
+    # Keep a connection open to each API for every thread that talks to it
+    transport.configure(args.workers + args.senders)
+
+    # Geocode each distinct address once, online or from a local gazetteer
+    backend = GazetteerBackend(args.gazetteer) if args.gazetteer else CensusBackend()
+    pco.geocoder = Geocoder(backend, args.geocode_cache)
 
-    csv_writers = [people_csv_writer, contacts_csv_writer, addresses_csv_writer, attributes_csv_writer]
+    # Plans are made against a local copy of PCO
+    if args.plan:
+        args.prefetch_pco = True
 
+    # Swap in any custom bad name rules
+    if args.name_rules:
+        names.validator = names.NameValidator.from_file(args.name_rules)
+
+    # Track each person's progress so the run can be resumed
+    journal = Journal("data_files/normal.db")
+
+    conn = None
+    people_f1 = None
+    metrics_stop = threading.Event()
     try:
         # Connect to the database
-        conn = create_connection("data_files/normal.db")
-        conn.row_factory = dict_factory
-
-        # Query the DB
-        logger.info("Pulling data from database")
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM people")
-        people = cursor.fetchall()
-
-        # Gather details
-        cursor.execute("SELECT * FROM fetched_people")
-        fetched_people_details = cursor.fetchall()
-
-        # Organize person details and prep address / communication dictionaries
-        fetched_people = {}
-        fetched_communications = {}
-        fetched_addresses = {}
-        for person in fetched_people_details:
-            fetched_people[person['id']] = person
-            fetched_communications[person['id']] = []
-            fetched_addresses[person['id']] = []
-        fetched_people = None if not args.local else fetched_people
-
-        # Gather communications
-        cursor.execute("SELECT * FROM fetched_communications")
-        fetched_communications_details = cursor.fetchall()
-
-        # Organize communications
-        for comm in fetched_communications_details:
-            fetched_communications[comm['person_id']].append(comm)
-        fetched_communications = None if not args.local else fetched_communications
-
-        # Gather addresses
-        cursor.execute("SELECT * FROM fetched_addresses")
-        fetched_addresses_details = cursor.fetchall()
-
-        # Organize addresses
-        for addr in fetched_addresses_details:
-            fetched_addresses[addr['person_id']].append(addr)
-        fetched_addresses = None if not args.local else fetched_addresses
+        conn = database.create_connection("data_files/normal.db")
+        if args.bulk_fetch:
+            database.ensure_fetched_tables(conn)
+        database.ensure_indexes(conn)
 
         # Gather Mapping for Attributes
-        cursor.execute("SELECT * FROM field_mapping")
-        field_mappings = cursor.fetchall()
+        field_mappings = database.field_mappings(conn)
 
         # Organize Mappings
         attributes_to_fields = {}
         for field in field_mappings:
             attributes_to_fields[field['f1_id']] = field
 
-        start_index = args.start
-        end_index = args.end if args.end >= 0 else len(people)
+        # Make sure every mapping points at a real PCO field definition
+        missing_fields = pco.load_field_definitions(field_mappings)
+        for field in missing_fields:
+            logger.error(f"F1 attribute {field['f1_id']} maps to PCO field definition {field['pco_id']}, which doesn't exist")
+        if missing_fields:
+            return
 
-        counter_total = end_index - start_index
-        if len(args.ids) > 0:
-            counter_total = len(args.ids)
+        # Count the people in the requested range (and IDs)
+        counter_total = database.count_people(conn, args.start, args.end, args.ids)
 
-        # Setup Progress bar
+        # Setup progress bars
         manager = enlighten.get_manager()
+        metrics_bar = manager.status_bar(metrics.status_line())
+        threading.Thread(target=show_metrics, args=(metrics_bar, metrics_stop), daemon=True).start()
         get_progress = manager.counter(total=counter_total, desc='Getting from F1', unit='people', color="yellow")
+        send_progress = manager.counter(total=counter_total, desc='Planning' if args.plan else 'Sending to PCO', unit='people', color="red")
+        # Setup counters for metrics
+        counters = {
+            'valid': manager.counter(desc='|- Valid Profiles -----', unit='people'),
+            'created': manager.counter(desc='|--- Created Profiles -', unit='people'),
+            'updated': manager.counter(desc='|--- Updated Profiles -', unit='people'),
+            'dups': manager.counter(desc='|- Duplicates ---------', unit='people'),
+            'names': manager.counter(desc='|- Bad Names ----------', unit='people'),
+            'empty': manager.counter(desc='|- Empty Profiles -----', unit='people'),
+            'error': manager.counter(desc='|- Errors -------------', unit='people'),
+        }
+        # Why each bad name was rejected
+        bad_names = collections.Counter()
+
+        # Search F1 for everyone who hasn't been fetched yet, then read them locally
+        if args.bulk_fetch:
+            unfetched = database.unfetched_ids(conn, args.start, args.end, args.ids)
+            logger.info(f"Searching FellowshipOne for {len(unfetched)} people")
+            search_progress = manager.counter(total=len(unfetched), desc='Searching F1', unit='people', color="green")
+            fetched = f1_search.fetch_people(f1, conn, unfetched, args.workers, progress=search_progress)
+            if args.bulk_since:
+                refresh_progress = manager.counter(desc='Refreshing F1', unit='people', color="green")
+                fetched += f1_search.fetch_updated(f1, conn, args.bulk_since, progress=refresh_progress)
+            logger.success(f"Stored {fetched} people from FellowshipOne's People Search")
+
+            # Anyone search didn't return is fetched from F1 one at a time
+            missing = database.unfetched_ids(conn, args.start, args.end, args.ids)
+            if missing:
+                logger.warning(f"People Search didn't return {len(missing)} people; they'll be fetched one at a time")
+            args.local = True
+
+        # Page PCO People down once so find_person doesn't have to search
+        if args.prefetch_pco:
+            prefetch_progress = manager.counter(desc='Prefetching PCO', unit='people', color="blue")
+            pco.prefetch_people(prefetch_progress)
+
+        # Skip people who were finished by an earlier run
+        finished = journal.finished() if args.resume else set()
+        if finished:
+            logger.info(f"Resuming - skipping {len(finished)} people who are already done")
+
+        # People who reached PCO last time are picked up by id rather than searched for again
+        pco_ids = journal.pco_ids() if args.resume else {}
+
+        # Make the changes in a saved plan instead of reading from F1
+        if args.apply:
+            apply_plans(args.apply, finished, args.senders, args.queue_depth, counters, journal, send_progress)
+            return
+
+        # Plans are written instead of sending anyone
+        plan_writer = PlanWriter(args.plan) if args.plan else None
+
+        # Stream the requested people (and anything already fetched from F1)
+        logger.info("Pulling data from database")
+        selected_people = (row for row in database.iter_people(conn, args.start, args.end, args.ids, args.local)
+                           if int(row[0]['id']) not in finished)
+
+        # Stage 1 - Objectify each person using a pool of F1 workers
+        fetch = functools.partial(fetch_person,
+                                  exporter=exporter,
+                                  local=args.local,
+                                  journal=journal)
+        people_f1 = fetch_people(selected_people, fetch, args.workers, args.queue_depth, get_progress)
+
+        # The windowed check only looks at nearby people
+        duplicate_index = DuplicateIndex() if args.dedupe == "index" else None
+
+        # People skipped by --resume aren't checked again, but later
+        #   duplicates of them still have to be found
+        if duplicate_index is not None and finished:
+            for person_id, keys in journal.duplicate_keys(finished):
+                duplicate_index.add(person_id, keys)
+            logger.info(f"Resuming - indexed {len(duplicate_index)} duplicate keys from the journal")
+
+        # Stage 3 - A pool of PCO workers. Only queue_depth people may be
+        #   waiting on a sender before validation stops pulling from F1
+        slots = threading.BoundedSemaphore(max(args.queue_depth, 1))
+        with ThreadPoolExecutor(max_workers=max(args.senders, 1)) as senders:
+            # Stage 2 - Validate each person against their neighbours
+            for person_f1, window, index in windowed(people_f1, DUPLICATE_WINDOW):
+                send_progress.update()
+
+                if not validate_person(person_f1, window, index, counters, journal, duplicate_index, bad_names):
+                    continue
 
-        people_f1 = []
-        # Iterate over results
-        for person in people[start_index:end_index]:
-            # Skip people if IDs are specified
-            if person['id'] not in args.ids:
-                continue
+                slots.acquire()
+                if plan_writer:
+                    future = senders.submit(plan_person, person_f1, attributes_to_fields, exporter, plan_writer)
+                else:
+                    future = senders.submit(send_person, person_f1, attributes_to_fields, exporter, counters, journal,
+                                            pco_ids.get(int(person_f1.id)))
+                future.add_done_callback(functools.partial(finish_send, person_f1=person_f1, slots=slots, counters=counters, journal=journal))
+
+        if plan_writer:
+            plan_writer.close()
+            logger.success(f"Plan - {plan_writer.summary()}")
+        if bad_names:
+            logger.success(f"Bad names - {', '.join(f'{reason}: {total}' for reason, total in bad_names.most_common())}")
+        if f1.cache:
+            logger.success(f"F1 cache - {f1.cache.summary()}")
+        logger.success(f"Geocoder - {pco.geocoder.summary()}")
+    finally:
+        metrics_stop.set()
+        if conn:
+            conn.close()
+        # Every F1 worker has to stop before the files they export to are closed
+        if people_f1 is not None:
+            people_f1.close()
+        journal.close()
+        exporter.close()
+        logger.info(f"Exported rows - {exporter.summary()}")
+        pco.geocoder.close()
+        if f1.cache:
+            f1.cache.close()
+        # Last, so a metrics file that can't be written doesn't leave anything open
+        logger.success(f"Requests - {metrics.status_line()}")
+        try:
+            metrics.write(args.metrics)
+        except OSError as e:
+            logger.error(f"Couldn't write request metrics to {args.metrics}: {e}")
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt(f"Stopped by signal {signum}")
+
+
+def fetch_people(people, fetch, workers, depth, progress):
+    """ yield PersonF1 objects in order, never fetching more than depth ahead """
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for person in people:
+            in_flight.append(executor.submit(fetch, person))
+
+            # Wait on the oldest fetch once the queue is full
+            if len(in_flight) >= max(depth, 1):
+                person_f1 = in_flight.popleft().result()
+                progress.update()
+                yield person_f1
+
+        while in_flight:
+            person_f1 = in_flight.popleft().result()
+            progress.update()
+            yield person_f1
+
+
+def windowed(people_f1, size):
+    """ yield (person, neighbours, index) in the shape is_a_duplicate expects
+
+    Only the people within size of the current person are kept, so the
+    look-behind and look-ahead match slicing the full list
+    """
+    window = collections.deque(maxlen=2 * size + 1)
+    received = 0
+    current = 0
+    for person_f1 in people_f1:
+        window.append(person_f1)
+        received += 1
+
+        # Wait until there are enough people ahead of the current one
+        if received - current - 1 < size:
+            continue
 
-            person_id = int(person['id'])
-            fetched_person = fetched_people[person_id] if fetched_people and person_id in fetched_people.keys() else None
-            fetched_comm = fetched_communications[person_id] if fetched_communications and person_id in fetched_communications.keys() else None
-            fetched_addr = fetched_addresses[person_id] if fetched_addresses and person_id in fetched_addresses.keys() else None
-            # Objectify the person
-            people_f1.append(PersonF1(person, csv_writers, args.local, fetched_person, fetched_comm, fetched_addr))
-            get_progress.update()
+        position = current - (received - len(window))
+        yield window[position], list(window), position + 1
+        current += 1
+
+    # Flush the people at the end of the list
+    while current < received:
+        position = current - (received - len(window))
+        yield window[position], list(window), position + 1
+        current += 1
+
+
+def validate_person(person_f1, window, index, counters, journal, duplicate_index=None, bad_names=None):
+    """ check that a person should be sent to PCO """
+    logger.success("-" * 80)
+
+    # Check to see if an error occured on retrieval
+    if person_f1.error:
+        logger.warning(f"Profile {person_f1.id} had errors")
+        count(counters['error'])
+        return False
+
+    # Check for a bad first or last name
+    bad_name = person_f1.bad_name_reason()
+    if bad_name:
+        logger.warning(f"{person_f1.full_name()} has a bad name ({bad_name})")
+        count(counters['names'])
+        if bad_names is not None:
+            bad_names[bad_name] += 1
+        journal.record(person_f1.id, 'validated', 'bad_name')
+        return False
+
+    # Check for existing contact information
+    if person_f1.has_no_contact_information():
+        logger.warning(f"{person_f1.full_name()} has no contact information")
+        count(counters['empty'])
+        journal.record(person_f1.id, 'validated', 'empty')
+        return False
+
+    # Check for a duplicate (keys are journaled so a resumed run can index them)
+    keys = person_keys(person_f1)
+    if duplicate_index is not None:
+        duplicate_of = duplicate_index.check(person_f1, keys)
+        if duplicate_of is not None:
+            logger.warning(f"{person_f1.full_name()} is a duplicate of {duplicate_of}")
+            count(counters['dups'])
+            journal.record(person_f1.id, 'validated', 'duplicate', keys=keys)
+            return False
+    elif is_a_duplicate(person_f1, window, index):
+        logger.warning(f"{person_f1.full_name()} is a duplicate")
+        count(counters['dups'])
+        journal.record(person_f1.id, 'validated', 'duplicate', keys=keys)
+        return False
+
+    # If it reach here, the person's profile is valid
+    logger.success(f"{person_f1.full_name()} is valid")
+    count(counters['valid'])
+    journal.record(person_f1.id, 'validated', keys=keys)
+
+    # Queue any addresses that will be compared, so they're geocoded in batches before sending
+    pco.queue_geocodes(person_f1)
+    return True
+
+
+def send_person(person_f1, attributes_to_fields, exporter, counters, journal, pco_id=None):
+    """ send a valid person, their contacts and their attributes to PCO """
+    # A resumed person who was already sent is fetched by the id the journal kept
+    person_pco = pco.get_person(pco_id) if pco_id else None
+
+    # Attempt to find the person in Planning Center
+    #   (Returns none if they don't exist)
+    if person_pco is None:
+        logger.info(f"Looking for {person_f1.full_name()} in FellowshipOne")
+        person_pco = pco.find_person(person_f1)
+
+    # Sending person to Planning Center
+    logger.info(f"Checking for '{person_f1.full_name()}' in Planning Center")
+    person_pco, person_existed = pco.send_person_to_pco(person_f1, person_pco, journal)
+    logger.success(f"Sent {person_f1.full_name()} to Planning Center")
+
+    if person_existed:
+        count(counters['updated'])
+    else:
+        count(counters['created'])
 
-        # Setup progress bars
-        send_progress = manager.counter(total=len(people_f1), desc='Sending to PCO', unit='people', color="red")
-        # Setup counters for metrics
-        lap = 0
-        valid = manager.counter(desc='|- Valid Profiles -----', unit='people')
-        created = manager.counter(desc='|--- Created Profiles -', unit='people')
-        updated = manager.counter(desc='|--- Updated Profiles -', unit='people')
-        dups = manager.counter(desc='|- Duplicates ---------', unit='people')
-        names = manager.counter(desc='|- Bad Names ----------', unit='people')
-        empty = manager.counter(desc='|- Empty Profiles -----', unit='people')
-        error = manager.counter(desc='|- Errors -------------', unit='people')
-
-        # Iterate over results
-        for person_f1 in people_f1:
-            logger.success("-" * 80)
-            lap += 1
-
-            send_progress.update()
-
-            # Check to see if an error occured on retrieval
-            if person_f1.error:
-                logger.warning(f"Profile {person_f1.id} had errors")
-                error.update()
-                continue
+    logger.info(f"Retrieving {person_f1.first_name}'s attributes from FellowshipOne")
+    # Get attributes from FellowshipOne
+    attributes = person_f1.get_attributes(exporter)
 
-            # Check for a bad first or last name
-            if person_f1.has_a_bad_name():
-                logger.warning(f"{person_f1.full_name()} has a bad name")
-                names.update()
-                continue
+    if not attributes:
+        logger.info(f"{person_f1.first_name} has no attributes")
+        journal.record(person_f1.id, 'attributes_sent', 'complete')
+        return
 
-            # Check for existing contact information
-            if person_f1.has_no_contact_information():
-                logger.warning(f"{person_f1.full_name()} has no contact information")
-                empty.update()
-                continue
+    logger.info(f"Sending {person_f1.first_name}'s attributes to Planning Center")
 
-            # Check for a duplicate
-            if is_a_duplicate(person_f1, people_f1, lap):
-                logger.warning(f"{person_f1.full_name()} is a duplicate")
-                dups.update()
-                continue
+    # Send each attribute to Planning Center
+    for attribute, mapping in mapped_attributes(attributes, attributes_to_fields):
+        f1_attribute_id = int(attribute['attributeGroup']['attribute']['@id'])
+        pco.send_attribute(person_pco, f1_attribute_id, attribute, mapping, person_f1.first_name)
+    logger.success(f"Sent {person_f1.first_name}'s attributes to Planning Center")
+    journal.record(person_f1.id, 'attributes_sent', 'complete')
+
+
+def mapped_attributes(attributes, attributes_to_fields):
+    """ pair each F1 attribute that has a PCO mapping with its mapping """
+    for attribute in attributes or []:
+        if 'attributeGroup' not in attribute:
+            continue
+        if 'attribute' not in attribute['attributeGroup']:
+            continue
 
-            # If it reach here, the person's profile is valid
-            logger.success(f"{person_f1.full_name()} is valid")
-            valid.update()
+        f1_attribute_id = int(attribute['attributeGroup']['attribute']['@id'])
 
-            # Attempt to find the person in Planning Center
-            #   (Returns none if they don't exist)
-            logger.info(f"Looking for {person_f1.full_name()} in FellowshipOne")
-            person_pco = pco.find_person(person_f1)
+        if f1_attribute_id in attributes_to_fields.keys():
+            yield attribute, attributes_to_fields[f1_attribute_id]
 
-            # Sending person to Planning Center
-            logger.info(f"Checking for '{person_f1.full_name()}' in Planning Center")
-            person_pco, person_existed = pco.send_person_to_pco(person_f1, person_pco)
-            logger.success(f"Sent {person_f1.full_name()} to Planning Center")
 
-            if person_existed:
-                updated.update()
-            else:
-                created.update()
+def plan_person(person_f1, attributes_to_fields, exporter, plan_writer):
+    """ write down what sending a valid person would change in PCO """
+    person_pco = pco.find_person(person_f1)
+    attributes = person_f1.get_attributes(exporter)
+    plan_writer.write(pco.plan_person(person_f1, person_pco, list(mapped_attributes(attributes, attributes_to_fields))))
 
-            logger.info(f"Retrieving {person_f1.first_name}'s attributes from FellowshipOne")
-            # Get attributes from FellowshipOne
-            attributes = person_f1.get_attributes(csv_writers[3])
 
-            if not attributes:
-                logger.info(f"{person_f1.first_name} has no attributes")
+def apply_plans(path, finished, workers, depth, counters, journal, progress):
+    """ make the changes in a saved plan, sending many people at a time """
+    slots = threading.BoundedSemaphore(max(depth, 1))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as appliers:
+        for plan in read_plan(path):
+            if int(plan['f1_id']) in finished:
                 continue
 
-            logger.info(f"Sending {person_f1.first_name}'s attributes to Planning Center")
+            slots.acquire()
+            future = appliers.submit(pco.apply_plan, plan, journal)
+            future.add_done_callback(functools.partial(finish_apply, plan=plan, slots=slots, counters=counters, journal=journal, progress=progress))
+
+
+def finish_apply(future, plan, slots, counters, journal, progress):
+    """ free up an applier slot and count what happened """
+    slots.release()
+    count(progress)
+    if future.exception():
+        logger.critical(f"Failed to apply the plan for {plan['name']}: {future.exception()}")
+        count(counters['error'])
+        journal.record(plan['f1_id'], outcome='error')
+    elif future.result()[1]:
+        count(counters['updated'])
+    else:
+        count(counters['created'])
 
-            # Send each attribute to Planning Center
-            for attribute in attributes:
-                if 'attributeGroup' not in attribute:
-                    continue
-                if 'attribute' not in attribute['attributeGroup']:
-                    continue
 
-                f1_attribute_id = int(attribute['attributeGroup']['attribute']['@id'])
+def finish_send(future, person_f1, slots, counters, journal):
+    """ free up a sender slot and report anything that went wrong """
+    slots.release()
+    if future.exception():
+        logger.critical(f"Failed to send {person_f1.full_name()}: {future.exception()}")
+        count(counters['error'])
+        journal.record(person_f1.id, outcome='error')
 
-                if f1_attribute_id in attributes_to_fields.keys():
-                    pco.send_attribute(person_pco, f1_attribute_id, attribute, attributes_to_fields[f1_attribute_id], person_f1.first_name)
-            logger.success(f"Sent {person_f1.first_name}'s attributes to Planning Center")
-    finally:
-        if conn:
-            conn.close()
 
+def show_metrics(status_bar, stop, interval=2):
+    """ keep the status bar showing the latest request metrics """
+    while not stop.wait(interval):
+        status_bar.update(metrics.status_line())
+
+
+def count(counter):
+    with counter_lock:
+        counter.update()
 
-def create_connection(db_file):
-    """ create a database connection to a SQLite database """
-    conn = None
-    try:
-        conn = sqlite3.connect(db_file)
-        logger.info("Connected to " + db_file)
-    except Error as e:
-        logger.error(e)
 
-    return conn
+def fetch_person(row, exporter, local, journal):
+    """ build a PersonF1 from a row of the people table and its fetched details """
+    person, fetched_person, fetched_comm, fetched_addr = row
+    person_f1 = PersonF1(person, exporter, local, fetched_person, fetched_comm, fetched_addr)
+    journal.record(person_f1.id, 'fetched', 'error' if person_f1.error else None)
+    return person_f1
 
 
 def compare(first, second):
-    logger.debug(first)
-    logger.debug(second)
     return (
         first and second and
         isinstance(first, str) and isinstance(second, str) and
@@ -251,16 +521,13 @@ def compare(first, second):
     )
 
 
-def compareArrayOfDicts(firstArr, secondArr):
+def compare_contacts(firstArr, secondArr, fields):
+    # The raw fields compareArrayOfDicts compared (not the normalized keys
+    #   --dedupe index uses), so window mode reports what it always has
     for first in firstArr:
         for second in secondArr:
-            for key in first.keys():
-                if key not in second.keys():
-                    continue
-                if key in ['city', 'state', 'zip', 'type']:
-                    continue
-
-                if compare(first[key], second[key]):
+            for field in fields:
+                if compare(getattr(first, field), getattr(second, field)):
                     return True
     return False
 
@@ -284,20 +551,13 @@ def is_a_duplicate(person, people, index):
 
         # Check DOB, address, email, or mobile_phone
         if (compare(person.dob, check_person.dob) or
-                compareArrayOfDicts(person.addresses, check_person.addresses) or
-                compareArrayOfDicts(person.phones, check_person.phones) or
-                compareArrayOfDicts(person.emails, check_person.emails)):
+                compare_contacts(person.addresses, check_person.addresses, ('address1', 'address2')) or
+                compare_contacts(person.phones, check_person.phones, ('number',)) or
+                compare_contacts(person.emails, check_person.emails, ('email',))):
             return True
 
     return False
 
 
-def dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
-
-
 if __name__ == '__main__':
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import utils/ relative to f1-to-pco-people
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
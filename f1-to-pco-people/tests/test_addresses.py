@@ -0,0 +1,36 @@
+from utils.addresses import MATCH_SCORE, canonical_address, compare_addresses, score_addresses
+
+
+def geocode(x, y):
+    return {'result': {'addressMatches': [{'matchedAddress': f"{x}, {y}", 'coordinates': {'x': x, 'y': y}}]}}
+
+
+def test_the_same_street_in_the_same_zip_matches():
+    address = canonical_address('12 Main Street Apt 3', '11237-1234', city='Brooklyn')
+    candidate = canonical_address('12 Main St Apt 3', '11237', city='Brooklyn')
+    [match] = score_addresses(address, [candidate])
+    assert match.score == 1.0
+    assert compare_addresses(address, [candidate]) == match
+
+
+def test_the_same_street_in_another_town_does_not_match():
+    address = canonical_address('12 Main St', '11237', city='Brooklyn')
+    candidate = canonical_address('12 Main St', '07030', city='Hoboken')
+    [match] = score_addresses(address, [candidate])
+    assert match.score < MATCH_SCORE
+    assert compare_addresses(address, [candidate]) is None
+
+
+def test_the_same_city_is_enough_without_a_zip():
+    address = canonical_address('12 Main St', '', city='Brooklyn')
+    candidate = canonical_address('12 Main St', '11237', city='brooklyn')
+    assert score_addresses(address, [candidate])[0].score >= MATCH_SCORE
+
+
+def test_nearby_geocodes_match_a_differently_written_address():
+    address = canonical_address('12 Main St', '11237', geocode(-73.9200, 40.7000))
+    candidate = canonical_address('14 Main St', '11237', geocode(-73.9201, 40.7001))
+    far = canonical_address('12 Main St', '90210', geocode(-118.40, 34.09), city='Beverly Hills')
+    near, away = score_addresses(address, [candidate, far])
+    assert near.score >= MATCH_SCORE
+    assert away.score < MATCH_SCORE
@@ -0,0 +1,21 @@
+import sqlite3
+
+from utils.cache import CachedResponse, ResponseCache
+
+
+def accessed_at(path, key):
+    conn = sqlite3.connect(path)
+    return conn.execute("SELECT accessed_at FROM cache_entries WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_write_their_access_times_on_close(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    cache.put('/v1/People/1.json', None, CachedResponse(b'{}'))
+    stored = accessed_at(path, '/v1/People/1.json')
+
+    assert cache.get('/v1/People/1.json').content == b'{}'
+    assert accessed_at(path, '/v1/People/1.json') == stored
+
+    cache.close()
+    assert accessed_at(path, '/v1/People/1.json') > stored
@@ -0,0 +1,60 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.clients import LazyClient
+
+
+class Factory:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return SimpleNamespace(name=f"client {self.calls}", cache=None)
+
+
+def test_settings_are_held_until_the_client_is_first_used():
+    factory = Factory()
+    client = LazyClient(factory)
+    client.cache = 'cache'
+    assert client.cache == 'cache'
+    assert factory.calls == 0 and not client.is_built()
+
+    assert client.name == 'client 1'
+    assert client.cache == 'cache'
+    assert client.name == 'client 1' and factory.calls == 1
+
+
+def test_threads_share_the_one_client():
+    factory = Factory(delay=0.05)
+    client = LazyClient(factory)
+    barrier = threading.Barrier(8)
+    names = []
+
+    def use():
+        barrier.wait()
+        names.append(client.name)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert factory.calls == 1
+    assert names == ['client 1'] * 8
+
+
+def test_a_swapped_client_gets_the_settings_too():
+    client = LazyClient(Factory())
+    client.cache = 'cache'
+    built = SimpleNamespace(name='built')
+    client.use_client(built)
+    assert client.name == 'built' and built.cache == 'cache'
+
+    factory = Factory()
+    client.set_factory(factory)
+    assert not client.is_built()
+    assert client.name == 'client 1' and client.cache == 'cache'
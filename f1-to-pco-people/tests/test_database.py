@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from utils import database
+from utils.journal import Journal
+
+
+@pytest.fixture
+def normal_db(tmp_path):
+    path = str(tmp_path / "normal.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE people (id INTEGER, household_id INTEGER)")
+    conn.executemany("INSERT INTO people VALUES (?, ?)", [(1000 + i, i // 3) for i in range(1200)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_iter_people_returns_the_slice_in_order(normal_db):
+    conn = database.create_connection(normal_db)
+    people = [person['id'] for person, *_ in database.iter_people(conn, 10, 1010, chunk_size=100)]
+    assert people == list(range(1010, 2010))
+    assert database.count_people(conn, 10, 1010) == 1000
+
+
+def test_an_end_before_the_start_selects_nobody(normal_db):
+    conn = database.create_connection(normal_db)
+    assert list(database.iter_people(conn, 500, 100)) == []
+    assert database.count_people(conn, 500, 100) == 0
+
+
+def test_iter_people_filters_ids(normal_db):
+    conn = database.create_connection(normal_db)
+    people = [person['id'] for person, *_ in database.iter_people(conn, ids=[1005, 1001, 99])]
+    assert people == [1001, 1005]
+
+
+def test_journal_commits_while_people_are_streamed(normal_db):
+    # The journal and the people stream share normal.db, as they do in migrate.py
+    journal = Journal(normal_db, batch_size=10)
+    journal.conn.execute("PRAGMA busy_timeout = 100")
+    conn = database.create_connection(normal_db)
+
+    for person, *_ in database.iter_people(conn, chunk_size=50):
+        journal.record(person['id'], 'fetched', 'complete')
+    journal.flush()
+
+    check = sqlite3.connect(normal_db)
+    assert check.execute("SELECT COUNT(*) FROM migration_journal").fetchone()[0] == 1200
+
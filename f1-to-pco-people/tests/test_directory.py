@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from utils.directory import PeopleDirectory
+from utils.fellowshipone import Email, Phone
+from utils.normalize import national_number, normalize
+
+
+def record(person_id, first, last, birthdate=None, emails=(), phones=()):
+    included = [{'type': 'Email', 'attributes': {'address': email}} for email in emails]
+    included += [{'type': 'PhoneNumber', 'attributes': {'number': number}} for number in phones]
+    return {'data': {'id': person_id, 'attributes': {'first_name': first, 'given_name': None, 'last_name': last,
+                                                     'birthdate': birthdate}},
+            'included': included}
+
+
+def person(first, last, birthdate=None, emails=(), phones=()):
+    return SimpleNamespace(first_name=first, goes_by_name=None, last_name_key=normalize(last),
+                           emails=[Email(email, 'Email', normalize(email)) for email in emails],
+                           phones=[Phone(number, 'Mobile', national_number(number)) for number in phones],
+                           get_dob_yyyy_mm_dd_format=lambda: birthdate or '1900-01-01')
+
+
+class FakePCO:
+    def __init__(self, records):
+        self.records = records
+
+    def iterate(self, url, **params):
+        yield from self.records
+
+
+def test_people_are_found_by_name_and_a_detail():
+    directory = PeopleDirectory()
+    directory.load(FakePCO([
+        record('1', 'Ann', 'Lee', '1980-01-01'),
+        record('2', ' Ann ', 'Lee ', emails=[' Ann@Example.com ']),
+        record('3', 'Bob', 'Lee', phones=['(555) 555-0100']),
+    ]))
+    assert len(directory) == 3
+
+    assert directory.find(person('Ann', 'Lee', '1980-01-01'))['data']['id'] == '1'
+    assert directory.find(person('ann', 'lee', emails=['ann@example.com']))['data']['id'] == '2'
+    assert directory.find(person('Bob', 'Lee', phones=['555-555-0100']))['data']['id'] == '3'
+    assert directory.find(person('Bob', 'Lee', '1980-01-01')) is None
+
+
+def test_a_detail_shared_by_two_people_matches_nobody():
+    directory = PeopleDirectory()
+    directory.add(record('1', 'Ann', 'Lee', emails=['ann@example.com']))
+    directory.add(record('2', 'Ann', 'Lee', emails=['ann@example.com']))
+    assert directory.find(person('Ann', 'Lee', emails=['ann@example.com'])) is None
+
+
+def test_adding_a_person_again_replaces_them():
+    directory = PeopleDirectory()
+    directory.add(record('1', 'Ann', 'Lee', '1980-01-01'))
+    directory.add(record('1', 'Ann', 'Smith', '1980-01-01'))
+    assert len(directory) == 1
+    assert directory.find(person('Ann', 'Lee', '1980-01-01')) is None
+    assert directory.find(person('Ann', 'Smith', '1980-01-01'))['data']['id'] == '1'
+
+
+def test_people_can_be_looked_up_by_pco_id():
+    directory = PeopleDirectory()
+    directory.add(record('1', 'Ann', 'Lee'))
+    assert directory.get(1)['data']['id'] == '1'
+    assert directory.get('2') is None
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from utils.duplicates import DuplicateIndex, person_keys
+from utils.fellowshipone import Email
+from utils.journal import Journal
+
+
+def person(person_id, first, last, birthdate=None, emails=()):
+    return SimpleNamespace(id=person_id, first_name_key=first, last_name_key=last, birthdate=birthdate,
+                           emails=[Email(email, 'Email', email) for email in emails], phones=[], addresses=[])
+
+
+def test_a_resumed_index_finds_duplicates_of_finished_people(tmp_path):
+    path = str(tmp_path / "normal.db")
+    first = person(1, 'ann', 'lee', emails=['ann@example.com'])
+    journal = Journal(path)
+    journal.record(1, 'sent', 'complete', keys=person_keys(first))
+    journal.close()
+
+    # The next run skips person 1 but still indexes them
+    journal = Journal(path)
+    index = DuplicateIndex()
+    for person_id, keys in journal.duplicate_keys(journal.finished()):
+        index.add(person_id, keys)
+    assert index.check(person(2, 'ann', 'lee', emails=['ann@example.com'])) == 1
+    journal.close()
+
+
+def test_index_check_returns_the_first_person_sharing_a_key():
+    index = DuplicateIndex()
+    assert index.check(person(1, 'ann', 'lee', '1980-01-01')) is None
+    assert index.check(person(2, 'ann', 'lee', '1990-02-02', emails=['ann@example.com'])) is None
+    assert index.check(person(3, 'ann', 'lee', '1970-03-03', emails=['ann@example.com'])) == 2
+    assert index.check(person(4, 'ann', 'lee', '1980-01-01', emails=['lee@example.com'])) == 1
+    assert index.check(person(5, 'bob', 'lee', '1980-01-01')) is None
+
+
+def test_index_check_ignores_people_without_names_or_details():
+    index = DuplicateIndex()
+    assert index.check(person(1, None, 'lee', '1980-01-01')) is None
+    assert index.check(person(2, None, 'lee', '1980-01-01')) is None
+    assert index.check(person(3, 'ann', 'lee')) is None
+    assert index.check(person(4, 'ann', 'lee')) is None
+    assert len(index) == 0
@@ -0,0 +1,13 @@
+from utils.export import Exporter
+
+
+def test_an_appending_exporter_keeps_earlier_rows(tmp_path):
+    exporter = Exporter(str(tmp_path))
+    exporter.write('people', [1, 10, 'Ann'])
+    exporter.close()
+
+    exporter = Exporter(str(tmp_path), append=True)
+    exporter.write('people', [2, 20, 'Bob'])
+    exporter.close()
+
+    assert (tmp_path / "people.csv").read_text().splitlines() == ['1,10,Ann', '2,20,Bob']
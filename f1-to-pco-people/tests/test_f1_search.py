@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+import pytest
+
+from utils import database, f1_search, fellowshipone
+from utils.cache import CachedResponse
+from utils.export import Exporter
+
+
+def searched_person(person_id, emails=(), streets=()):
+    return {'@id': str(person_id), '@householdID': str(person_id // 10), 'firstName': 'Ann', 'middleName': None,
+            'lastName': f"Lee{person_id}", 'goesByName': None, 'gender': 'Female', 'dateOfBirth': None,
+            'status': {'@id': '1', 'name': 'Member'}, 'maritalStatus': None, 'lastUpdatedDate': None,
+            'communications': {'communication': [{'communicationGeneralType': 'Email', 'communicationValue': email,
+                                                  'communicationType': {'name': 'Email'}} for email in emails]},
+            # A single record isn't wrapped in a list
+            'addresses': {'address': [{'address1': street, 'address2': None, 'address3': None, 'city': 'Brooklyn',
+                                       'postalCode': '11237', 'stProvince': 'NY'} for street in streets][0]}
+            if streets else None}
+
+
+class FakeF1:
+    """People Search over a few people, failing for any search that includes failing"""
+
+    def __init__(self, people, failing=()):
+        self.people = people
+        self.failing = set(failing)
+        self.requests = []
+
+    def get(self, endpoint, params=None):
+        self.requests.append((endpoint, params))
+        if endpoint != f1_search.SEARCH_ENDPOINT:
+            raise AssertionError(f"Unexpected request for {endpoint}")
+        ids = [int(person_id) for person_id in params['id'].split(',')] if 'id' in params else list(self.people)
+        if self.failing & set(ids):
+            return CachedResponse(b'', 500)
+
+        per_page, page = params['recordsPerPage'], params['page']
+        matches = [self.people[person_id] for person_id in ids if person_id in self.people]
+        results = matches[(page - 1) * per_page:page * per_page]
+        pages = -(-len(matches) // per_page)
+        return CachedResponse(json.dumps({'results': {'@additionalPages': str(pages - page),
+                                                      'person': results}}).encode())
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "normal.db"))
+    conn.execute("CREATE TABLE people (id INTEGER, household_id INTEGER)")
+    conn.executemany("INSERT INTO people VALUES (?, ?)", [(i, i // 10) for i in range(1, 8)])
+    database.ensure_fetched_tables(conn)
+    yield conn
+    conn.close()
+
+
+def test_search_pages_through_everyone_including_inactive_people():
+    f1 = FakeF1({i: searched_person(i) for i in range(1, 6)})
+    people = list(f1_search.search_people(f1, records_per_page=2, lastUpdatedDate='2020-01-01'))
+    assert [person['@id'] for person in people] == ['1', '2', '3', '4', '5']
+    assert [params['page'] for _, params in f1.requests] == [1, 2, 3]
+    assert all(params['includeInactive'] == 'true' and params['includeDeceased'] == 'true'
+               for _, params in f1.requests)
+
+
+def test_a_failed_page_raises_instead_of_stopping_short():
+    f1 = FakeF1({1: searched_person(1)}, failing=[1])
+    with pytest.raises(RuntimeError):
+        list(f1_search.search_people(f1))
+
+
+def test_a_failed_search_leaves_its_people_unfetched(conn):
+    f1 = FakeF1({i: searched_person(i, emails=[f"ann{i}@example.com"], streets=['12 Main St'])
+                 for i in range(1, 8)}, failing=[4])
+    stored = f1_search.fetch_people(f1, conn, database.unfetched_ids(conn), workers=2, records_per_page=3)
+    assert stored == 4
+    assert database.unfetched_ids(conn) == [4, 5, 6]
+    assert conn.execute("SELECT COUNT(*) FROM fetched_communications").fetchone()[0] == 4
+    assert conn.execute("SELECT status, COUNT(*) FROM fetched_addresses JOIN fetched_people ON id = person_id"
+                        ).fetchall() == [('Member', 4)]
+
+
+def test_a_locally_read_person_without_addresses_is_not_fetched_again(conn, tmp_path, monkeypatch):
+    # Search fills the fetched_* tables, so no address rows means no addresses
+    f1_search.store_people(conn, [searched_person(1, emails=['ann@example.com'])])
+    [(person, details, communications, addresses)] = database.iter_people(conn, ids=[1], include_fetched=True)
+
+    monkeypatch.setattr(fellowshipone, 'f1', FakeF1({}))
+    monkeypatch.setattr(fellowshipone.logger, 'success', fellowshipone.logger.info, raising=False)
+    exporter = Exporter(str(tmp_path))
+    person_f1 = fellowshipone.PersonF1(person, exporter, local=True, details=details,
+                                       communications=communications, addresses=addresses)
+    exporter.close()
+    assert not person_f1.error
+    assert person_f1.addresses == () and [email.key for email in person_f1.emails] == ['ann@example.com']
+    assert fellowshipone.f1.requests == []
@@ -0,0 +1,85 @@
+from utils import geocoder
+from utils.geocoder import Geocoder, empty_payload, payload
+
+HOME = ('12 Main St', 'Brooklyn', 'NY', '11237')
+WORK = ('40 Wall St', 'New York', 'NY', '10005')
+
+
+class FakeBackend:
+    name = 'fake'
+
+    def __init__(self, places=None, fail_batches=False, down=False):
+        self.places = places or {}
+        self.fail_batches = fail_batches
+        self.down = down
+        self.calls = []
+
+    def geocode(self, addresses):
+        self.calls.append(len(addresses))
+        if self.down or (self.fail_batches and len(addresses) > 1):
+            raise ConnectionError("backend unavailable")
+        return {key: self.places[address] for key, address in addresses.items() if address in self.places}
+
+
+def found(x):
+    return payload('somewhere', x, 1.0)
+
+
+def test_lookups_are_cached():
+    backend = FakeBackend({HOME: found(1.0)})
+    coder = Geocoder(backend)
+    assert coder.lookup(*HOME) == found(1.0)
+    assert coder.lookup(*HOME) == found(1.0)
+    assert backend.calls == [1]
+
+
+def test_a_miss_from_another_backend_is_looked_up_again(tmp_path):
+    path = str(tmp_path / "geocodes.db")
+    gazetteer = FakeBackend()
+    gazetteer.name = 'gazetteer'
+    assert Geocoder(gazetteer, path).lookup(*HOME) == empty_payload()
+
+    census = FakeBackend({HOME: found(2.0)})
+    assert Geocoder(census, path).lookup(*HOME) == found(2.0)
+
+
+def test_misses_expire(monkeypatch):
+    backend = FakeBackend()
+    coder = Geocoder(backend)
+    coder.lookup(*HOME)
+    coder.lookup(*HOME)
+    assert backend.calls == [1]
+
+    monkeypatch.setattr(geocoder, 'NO_MATCH_TTL', -1)
+    coder.lookup(*HOME)
+    assert backend.calls == [1, 1]
+
+
+def test_a_failed_batch_falls_back_to_single_lookups():
+    backend = FakeBackend({HOME: found(1.0), WORK: found(3.0)}, fail_batches=True)
+    coder = Geocoder(backend)
+    coder.queue(*HOME)
+    coder.queue(*WORK)
+    coder.flush()
+    assert backend.calls == [2, 1, 1]
+    assert coder.lookup(*WORK) == found(3.0)
+
+
+def test_addresses_are_requeued_while_the_backend_is_down():
+    backend = FakeBackend({HOME: found(1.0), WORK: found(3.0)}, down=True)
+    coder = Geocoder(backend)
+    coder.queue(*HOME)
+    coder.queue(*WORK)
+    coder.flush()
+    assert len(coder.pending) == 2
+
+    # The backend isn't tried again until BACKEND_RETRY has passed
+    backend.down = False
+    calls = len(backend.calls)
+    coder.flush()
+    assert len(backend.calls) == calls and len(coder.pending) == 2
+
+    coder.down_until = 0
+    coder.flush()
+    assert not coder.pending
+    assert coder.lookup(*HOME) == found(1.0)
@@ -0,0 +1,38 @@
+import sqlite3
+
+from utils.journal import Journal
+
+
+def test_journal_records_the_latest_stage_and_outcome(tmp_path):
+    journal = Journal(str(tmp_path / "normal.db"))
+    journal.record(1, 'fetched')
+    journal.record(1, 'sent', pco_id='55')
+    journal.record(2, 'validated', 'duplicate')
+    journal.close()
+
+    conn = sqlite3.connect(str(tmp_path / "normal.db"))
+    rows = conn.execute("SELECT person_id, stage, pco_id, outcome FROM migration_journal ORDER BY person_id").fetchall()
+    assert rows == [(1, 'sent', '55', None), (2, 'validated', None, 'duplicate')]
+
+
+def test_journal_keeps_a_batch_it_cannot_write(tmp_path):
+    path = str(tmp_path / "normal.db")
+    journal = Journal(path, batch_size=2)
+    journal.conn.execute("PRAGMA busy_timeout = 0")
+
+    # Another connection holds the write lock
+    blocker = sqlite3.connect(path)
+    blocker.execute("BEGIN IMMEDIATE")
+
+    journal.record(1, 'fetched')
+    journal.record(2, 'fetched')
+    assert journal.failing and len(journal.pending) == 2
+
+    # Nothing is retried until another full batch has been recorded
+    journal.record(3, 'fetched')
+    assert len(journal.pending) == 3
+
+    blocker.rollback()
+    journal.record(4, 'fetched', 'complete')
+    assert not journal.pending and not journal.failing
+    assert journal.finished() == {4}
@@ -0,0 +1,23 @@
+import json
+
+from utils.metrics import Metrics, endpoint_template
+
+
+def test_ids_in_a_path_are_templated():
+    assert endpoint_template('https://api.planningcenteronline.com/people/v2/people/123/emails?per_page=100') == \
+        '/people/v2/people/{id}/emails'
+    assert endpoint_template('/v1/People/456.json') == '/v1/People/{id}.json'
+    assert endpoint_template('/v1/People/Search.json') == '/v1/People/Search.json'
+    assert endpoint_template('/v1/People/1x2/Addresses') == '/v1/People/1x2/Addresses'
+
+
+def test_the_summary_is_written_as_json_or_prometheus_text(tmp_path):
+    metrics = Metrics()
+    metrics.record('pco', 'GET', '/people/v2/people/1', 0.25, status=200, size=10)
+    metrics.record('pco', 'GET', '/people/v2/people/2', 0.5, status=429)
+
+    metrics.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == metrics.summary()
+
+    metrics.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == metrics.prometheus()
@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import migrate
+from utils.fellowshipone import Address, Email, Phone
+from utils.journal import Journal
+from utils.normalize import national_number
+
+
+class Progress:
+    def __init__(self):
+        self.count = 0
+
+    def update(self):
+        self.count += 1
+
+
+def test_fetch_people_keeps_the_order_and_the_depth():
+    lock = threading.Lock()
+    running = []
+    most = []
+
+    def fetch(person):
+        with lock:
+            running.append(person)
+            most.append(len(running))
+        time.sleep(random.uniform(0, 0.01))
+        with lock:
+            running.remove(person)
+        return person * 10
+
+    progress = Progress()
+    people = migrate.fetch_people(iter(range(40)), fetch, workers=8, depth=5, progress=progress)
+    assert list(people) == [person * 10 for person in range(40)]
+    assert progress.count == 40
+    assert max(most) <= 5
+
+
+def test_windowed_gives_is_a_duplicate_the_neighbours_of_the_full_list():
+    people = list(range(100))
+    seen = []
+    for person, window, index in migrate.windowed(iter(people), migrate.DUPLICATE_WINDOW):
+        # is_a_duplicate looks DUPLICATE_WINDOW either side of index
+        neighbours = window[max(index - migrate.DUPLICATE_WINDOW, 0):index + migrate.DUPLICATE_WINDOW]
+        position = people.index(person) + 1
+        assert neighbours == people[max(position - migrate.DUPLICATE_WINDOW, 0):position + migrate.DUPLICATE_WINDOW]
+        assert window[index - 1] == person
+        seen.append(person)
+    assert seen == people
+
+
+def test_windowed_handles_nobody():
+    assert list(migrate.windowed(iter([]), 20)) == []
+
+
+def test_a_resumed_person_is_fetched_by_their_journaled_pco_id(monkeypatch, tmp_path):
+    journal = Journal(str(tmp_path / "normal.db"))
+    journal.record(5, 'sent', pco_id='55')
+    journal.record(6, 'attributes_sent', 'complete', pco_id='66')
+    assert journal.pco_ids() == {5: '55'}
+
+    # main() adds the SUCCESS level
+    monkeypatch.setattr(migrate.logger, 'success', migrate.logger.info, raising=False)
+
+    calls = []
+    monkeypatch.setattr(migrate.pco, 'get_person', lambda pco_id: calls.append(pco_id) or {'data': {'id': pco_id}})
+    monkeypatch.setattr(migrate.pco, 'find_person', lambda person: calls.append('search'))
+    monkeypatch.setattr(migrate.pco, 'send_person_to_pco', lambda person_f1, person_pco, journal: (person_pco, True))
+
+    person = SimpleNamespace(id=5, first_name='Ann', full_name=lambda: 'Ann Lee', get_attributes=lambda exporter: [])
+    counters = {'updated': Progress(), 'created': Progress()}
+    migrate.send_person(person, {}, None, counters, journal, journal.pco_ids()[5])
+    assert calls == ['55']
+    assert counters['updated'].count == 1
+
+    # Someone deleted from PCO since is searched for as usual
+    monkeypatch.setattr(migrate.pco, 'get_person', lambda pco_id: None)
+    migrate.send_person(person, {}, None, counters, journal, '55')
+    assert calls == ['55', 'search']
+    journal.close()
+
+
+def legacy_person(person_id, dob=None, phones=(), emails=(), addresses=()):
+    return SimpleNamespace(id=person_id, first_name='Ann', last_name='Lee', dob=dob,
+                           phones=[Phone(number, 'Mobile Phone', national_number(number)) for number in phones],
+                           emails=[Email(email, 'Email', email.strip().lower()) for email in emails],
+                           addresses=[Address(address1, address2, 'Brooklyn', '11237', 'NY', None)
+                                      for address1, address2 in addresses])
+
+
+def duplicated(first, second):
+    return migrate.is_a_duplicate(second, [first, second], 2)
+
+
+def test_the_windowed_check_compares_raw_fields_like_it_always_has():
+    assert duplicated(legacy_person(1, dob='1980-01-01T00:00:00'), legacy_person(2, dob='1980-01-01T00:00:00'))
+    assert duplicated(legacy_person(1, emails=['Ann@Example.com']), legacy_person(2, emails=['ann@example.com']))
+    assert duplicated(legacy_person(1, addresses=[('12 Main St', 'Apt 1')]), legacy_person(2, addresses=[('40 Wall St', 'apt 1')]))
+
+    # Only --dedupe index matches these on normalized keys
+    assert not duplicated(legacy_person(1, phones=['555-555-0100']), legacy_person(2, phones=['(555) 555-0100']))
+    assert not duplicated(legacy_person(1, emails=[' ann@example.com']), legacy_person(2, emails=['ann@example.com']))
+    assert not duplicated(legacy_person(1, addresses=[('12 Main St', '')]), legacy_person(2, addresses=[('12  Main St', '')]))
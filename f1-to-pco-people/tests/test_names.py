@@ -0,0 +1,54 @@
+import json
+import string
+
+from utils.names import NameValidator
+
+
+def test_bad_names_are_given_a_reason():
+    validator = NameValidator()
+    assert validator.check('Ann') is None
+    assert validator.check("O'Neil") == 'punctuation'
+    assert validator.check('A') == 'too_short'
+    assert validator.check('J.R.') == 'too_many_periods'
+    assert validator.check('(Ann)') == 'bad_prefix'
+    assert validator.check('Ann2') == 'digit'
+    assert validator.check('Ann and Bob') == 'conjunction'
+    assert validator.check(None) == 'too_short'
+
+
+def test_check_many_agrees_with_check():
+    validator = NameValidator()
+    words = ['Ann', 'Ann2', '', 'Mary Ann', 'Ann and Bob', None]
+    assert validator.check_many(words) == [validator.check(word) for word in words]
+    assert validator.check_person('Ann', 'Lee2') == 'digit'
+
+
+def test_rules_from_a_file_reuse_the_default_patterns(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{'reason': 'digit'}, {'reason': 'no_x', 'pattern': r'.*x'}]))
+    validator = NameValidator.from_file(str(path))
+    assert validator.check('Ann2') == 'digit'
+    assert validator.check('Max') == 'no_x'
+    assert validator.check('A') is None
+
+
+def is_a_bad_word(word):
+    # PersonF1.is_a_bad_word before the rules were compiled
+    invalid_chars = string.punctuation.replace(".", "").replace("(", "").replace(")", "")
+    return (
+        len(word.replace(".", "")) <= 1 or
+        word.count('.') >= 2 or
+        word[0] in '(.' or
+        word[len(word) - 1] == ')' or
+        any(char.isdigit() for char in word) or
+        any(char in set(invalid_chars) for char in word) or
+        len(word.split(' ')) > 3 or
+        ' and ' in word
+    )
+
+
+def test_the_default_rules_reject_what_is_a_bad_word_did():
+    words = ['Ann', 'A', 'A.', '.A', 'Jo.', 'J.R.', 'Mary Ann', 'Mary Ann Lee Smith', 'Ann and Bob', 'Ann (Bob)',
+             '(Ann)', 'Ann)', 'Lee-Smith', "O'Neil", 'R2D2', 'Ann Marie Lee', 'St. John', 'Anne\nMarie', 'Ann.and']
+    validator = NameValidator()
+    assert [validator.check(word) is not None for word in words] == [is_a_bad_word(word) for word in words]
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+from utils import pco
+from utils.fellowshipone import Address, Email, Phone
+
+
+class FakeGeocoder:
+    def __init__(self):
+        self.queued = []
+
+    def queue(self, street, city, state, zip):
+        self.queued.append(street)
+
+
+class FakeDirectory:
+    def __init__(self, record):
+        self.record = record
+
+    def find(self, person):
+        return self.record
+
+
+def pco_person(*streets):
+    return {'data': {'id': '1'}, 'included': [
+        {'type': 'Address', 'attributes': {'street': street, 'city': 'Brooklyn', 'state': 'NY', 'zip': '11237'}}
+        for street in streets]}
+
+
+PERSON = SimpleNamespace(addresses=[Address('12 Main St', '', 'Brooklyn', '11237', 'NY', '12 main st')])
+
+
+def queued(monkeypatch, send_addresses, directory):
+    geocoder = FakeGeocoder()
+    monkeypatch.setattr(pco, 'geocoder', geocoder)
+    monkeypatch.setattr(pco, 'SEND_ADDRESSES', send_addresses)
+    monkeypatch.setattr(pco, 'directory', directory)
+    pco.queue_geocodes(PERSON)
+    return geocoder.queued
+
+
+def test_addresses_that_will_be_compared_are_queued(monkeypatch):
+    assert queued(monkeypatch, True, FakeDirectory(pco_person('14 Main St'))) == ['12 Main St', '14 Main St']
+
+
+def test_nothing_is_queued_when_nothing_will_be_compared(monkeypatch):
+    assert queued(monkeypatch, False, FakeDirectory(pco_person('14 Main St'))) == []
+    assert queued(monkeypatch, True, FakeDirectory(None)) == []
+    assert queued(monkeypatch, True, FakeDirectory(pco_person())) == []
+    assert queued(monkeypatch, True, None) == []
+
+
+def test_addresses_that_wont_be_sent_arent_geocoded(monkeypatch):
+    geocoder = FakeGeocoder()
+    monkeypatch.setattr(pco, 'geocoder', geocoder)
+    monkeypatch.setattr(pco, 'SEND_ADDRESSES', False)
+    assert pco.send_address('1', PERSON.addresses[0], pco.PersonSnapshot(pco_person('14 Main St'))) is None
+    assert geocoder.queued == []
+
+
+class FakePCO:
+    """Records every request; POSTs echo back their payload as the created record"""
+
+    def __init__(self):
+        self.requests = []
+
+    def template(self, object_type, attributes=None):
+        return {'data': {'type': object_type, 'attributes': attributes or {}}}
+
+    def post(self, url, payload):
+        self.requests.append(('POST', url))
+        return {'data': dict(payload['data'], id=str(len(self.requests)))}
+
+    def patch(self, url, payload):
+        self.requests.append(('PATCH', url))
+        return {'data': dict(payload['data'], id='1')}
+
+    def get(self, url, **params):
+        self.requests.append(('GET', url))
+        raise AssertionError("the snapshot should answer this")
+
+
+def test_contacts_are_checked_against_the_snapshot(monkeypatch):
+    client = FakePCO()
+    monkeypatch.setattr(pco, 'pco', client)
+    snapshot = pco.PersonSnapshot(pco_person())
+    snapshot.add({'type': 'Email', 'id': '9', 'attributes': {'address': 'Ann@Example.com'}})
+
+    email = Email('ann@example.com', 'Email', 'ann@example.com')
+    phone = Phone('(555) 555-0100', 'Mobile Phone', '5555550100')
+    assert pco.send_email('1', email, snapshot) is None
+    pco.send_phone_number('1', phone, snapshot)
+    pco.send_phone_number('1', phone, snapshot)
+    assert client.requests == [('POST', '/people/v2/people/1/phone_numbers')]
+
+
+class DefinitionsPCO(FakePCO):
+    def iterate(self, url, **params):
+        self.requests.append(('GET', url))
+        for definition_id in (100, 101):
+            yield {'data': {'id': str(definition_id), 'attributes': {'name': f"Field {definition_id}"}}}
+
+    def get(self, url, **params):
+        self.requests.append(('GET', url))
+        return {'data': {'id': url.rsplit('/', 1)[1], 'attributes': {'name': 'Late field'}}}
+
+
+def test_field_definitions_are_loaded_once(monkeypatch):
+    client = DefinitionsPCO()
+    monkeypatch.setattr(pco, 'pco', client)
+    monkeypatch.setattr(pco, 'field_definitions', {})
+
+    mappings = [{'pco_data_type': 'field_data', 'pco_id': 100}, {'pco_data_type': 'field_data', 'pco_id': 102},
+                {'pco_data_type': 'wed_anniversary', 'pco_id': None}]
+    assert pco.load_field_definitions(mappings) == [mappings[1]]
+
+    for _ in range(3):
+        pco.send_field_datum('1', None, {'value': '2020-01-01', 'field_definition_id': 101})
+    pco.send_field_datum('1', 7, {'value': '2020-01-01', 'field_definition_id': 103})
+    pco.get_field_definition(103)
+    assert [request for request in client.requests if request[0] == 'GET'] == [
+        ('GET', '/people/v2/field_definitions'), ('GET', '/people/v2/field_definitions/103')]
+    assert client.requests[-1] == ('PATCH', '/people/v2/field_data/7')
@@ -0,0 +1,85 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+from utils import pco_client
+from utils.pco_client import DEFAULT_PRIORITY, RateLimitScheduler, ScheduledPCO, request_priority, retry_after_seconds
+
+
+def response(status_code=200, **headers):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def test_requests_wait_for_tokens():
+    scheduler = RateLimitScheduler(limit=2, period=0.2)
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire()
+    assert time.monotonic() - started >= 0.08
+
+
+def test_waiting_requests_go_in_priority_order():
+    scheduler = RateLimitScheduler(limit=1, period=0.2)
+    scheduler.acquire()
+
+    order = []
+
+    def send(priority):
+        scheduler.acquire(priority)
+        order.append(priority)
+
+    threads = [threading.Thread(target=send, args=(priority,)) for priority in (4, 0)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 4]
+
+
+def test_headers_and_retry_after_are_obeyed():
+    scheduler = RateLimitScheduler(limit=100, period=20)
+    scheduler.observe(response(**{'X-PCO-API-Request-Rate-Limit': '50', 'X-PCO-API-Request-Rate-Count': '50'}))
+    assert scheduler.limit == 50 and scheduler.tokens < 1
+
+    scheduler.observe(response(429, **{'Retry-After': '3'}))
+    assert 2 < scheduler.wait_time() <= 3
+
+
+def test_people_are_created_before_their_details():
+    assert request_priority('POST', 'https://api.planningcenteronline.com/people/v2/people') == 0
+    assert request_priority('POST', '/people/v2/people/1/emails') == 2
+    assert request_priority('POST', '/people/v2/people/1/field_data') == 4
+    assert request_priority('GET', '/people/v2/people') == DEFAULT_PRIORITY
+
+
+def test_retry_after_can_be_seconds_or_a_date():
+    assert retry_after_seconds('3', 20) == 3
+    assert retry_after_seconds('1.5', 20) == 1.5
+    assert retry_after_seconds(None, 20) == 20
+    assert retry_after_seconds('soon', 20) == 20
+    assert 8 < retry_after_seconds(format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True), 20) <= 10
+    assert retry_after_seconds('Wed, 21 Oct 2015 07:28:00 GMT', 20) == 0
+
+    scheduler = RateLimitScheduler(limit=100, period=20)
+    scheduler.observe(response(429, **{'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}))
+    assert scheduler.wait_time() <= 0.2
+
+
+class RateLimitedPCO(ScheduledPCO):
+    """Answers every request with a 429"""
+
+    def __init__(self):
+        self.tries = 0
+
+    def _do_timeout_managed_request(self, method, url, payload=None, upload=None, **params):
+        self.tries += 1
+        return response(429)
+
+
+def test_rate_limited_requests_are_retried_a_limited_number_of_times():
+    client = RateLimitedPCO()
+    assert client._do_ratelimit_managed_request('GET', '/people/v2/people').status_code == 429
+    assert client.tries == pco_client.MAX_RATE_LIMIT_RETRIES
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from utils import pco
+from utils.fellowshipone import Email, Phone
+from utils.journal import Journal
+from utils.plan import PlanWriter, plan_writes, read_plan
+
+
+class FakePCO:
+    def __init__(self):
+        self.requests = []
+
+    def template(self, object_type, attributes=None):
+        return {'data': {'type': object_type, 'attributes': attributes or {}}}
+
+    def post(self, url, payload):
+        self.requests.append(('POST', url))
+        return {'data': dict(payload['data'], id='900')}
+
+    def patch(self, url, payload):
+        self.requests.append(('PATCH', url))
+        return {'data': dict(payload['data'], id=url.split('/')[4])}
+
+
+def person_f1():
+    return SimpleNamespace(
+        id=7, first_name='Ann', last_name='Lee', goes_by_name='', gender='Female', birthdate='1980-01-01',
+        status='CTB', full_name=lambda: 'Ann Lee', get_dob_yyyy_mm_dd_format=lambda: '1980-01-01',
+        phones=[Phone('555-555-0100', 'Mobile Phone', '5555550100'), Phone('555-555-0199', 'Home Phone', '5555550199')],
+        emails=[Email('ann@example.com', 'Email', 'ann@example.com')],
+        addresses=[])
+
+
+def person_pco():
+    return {'data': {'id': '55', 'attributes': {'status': 'active'}}, 'included': [
+        {'type': 'PhoneNumber', 'id': '1', 'attributes': {'number': '(555) 555-0100'}},
+        {'type': 'FieldDatum', 'id': '3', 'relationships': {'field_definition': {'data': {'id': '100'}}}},
+    ]}
+
+
+ATTRIBUTES = [
+    ({'startDate': '2019-09-01T00:00:00', 'createdDate': None}, {'pco_data_type': 'field_data', 'pco_id': 100}),
+    ({'startDate': '2010-06-12T00:00:00', 'createdDate': None}, {'pco_data_type': 'wed_anniversary', 'pco_id': None}),
+]
+
+
+def test_a_plan_only_holds_the_changes():
+    plan = pco.plan_person(person_f1(), person_pco(), ATTRIBUTES)
+    assert plan['pco_id'] == '55'
+    assert plan['person']['status'] == 'active'
+    assert [phone['number'] for phone in plan['phone_numbers']] == ['555-555-0199']
+    assert [email['address'] for email in plan['emails']] == ['ann@example.com']
+    assert plan['field_data'] == [{'id': 3, 'template': {'value': '2019-09-01', 'field_definition_id': 100}}]
+    assert plan['anniversary'] == '2010-06-12'
+    assert plan_writes(plan) == 4
+
+
+def test_a_written_plan_is_applied_without_reading_pco(tmp_path, monkeypatch):
+    path = str(tmp_path / "plan.jsonl")
+    writer = PlanWriter(path)
+    writer.write(pco.plan_person(person_f1(), person_pco(), ATTRIBUTES))
+    writer.write(pco.plan_person(person_f1(), None))
+    writer.close()
+    assert writer.summary().startswith("2 people (1 new, 1 updated), 8 writes planned")
+
+    client = FakePCO()
+    monkeypatch.setattr(pco, 'pco', client)
+    monkeypatch.setattr(pco, 'field_definitions', {100: {'attributes': {'name': 'Baptism'}}})
+    journal = Journal(str(tmp_path / "normal.db"))
+    results = [pco.apply_plan(plan, journal) for plan in read_plan(path)]
+    assert [existed for _, existed in results] == [True, False]
+    assert client.requests == [
+        ('PATCH', '/people/v2/people/55'),
+        ('POST', '/people/v2/people/55/phone_numbers'),
+        ('POST', '/people/v2/people/55/emails'),
+        ('PATCH', '/people/v2/field_data/3'),
+        ('POST', '/people/v2/people'),
+        ('POST', '/people/v2/people/900/phone_numbers'),
+        ('POST', '/people/v2/people/900/phone_numbers'),
+        ('POST', '/people/v2/people/900/emails'),
+    ]
+    assert journal.pco_ids() == {} and journal.finished() == {7}
+    journal.close()
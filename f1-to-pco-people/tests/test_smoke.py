@@ -0,0 +1,89 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MIGRATE = os.path.join(HERE, '..', 'migrate.py')
+STAND_INS = os.path.join(HERE, '..', '..', 'stand-ins')
+
+PEOPLE = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Stand-in on port {port} exited with {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Stand-in on port {port} didn't start")
+
+
+@pytest.fixture
+def stand_ins():
+    """(F1 url, PCO url) of both stand-ins, serving the same PEOPLE"""
+    f1_port, pco_port = free_port(), free_port()
+    servers = [
+        (f1_port, subprocess.Popen([sys.executable, 'f1_server.py', '--port', str(f1_port), '-n', str(PEOPLE)],
+                                   cwd=STAND_INS, stdout=subprocess.DEVNULL)),
+        (pco_port, subprocess.Popen([sys.executable, 'pco_server.py', '--port', str(pco_port), '-n', str(PEOPLE),
+                                     '--rate-limit', '0'], cwd=STAND_INS, stdout=subprocess.DEVNULL)),
+    ]
+    try:
+        for port, process in servers:
+            wait_for(port, process)
+        yield f"http://127.0.0.1:{f1_port}", f"http://127.0.0.1:{pco_port}"
+    finally:
+        for _, process in servers:
+            process.terminate()
+            process.wait()
+
+
+def test_a_migration_against_the_stand_ins(tmp_path, stand_ins):
+    f1_url, pco_url = stand_ins
+    (tmp_path / "data_files").mkdir()
+    (tmp_path / "out_files").mkdir()
+    subprocess.run([sys.executable, 'make_normal_db.py', '-n', str(PEOPLE),
+                    '-o', str(tmp_path / "data_files" / "normal.db")], cwd=STAND_INS, check=True, stdout=subprocess.DEVNULL)
+
+    # An empty gazetteer keeps the run off the network
+    (tmp_path / "gazetteer.csv").write_text("street,city,state,zip,x,y\n")
+
+    env = dict(os.environ, F1_BASE_URL=f1_url, PCO_API_BASE=pco_url, F1_KEY_P='key', F1_SECRET_P='secret',
+               F1_USER='user', F1_PASS='pass', PCO_KEY='key', PCO_SECRET='secret')
+    # Metrics that can't be written are logged without losing anything else
+    run = subprocess.run([sys.executable, os.path.abspath(MIGRATE), '--gazetteer', 'gazetteer.csv', '-w', '4', '-p', '2',
+                          '--metrics', 'missing/metrics.json'],
+                         cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+    assert run.returncode == 0, run.stdout[-2000:] + run.stderr[-2000:]
+
+    # Everyone reached an outcome, and some of them were sent
+    conn = sqlite3.connect(str(tmp_path / "data_files" / "normal.db"))
+    outcomes = dict(conn.execute("SELECT COALESCE(outcome, stage), COUNT(*) FROM migration_journal GROUP BY 1").fetchall())
+    assert sum(outcomes.values()) == PEOPLE
+    assert outcomes.get('complete') and outcomes.get('duplicate')
+    assert 'error' not in outcomes
+
+    with urllib.request.urlopen(f"{pco_url}/__stats") as response:
+        stats = json.load(response)
+    assert any(endpoint.startswith('POST') for endpoint in stats)
+
+    exported = (tmp_path / "out_files" / "people.csv").read_text().splitlines()
+    assert len(exported) == PEOPLE
+    assert "Couldn't write request metrics" in run.stdout + run.stderr
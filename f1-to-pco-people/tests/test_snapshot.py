@@ -0,0 +1,22 @@
+from utils.snapshot import PersonSnapshot
+
+
+def test_a_snapshot_sorts_included_records_by_type():
+    person = {'data': {'id': '1'}, 'included': [
+        {'type': 'Email', 'id': '10', 'attributes': {'address': 'ann@example.com'}},
+        {'type': 'PhoneNumber', 'id': '11', 'attributes': {'number': '555-555-0100'}},
+        {'type': 'FieldDatum', 'id': '12'},
+        {'type': 'Household', 'id': '13'},
+    ]}
+    snapshot = PersonSnapshot(person)
+    assert [email['id'] for email in snapshot.emails] == ['10']
+    assert [phone['id'] for phone in snapshot.phone_numbers] == ['11']
+    assert [datum['id'] for datum in snapshot.field_data] == ['12']
+    assert snapshot.addresses == []
+
+
+def test_a_new_person_has_an_empty_snapshot_that_grows():
+    snapshot = PersonSnapshot(None)
+    snapshot.add({'type': 'Address', 'id': '20'})
+    snapshot.add(None)
+    assert [address['id'] for address in snapshot.addresses] == ['20']
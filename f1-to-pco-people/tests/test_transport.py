@@ -0,0 +1,46 @@
+import requests
+
+from utils import transport
+
+
+def test_sessions_pool_as_many_connections_as_configured(monkeypatch):
+    monkeypatch.setattr(transport, 'POOL_SIZE', transport.POOL_SIZE)
+    transport.configure(24)
+    session = transport.new_session()
+    for prefix in ['https://', 'http://']:
+        adapter = session.get_adapter(prefix + 'example.com')
+        assert isinstance(adapter, transport.TimeoutAdapter)
+        assert adapter.poolmanager.connection_pool_kw['maxsize'] == 24
+    assert session.headers['Accept-Encoding'] == 'gzip, deflate'
+
+    # Nothing to configure keeps the size there is
+    transport.configure(None)
+    assert transport.POOL_SIZE == 24
+
+
+def test_idempotent_requests_retry_server_errors_but_not_rate_limits():
+    retry = transport.new_session(retries=2).get_adapter('https://example.com').max_retries
+    assert isinstance(retry, transport.JitteredRetry)
+    assert retry.total == 2
+    assert retry.is_retry('GET', 503)
+    assert not retry.is_retry('GET', 429)
+    assert not retry.is_retry('POST', 503)
+
+
+def test_backoff_is_jittered_below_the_exponential_backoff():
+    retry = transport.JitteredRetry(total=5, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment('GET', '/', error=requests.exceptions.ConnectionError())
+    backoffs = {retry.get_backoff_time() for _ in range(50)}
+    assert all(0 <= backoff <= 4 for backoff in backoffs)
+    assert len(backoffs) > 1
+
+
+def test_requests_get_the_default_timeout(monkeypatch):
+    sent = {}
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, 'send', lambda self, request, **kwargs: sent.update(kwargs))
+    adapter = transport.TimeoutAdapter(timeout=5)
+    adapter.send(None)
+    assert sent['timeout'] == 5
+    adapter.send(None, timeout=1)
+    assert sent['timeout'] == 1
@@ -0,0 +1,157 @@
+import logging
+import numpy
+import streetaddress
+
+from collections import namedtuple
+
+logger = logging.getLogger()
+
+parser = streetaddress.StreetAddressParser()
+
+EARTH_RADIUS = 6371  # km
+
+# Geocoded points closer than this are the same place
+MATCH_RADIUS = 0.5  # km
+
+# Scores at or above this are treated as the same address
+MATCH_SCORE = 0.6
+
+# Spellings that should compare equal once normalized
+ABBREVIATIONS = {
+    'avenue': 'ave', 'av': 'ave',
+    'street': 'st', 'str': 'st',
+    'place': 'pl',
+    'road': 'rd',
+    'boulevard': 'blvd',
+    'drive': 'dr',
+    'lane': 'ln',
+    'court': 'ct',
+    'parkway': 'pkwy',
+    'terrace': 'ter',
+    'highway': 'hwy',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'apartment': 'apt', 'suite': 'ste', 'floor': 'fl',
+}
+
+CanonicalAddress = namedtuple('CanonicalAddress', ['number', 'street', 'unit', 'city', 'zip5', 'zip4', 'matched', 'coordinates', 'text'])
+AddressMatch = namedtuple('AddressMatch', ['score', 'reasons', 'candidate'])
+
+
+def canonical_address(street, zip, geocode=None, city=None):
+    """Parse an address into the pieces used to compare it
+
+    :param street: the full street line (including any unit)
+    :type street: string
+    :param zip: a 5 digit ZIP or ZIP+4 in any format
+    :type zip: string
+    :param geocode: a Census-shaped geocoder payload for the address
+    :type geocode: dict
+    :param city: the address's city
+    :type city: string
+    :returns: CanonicalAddress"""
+    street = ' '.join((street or '').split())
+    parsed = parser.parse(street) if street else {}
+
+    digits = ''.join(char for char in (zip or '') if char.isdigit())
+
+    matches = (geocode or {}).get('result', {}).get('addressMatches', [])
+    matched = {normalize_words(match['matchedAddress']) for match in matches}
+    coordinates = [(match['coordinates']['x'], match['coordinates']['y']) for match in matches]
+
+    return CanonicalAddress(
+        number=normalize_words(parsed.get('house')),
+        street=normalize_words(parsed.get('street_full')),
+        unit=normalize_words(parsed.get('suite_num')),
+        city=normalize_words(city),
+        zip5=digits[:5],
+        zip4=digits[5:9],
+        matched=matched,
+        coordinates=coordinates,
+        text=street,
+    )
+
+
+def compare_addresses(address, candidates):
+    """Find the candidate most like an address
+
+    :param address: the address being sent
+    :type address: CanonicalAddress
+    :param candidates: the addresses it might already be
+    :type candidates: list of CanonicalAddress
+    :returns: the best AddressMatch at or above MATCH_SCORE, or None"""
+    matches = score_addresses(address, candidates)
+    if not matches:
+        return None
+
+    best = max(matches, key=lambda match: match.score)
+    logger.debug(f"Best match for {address.text}: {best.candidate.text} ({best.score:.2f} - {', '.join(best.reasons)})")
+    return best if best.score >= MATCH_SCORE else None
+
+
+def score_addresses(address, candidates):
+    """Score an address against every candidate, explaining each score"""
+    distances = nearest_distances(address, candidates)
+
+    matches = []
+    for candidate, distance in zip(candidates, distances.tolist()):
+        score = 0.0
+        reasons = []
+
+        if address.matched & candidate.matched:
+            score = max(score, 1.0)
+            reasons.append("same geocoded address")
+
+        if address.number and address.street and (address.number, address.street) == (candidate.number, candidate.street):
+            same_unit = address.unit == candidate.unit
+            same_zip = bool(address.zip5) and address.zip5 == candidate.zip5
+            same_city = bool(address.city) and address.city == candidate.city
+
+            # The same street can be in any number of towns, so the ZIP,
+            #   city or geocodes have to agree as well
+            if same_zip or same_city or distance < MATCH_RADIUS:
+                score = max(score, 0.7 + 0.15 * same_unit + 0.15 * same_zip)
+                reasons.append("same street number and name")
+                if same_unit:
+                    reasons.append("same unit")
+                if same_zip:
+                    reasons.append("same ZIP")
+                if same_city:
+                    reasons.append("same city")
+            else:
+                reasons.append("same street number and name in a different ZIP and city")
+
+        if distance < MATCH_RADIUS:
+            score = max(score, 1.0 - 0.4 * distance / MATCH_RADIUS)
+            reasons.append(f"{distance:.3f}km apart")
+
+        matches.append(AddressMatch(score, reasons, candidate))
+
+    return matches
+
+
+def nearest_distances(address, candidates):
+    """The closest distance (km) between the address and each candidate's geocodes"""
+    distances = numpy.full(len(candidates), numpy.inf)
+    if not address.coordinates:
+        return distances
+
+    # Flatten every candidate point, remembering who it belongs to
+    owners = [i for i, candidate in enumerate(candidates) for _ in candidate.coordinates]
+    if not owners:
+        return distances
+    points = numpy.radians([point for candidate in candidates for point in candidate.coordinates])
+    origins = numpy.radians(address.coordinates)
+
+    # Haversine between every origin (rows) and every point (columns)
+    dlon = points[:, 0][None, :] - origins[:, 0][:, None]
+    dlat = points[:, 1][None, :] - origins[:, 1][:, None]
+    a = numpy.sin(dlat / 2) ** 2 + numpy.cos(origins[:, 1])[:, None] * numpy.cos(points[:, 1])[None, :] * numpy.sin(dlon / 2) ** 2
+    closest = (2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.clip(a, 0, 1)))).min(axis=0)
+
+    numpy.minimum.at(distances, owners, closest)
+    return distances
+
+
+def normalize_words(value):
+    words = (value or '').lower().replace('.', '').replace(',', ' ').replace('#', ' ').split()
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger()
+
+DAY = 24 * 60 * 60
+
+# How long each kind of F1 response stays fresh (first match wins)
+DEFAULT_TTLS = [
+    (r'^/v1/People/\d+/Attributes\.json', 1 * DAY),
+    (r'^/v1/People/\d+/Communications\.json', 7 * DAY),
+    (r'^/v1/People/\d+/Addresses\.json', 7 * DAY),
+    (r'^/v1/People/\d+\.json', 7 * DAY),
+]
+DEFAULT_TTL = 1 * DAY
+
+# Only check the size of the cache every so often
+EVICTION_INTERVAL = 500
+
+# Hits whose access times are kept in memory before they're written
+ACCESS_FLUSH_INTERVAL = 1000
+
+
+class ResponseCache:
+    """A persistent cache of F1 responses stored in SQLite
+
+    Response bodies are stored once per unique content (keyed by their
+    SHA-256) and referenced by the endpoints that returned them. Entries
+    expire after a per-endpoint TTL and the least recently used entries are
+    evicted once the bodies grow past max_bytes.
+    """
+
+    def __init__(self, path, ttls=DEFAULT_TTLS, default_ttl=DEFAULT_TTL, max_bytes=1024 ** 3, refresh=False):
+        """Open (or create) the cache
+
+        :param path: the SQLite file to store responses in
+        :type path: string
+        :param ttls: (endpoint regex, seconds) pairs, checked in order
+        :type ttls: list
+        :param default_ttl: seconds to keep endpoints that match no TTL
+        :type default_ttl: int
+        :param max_bytes: the size of bodies to keep before evicting
+        :type max_bytes: int
+        :param refresh: ignore cached responses but keep storing new ones
+        :type refresh: bool"""
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        # Access times waiting to be written, so a hit doesn't cost a commit
+        self.accessed = {}
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_bodies (
+                digest TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                digest TEXT NOT NULL REFERENCES cache_bodies (digest),
+                status_code INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_entries_accessed_at ON cache_entries (accessed_at);
+            CREATE INDEX IF NOT EXISTS cache_entries_digest ON cache_entries (digest);
+        """)
+
+    def get(self, endpoint, params=None):
+        """Return a fresh cached response for an endpoint, or None"""
+        if self.refresh:
+            self.count_miss()
+            return None
+
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT cache_entries.status_code, cache_entries.stored_at, cache_bodies.content
+                FROM cache_entries JOIN cache_bodies USING (digest)
+                WHERE cache_entries.key = ?
+            """, (key,)).fetchone()
+
+            if not row or now - row[1] > self.ttl(endpoint):
+                self.misses += 1
+                return None
+
+            self.accessed[key] = now
+            if len(self.accessed) >= ACCESS_FLUSH_INTERVAL:
+                self.write_access_times()
+                self.conn.commit()
+            self.hits += 1
+
+        return CachedResponse(row[2], row[0])
+
+    def put(self, endpoint, params, response):
+        """Store a successful response for an endpoint"""
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        now = time.time()
+        with self.lock:
+            self.accessed.pop(cache_key(endpoint, params), None)
+            self.conn.execute("INSERT OR IGNORE INTO cache_bodies (digest, content, size) VALUES (?, ?, ?)",
+                              (digest, content, len(content)))
+            self.conn.execute("""
+                INSERT OR REPLACE INTO cache_entries (key, endpoint, digest, status_code, stored_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cache_key(endpoint, params), endpoint, digest, response.status_code, now, now))
+            self.conn.commit()
+
+            self.writes += 1
+            if self.writes % EVICTION_INTERVAL == 0:
+                self.evict()
+
+    def invalidate(self, prefix=''):
+        """Drop every entry whose endpoint starts with prefix"""
+        with self.lock:
+            deleted = self.conn.execute("DELETE FROM cache_entries WHERE substr(endpoint, 1, ?) = ?",
+                                        (len(prefix), prefix)).rowcount
+            self.remove_orphans()
+            self.conn.commit()
+        logger.info(f"Invalidated {deleted} cached F1 responses starting with '{prefix}'")
+        return deleted
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits (lock must be held)"""
+        self.write_access_times()
+        size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_bodies").fetchone()[0]
+        if size <= self.max_bytes:
+            self.conn.commit()
+            return
+
+        # Walk entries from oldest to newest, freeing bodies no one else uses
+        evicted = 0
+        rows = self.conn.execute("""
+            SELECT cache_entries.key, cache_entries.digest, cache_bodies.size
+            FROM cache_entries JOIN cache_bodies USING (digest)
+            ORDER BY cache_entries.accessed_at
+        """).fetchall()
+        for key, digest, body_size in rows:
+            if size <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            users = self.conn.execute("SELECT COUNT(*) FROM cache_entries WHERE digest = ?", (digest,)).fetchone()[0]
+            if users == 0:
+                self.conn.execute("DELETE FROM cache_bodies WHERE digest = ?", (digest,))
+                size -= body_size
+            evicted += 1
+
+        self.conn.commit()
+        logger.debug(f"Evicted {evicted} cached F1 responses")
+
+    def write_access_times(self):
+        """Write the access times of recent hits (lock must be held, caller commits)"""
+        if self.accessed:
+            self.conn.executemany("UPDATE cache_entries SET accessed_at = ? WHERE key = ?",
+                                  [(accessed_at, key) for key, accessed_at in self.accessed.items()])
+            self.accessed = {}
+
+    def remove_orphans(self):
+        self.conn.execute("""
+            DELETE FROM cache_bodies
+            WHERE digest NOT IN (SELECT digest FROM cache_entries)
+        """)
+
+    def ttl(self, endpoint):
+        for pattern, ttl in self.ttls:
+            if pattern.search(endpoint):
+                return ttl
+        return self.default_ttl
+
+    def count_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        with self.lock:
+            self.write_access_times()
+            self.conn.commit()
+            self.conn.close()
+
+
+class CachedResponse:
+    """Enough of a requests.Response for the callers of F1API.get"""
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def __bool__(self):
+        return self.status_code < 300
+
+
+def cache_key(endpoint, params=None):
+    if not params:
+        return endpoint
+    return f"{endpoint}?{json.dumps(params, sort_keys=True, default=str)}"
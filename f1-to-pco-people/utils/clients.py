@@ -0,0 +1,64 @@
+import threading
+
+
+class LazyClient:
+    """Stands in for an API client until something actually uses it
+
+    The client is built by its factory on the first attribute read, once,
+    and then shared by every thread. Attributes set before that (like
+    f1.cache) are held and applied to the client when it's built, so
+    configuring a client never connects to anything. Tests and benchmarks
+    can swap in their own factory or an already built client.
+    """
+
+    def __init__(self, factory):
+        """Wrap a factory
+
+        :param factory: called with no arguments to build the client
+        :type factory: callable"""
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_client', None)
+        object.__setattr__(self, '_settings', {})
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def build_client(self):
+        """The client, built now if it hasn't been yet"""
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._client is None:
+                client = self._factory()
+                for name, value in self._settings.items():
+                    setattr(client, name, value)
+                object.__setattr__(self, '_client', client)
+            return self._client
+
+    def use_client(self, client):
+        """Use an already built client instead of calling the factory"""
+        with self._lock:
+            for name, value in self._settings.items():
+                setattr(client, name, value)
+            object.__setattr__(self, '_client', client)
+
+    def set_factory(self, factory):
+        """Build the client with a different factory (dropping any built one)"""
+        with self._lock:
+            object.__setattr__(self, '_factory', factory)
+            object.__setattr__(self, '_client', None)
+
+    def is_built(self):
+        return self._client is not None
+
+    def __getattr__(self, name):
+        # Settings can be read back without building the client
+        if self._client is None and name in self._settings:
+            return self._settings[name]
+        return getattr(self.build_client(), name)
+
+    def __setattr__(self, name, value):
+        with self._lock:
+            self._settings[name] = value
+            if self._client is not None:
+                setattr(self._client, name, value)
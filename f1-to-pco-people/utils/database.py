@@ -0,0 +1,193 @@
+import json
+import logging
+import sqlite3
+
+from array import array
+
+from sqlite3 import Error
+
+logger = logging.getLogger()
+
+# Indexes the grouping queries below rely on
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS fetched_communications_person_id ON fetched_communications (person_id)",
+    "CREATE INDEX IF NOT EXISTS fetched_addresses_person_id ON fetched_addresses (person_id)",
+]
+
+# How many people are read (and have their details grouped) at a time
+CHUNK_SIZE = 500
+
+# The tables details fetched from F1 are kept in, shaped the way PersonF1 reads them locally
+FETCHED_TABLES = """
+    CREATE TABLE IF NOT EXISTS fetched_people (
+        id INTEGER PRIMARY KEY,
+        household_id INTEGER,
+        firstName TEXT,
+        middleName TEXT,
+        lastName TEXT,
+        goesByName TEXT,
+        gender TEXT,
+        dateOfBirth TEXT,
+        status TEXT,
+        maritalStatus TEXT,
+        lastUpdatedDate TEXT
+    );
+    CREATE TABLE IF NOT EXISTS fetched_communications (
+        person_id INTEGER,
+        communicationGeneralType TEXT,
+        communicationValue TEXT,
+        communicationType TEXT
+    );
+    CREATE TABLE IF NOT EXISTS fetched_addresses (
+        person_id INTEGER,
+        address1 TEXT,
+        address2 TEXT,
+        address3 TEXT,
+        city TEXT,
+        postalCode TEXT,
+        stProvince TEXT
+    );
+"""
+
+
+def create_connection(db_file):
+    """ create a database connection to a SQLite database """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_file)
+        logger.info("Connected to " + db_file)
+    except Error as e:
+        logger.error(e)
+
+    return conn
+
+
+def dict_factory(cursor, row):
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
+def ensure_fetched_tables(conn):
+    conn.executescript(FETCHED_TABLES)
+
+
+def ensure_indexes(conn):
+    for index in INDEXES:
+        conn.execute(index)
+    conn.commit()
+
+
+def people_query(start, end, ids, select):
+    """ build the query for people[start:end], optionally limited to ids """
+    query = f"""
+        SELECT {select} FROM people
+        WHERE rowid IN (SELECT rowid FROM people ORDER BY rowid LIMIT ? OFFSET ?)
+    """
+    # A negative LIMIT means no limit, so an end before start selects nobody
+    params = [max(end - start, 0) if end >= 0 else -1, start]
+
+    if ids:
+        query += " AND CAST(id AS INTEGER) IN (SELECT CAST(value AS INTEGER) FROM json_each(?))"
+        params.append(json.dumps(list(ids)))
+
+    return query, params
+
+
+def count_people(conn, start=0, end=-1, ids=None):
+    """ count the people iter_people would return """
+    query, params = people_query(start, end, ids, "COUNT(*)")
+    return conn.execute(query, params).fetchone()[0]
+
+
+def unfetched_ids(conn, start=0, end=-1, ids=None):
+    """ the ids iter_people would return that have no row in fetched_people """
+    query, params = people_query(start, end, ids, "CAST(id AS INTEGER)")
+    query += " AND CAST(id AS INTEGER) NOT IN (SELECT id FROM fetched_people)"
+    return [row[0] for row in conn.execute(query, params)]
+
+
+def store_fetched(conn, people, communications, addresses):
+    """ replace the fetched rows of everyone in people
+
+    :param people: fetched_people rows as dicts
+    :param communications: fetched_communications rows as dicts
+    :param addresses: fetched_addresses rows as dicts"""
+    if not people:
+        return
+
+    person_ids = [person['id'] for person in people]
+    placeholders = ', '.join('?' * len(person_ids))
+    conn.execute(f"DELETE FROM fetched_communications WHERE person_id IN ({placeholders})", person_ids)
+    conn.execute(f"DELETE FROM fetched_addresses WHERE person_id IN ({placeholders})", person_ids)
+
+    for table, rows, replace in [("fetched_people", people, "OR REPLACE "),
+                                 ("fetched_communications", communications, ""),
+                                 ("fetched_addresses", addresses, "")]:
+        if not rows:
+            continue
+        columns = list(rows[0].keys())
+        conn.executemany(f"INSERT {replace}INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                         [[row[column] for column in columns] for row in rows])
+    conn.commit()
+
+
+def iter_people(conn, start=0, end=-1, ids=None, include_fetched=False, chunk_size=CHUNK_SIZE):
+    """Stream people, optionally with the details already fetched from F1
+
+    The selected rowids are read up front, then rows are read chunk_size at
+    a time and each chunk's details, communications and addresses are pulled
+    with one query per table, so memory stays flat no matter how many people
+    are selected. Every query is read to the end before anything is yielded,
+    so no read is left open on normal.db while the migration runs and the
+    journal can commit to the same file.
+
+    :param conn: a connection to normal.db
+    :param start: the first row of the people table to return
+    :type start: int
+    :param end: the row to stop before (-1 for the end of the table)
+    :type end: int
+    :param ids: only return people with these F1 ids
+    :type ids: list
+    :param include_fetched: also return the fetched_* rows for each person
+    :type include_fetched: bool
+    :returns: (person, details, communications, addresses) for each person"""
+    query, params = people_query(start, end, ids, "rowid")
+    rowids = array('q', (row[0] for row in conn.execute(query + " ORDER BY rowid", params)))
+
+    for offset in range(0, len(rowids), chunk_size):
+        people = select_for(conn, "people", "rowid", rowids[offset:offset + chunk_size].tolist(), "ORDER BY rowid").fetchall()
+
+        if not include_fetched:
+            for person in people:
+                yield person, None, None, None
+            continue
+
+        person_ids = [int(person['id']) for person in people]
+        details = {row['id']: row for row in select_for(conn, "fetched_people", "id", person_ids)}
+        communications = group_by_person(select_for(conn, "fetched_communications", "person_id", person_ids))
+        addresses = group_by_person(select_for(conn, "fetched_addresses", "person_id", person_ids))
+
+        for person, person_id in zip(people, person_ids):
+            yield person, details.get(person_id), communications.get(person_id, []), addresses.get(person_id, [])
+
+
+def select_for(conn, table, column, person_ids, order=""):
+    cursor = conn.cursor()
+    cursor.row_factory = dict_factory
+    placeholders = ', '.join('?' * len(person_ids))
+    return cursor.execute(f"SELECT * FROM {table} WHERE {column} IN ({placeholders}) {order}", person_ids)
+
+
+def group_by_person(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(int(row['person_id']), []).append(row)
+    return grouped
+
+
+def field_mappings(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = dict_factory
+    return cursor.execute("SELECT * FROM field_mapping").fetchall()
@@ -0,0 +1,137 @@
+import logging
+import threading
+
+from .normalize import national_number, normalize
+
+logger = logging.getLogger()
+
+# Related records pulled down with each person (everything a plan compares against)
+INCLUDES = ['emails', 'phone_numbers', 'addresses', 'field_data']
+
+
+class PeopleDirectory:
+    """A local copy of every person in Planning Center
+
+    The directory is paged down once and then answers the same questions
+    find_person would otherwise ask the PCO search API, person by person.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.by_name = {}
+        self.lock = threading.Lock()
+
+    def load(self, pco, progress=None, per_page=100):
+        """Page every person (and their contact details) into the directory
+
+        :param pco: the PCO client
+        :type pco: pypco.PCO
+        :param progress: an optional counter updated for each person
+        :type progress: enlighten.Counter
+        :param per_page: how many people to request per page
+        :type per_page: int"""
+        logger.info("Prefetching people from Planning Center")
+        for record in pco.iterate('/people/v2/people', per_page=per_page, include=','.join(INCLUDES)):
+            self.add(record)
+            if progress:
+                progress.update()
+        logger.info(f"Prefetched {len(self.entries)} people from Planning Center")
+
+    def add(self, record):
+        """Add (or replace) a person using a PCO response"""
+        entry = DirectoryEntry(record)
+        with self.lock:
+            previous = self.entries.pop(entry.id, None)
+            if previous:
+                for key in previous.keys():
+                    self.by_name[key].remove(previous)
+
+            self.entries[entry.id] = entry
+            for key in entry.keys():
+                self.by_name.setdefault(key, []).append(entry)
+
+    def get(self, pco_id):
+        """The record of the person with a PCO id, or None"""
+        with self.lock:
+            entry = self.entries.get(str(pco_id))
+        return entry.record if entry else None
+
+    def find(self, person):
+        """Find a person the same way find_person searches PCO
+
+        Each detail (birthdate, then emails, then phones) is tried against
+        the first name, given name and goes-by name in turn. The first search
+        that matches exactly one person wins.
+
+        :param person: the person to look for
+        :type person: PersonF1
+        :returns: the matching PCO record or None"""
+        last_name = person.last_name_key or ''
+        names = [
+            ('first_name', person.first_name),
+            ('given_name', person.first_name),
+            ('first_name', person.goes_by_name),
+            ('given_name', person.goes_by_name),
+        ]
+
+        details = [('birthdate', person.get_dob_yyyy_mm_dd_format())]
+        details += [('email', email.key) for email in person.emails]
+        details += [('phone', phone.key) for phone in person.phones]
+
+        with self.lock:
+            for kind, value in details:
+                if not value:
+                    continue
+
+                for field, first_name in names:
+                    if not first_name:
+                        continue
+
+                    candidates = self.by_name.get((field, normalize(first_name) or '', last_name), [])
+                    matches = [entry for entry in candidates if entry.matches(kind, value)]
+                    if len(matches) == 1:
+                        return matches[0].record
+
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DirectoryEntry:
+    """A PCO person along with the details used to match them"""
+
+    def __init__(self, record):
+        self.record = record
+        self.id = record['data']['id']
+
+        attributes = record['data']['attributes']
+        # Normalized the same way PersonF1 normalizes the F1 side
+        self.first_name = normalize(attributes.get('first_name')) or ''
+        self.given_name = normalize(attributes.get('given_name')) or ''
+        self.last_name = normalize(attributes.get('last_name')) or ''
+        self.birthdate = attributes.get('birthdate')
+
+        self.emails = set()
+        self.phones = set()
+        for included in record.get('included') or []:
+            if included['type'] == 'Email':
+                self.emails.add(normalize(included['attributes']['address']))
+            if included['type'] == 'PhoneNumber':
+                self.phones.add(national_number(included['attributes']['number']))
+
+    def keys(self):
+        keys = [('first_name', self.first_name, self.last_name)]
+        if self.given_name:
+            keys.append(('given_name', self.given_name, self.last_name))
+        return keys
+
+    def matches(self, kind, value):
+        if kind == 'birthdate':
+            return self.birthdate == value
+        # Emails and phones arrive already normalized by PersonF1
+        if kind == 'email':
+            return value in self.emails
+        if kind == 'phone':
+            return value in self.phones
+        return False
@@ -0,0 +1,55 @@
+import logging
+
+logger = logging.getLogger()
+
+
+class DuplicateIndex:
+    """An index of every person checked so far
+
+    Each person is keyed on their normalized first and last name paired with
+    one identifying detail (DOB, email, phone or address). Anyone sharing a
+    key with an earlier person is a duplicate, no matter how far apart they
+    are in the data set.
+    """
+
+    def __init__(self):
+        self.keys = {}
+
+    def check(self, person, keys=None):
+        """Index a person and return the id of the person they duplicate
+
+        :param person: the person to check
+        :type person: PersonF1
+        :param keys: the person's keys, if they've already been worked out
+        :type keys: set
+        :returns: the id of the first person sharing a key, or None"""
+        duplicate_of = None
+        for key in person_keys(person) if keys is None else keys:
+            first_id = self.keys.setdefault(key, person.id)
+            if duplicate_of is None and first_id != person.id:
+                duplicate_of = first_id
+
+        return duplicate_of
+
+    def add(self, person_id, keys):
+        """Index the keys of someone who isn't being checked again (e.g. finished in an earlier run)"""
+        for key in keys:
+            self.keys.setdefault(tuple(key), person_id)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def person_keys(person):
+    # Everything here was normalized when the person was built
+    if not person.first_name_key or not person.last_name_key:
+        return set()
+
+    details = set()
+    if person.birthdate:
+        details.add(('dob', person.birthdate))
+    details.update(('email', email.key) for email in person.emails if email.key)
+    details.update(('phone', phone.key) for phone in person.phones if phone.key)
+    details.update(('address', address.key) for address in person.addresses if address.key)
+
+    return {(person.first_name_key, person.last_name_key, kind, value) for kind, value in details}
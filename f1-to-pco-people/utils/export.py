@@ -0,0 +1,159 @@
+import csv
+import logging
+import os
+import threading
+
+logger = logging.getLogger()
+
+# The datasets written to out_files/ and their columns, in order
+DATASETS = {
+    'people': ['id', 'household_id', 'first_name', 'middle_name', 'last_name', 'goes_by_name',
+               'gender', 'date_of_birth', 'status', 'marital_status', 'last_updated'],
+    'contacts': ['id', 'household_id', 'general_type', 'value', 'type'],
+    'addresses': ['id', 'household_id', 'address1', 'address2', 'address3', 'city', 'postal_code', 'state'],
+    'attributes': ['id', 'household_id', 'attribute_id', 'group', 'name', 'start_date', 'end_date', 'comment'],
+}
+
+FORMATS = ['csv', 'parquet']
+
+# Rows held for a dataset before they're written out in one block (kept
+#   small, since buffered rows are lost if the run is killed)
+BATCH_SIZE = 500
+
+
+class Exporter:
+    """Collects the rows PersonF1 exports and writes them in large blocks
+
+    Each dataset keeps its own buffer and lock, so workers adding rows to
+    different datasets never wait on each other, and a block is only ever
+    written by one thread at a time. CSV files are written without a
+    header, the same as before; Parquet files use the DATASETS columns.
+    """
+
+    def __init__(self, directory='out_files', formats=('csv',), batch_size=BATCH_SIZE, append=False):
+        """Open a file in every format for each dataset
+
+        :param directory: where the files are written
+        :type directory: str
+        :param formats: any of FORMATS
+        :type formats: list
+        :param batch_size: rows to buffer per dataset before writing
+        :type batch_size: int
+        :param append: keep the rows earlier runs wrote (for --resume)
+        :type append: bool"""
+        self.batch_size = batch_size
+        self.datasets = {}
+        for dataset, columns in DATASETS.items():
+            sinks = [sink_for(format, os.path.join(directory, f"{dataset}.{format}"), columns, append) for format in formats]
+            self.datasets[dataset] = DatasetBuffer(sinks)
+
+    def write(self, dataset, row):
+        """Add a row to a dataset, writing a block out if the buffer is full"""
+        self.datasets[dataset].add([row], self.batch_size)
+
+    def write_many(self, dataset, rows):
+        """Add several rows to a dataset at once"""
+        self.datasets[dataset].add(list(rows), self.batch_size)
+
+    def flush(self):
+        for buffer in self.datasets.values():
+            buffer.flush()
+
+    def summary(self):
+        return ', '.join(f"{dataset}: {buffer.written}" for dataset, buffer in self.datasets.items())
+
+    def close(self):
+        """Write anything still buffered and close every file"""
+        for buffer in self.datasets.values():
+            buffer.close()
+
+
+class DatasetBuffer:
+    """The buffered rows of one dataset and the files they go to"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.rows = []
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def add(self, rows, batch_size):
+        with self.lock:
+            self.rows.extend(rows)
+            if len(self.rows) >= batch_size:
+                self.write()
+
+    def flush(self):
+        with self.lock:
+            self.write()
+
+    def write(self):
+        # Only called with the lock held
+        if not self.rows:
+            return
+        for sink in self.sinks:
+            sink.write(self.rows)
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        with self.lock:
+            self.write()
+            for sink in self.sinks:
+                sink.close()
+
+
+class CsvSink:
+    def __init__(self, path, columns, append=False):
+        self.file = open(path, mode='a' if append else 'w', newline='')
+        self.writer = csv.writer(self.file, delimiter=',')
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes each block as a row group of string columns
+
+    A Parquet file can't be added to once it's closed, so when appending
+    the rows go to the next free part file (people.1.parquet, ...) beside it.
+    """
+
+    def __init__(self, path, columns, append=False):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("pyarrow is needed to export Parquet (pip install pyarrow)")
+
+        self.pyarrow = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+
+        if append:
+            stem, extension = os.path.splitext(path)
+            part = 0
+            while os.path.exists(path):
+                part += 1
+                path = f"{stem}.{part}{extension}"
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        # Transpose the rows into one array per column
+        columns = [[None if value is None else str(value) for value in column] for column in zip(*rows)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=self.pyarrow.string()) for column in columns], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def sink_for(format, path, columns, append=False):
+    if format == 'csv':
+        return CsvSink(path, columns, append)
+    if format == 'parquet':
+        return ParquetSink(path, columns, append)
+    raise ValueError(f"Unknown export format {format}")
@@ -0,0 +1,142 @@
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from . import database
+
+logger = logging.getLogger()
+
+SEARCH_ENDPOINT = '/v1/People/Search.json'
+SEARCH_INCLUDE = 'addresses,communications'
+
+# People requested per page (and per search when searching by id)
+RECORDS_PER_PAGE = 100
+
+# Search leaves inactive and deceased people out unless it's asked not to
+SEARCH_FLAGS = {'includeInactive': 'true', 'includeDeceased': 'true'}
+
+
+def search_people(f1, records_per_page=RECORDS_PER_PAGE, **criteria):
+    """Yield every person matching an F1 People Search
+
+    Each person comes back with their addresses and communications, so one
+    page replaces three requests for every person on it. Raises
+    RuntimeError if a page can't be fetched, rather than stopping short.
+
+    :param f1: the F1 client
+    :type f1: F1API
+    :param records_per_page: how many people to request per page
+    :type records_per_page: int
+    :param criteria: search parameters (e.g. id="1,2,3" or lastUpdatedDate="2020-01-01")"""
+    page = 1
+    while True:
+        params = dict(criteria, include=SEARCH_INCLUDE, recordsPerPage=records_per_page, page=page, **SEARCH_FLAGS)
+        response = f1.get(SEARCH_ENDPOINT, params=params)
+        if not response:
+            raise RuntimeError(f"Error searching FellowshipOne people with {criteria} (page {page})")
+
+        results = json.loads(response.content.decode('utf8')).get('results') or {}
+        yield from as_list(results.get('person'))
+
+        if int(results.get('@additionalPages') or 0) <= 0:
+            return
+        page += 1
+
+
+def fetch_people(f1, conn, person_ids, workers=4, records_per_page=RECORDS_PER_PAGE, progress=None):
+    """Fill the fetched_* tables for person_ids using People Search
+
+    Ids are searched records_per_page at a time, several searches at once.
+    Rows are written from the calling thread as each search finishes. A
+    search that fails is logged and its people are left unfetched, so
+    they're fetched one at a time instead.
+
+    :returns: the number of people stored"""
+    chunks = [person_ids[i:i + records_per_page] for i in range(0, len(person_ids), records_per_page)]
+
+    def search(chunk):
+        try:
+            return list(search_people(f1, records_per_page, id=','.join(str(person_id) for person_id in chunk)))
+        except RuntimeError as e:
+            logger.error(e)
+            return []
+
+    stored = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for people in executor.map(search, chunks):
+            stored += store_people(conn, people)
+            if progress:
+                progress.update(len(people))
+    return stored
+
+
+def fetch_updated(f1, conn, since, records_per_page=RECORDS_PER_PAGE, progress=None):
+    """Refresh the fetched_* tables for everyone updated in F1 since a date
+
+    :param since: the date to search from (YYYY-MM-DD)
+    :type since: str
+    :returns: the number of people stored"""
+    stored = 0
+    people = []
+    for person in search_people(f1, records_per_page, lastUpdatedDate=since):
+        people.append(person)
+        if len(people) >= records_per_page:
+            stored += store_people(conn, people)
+            people = []
+        if progress:
+            progress.update()
+    return stored + store_people(conn, people)
+
+
+def store_people(conn, people):
+    """Flatten People Search results into fetched_* rows and store them"""
+    people_rows, communications, addresses = [], [], []
+    for person in people:
+        person_id = int(person['@id'])
+        people_rows.append({
+            'id': person_id,
+            'household_id': int(person['@householdID']) if person.get('@householdID') else None,
+            'firstName': person.get('firstName'),
+            'middleName': person.get('middleName'),
+            'lastName': person.get('lastName'),
+            'goesByName': person.get('goesByName'),
+            'gender': person.get('gender'),
+            'dateOfBirth': person.get('dateOfBirth'),
+            'status': name_of(person.get('status')),
+            'maritalStatus': person.get('maritalStatus'),
+            'lastUpdatedDate': person.get('lastUpdatedDate'),
+        })
+
+        for communication in as_list((person.get('communications') or {}).get('communication')):
+            communications.append({
+                'person_id': person_id,
+                'communicationGeneralType': communication.get('communicationGeneralType'),
+                'communicationValue': communication.get('communicationValue'),
+                'communicationType': name_of(communication.get('communicationType')),
+            })
+
+        for address in as_list((person.get('addresses') or {}).get('address')):
+            addresses.append({
+                'person_id': person_id,
+                'address1': address.get('address1'),
+                'address2': address.get('address2'),
+                'address3': address.get('address3'),
+                'city': address.get('city'),
+                'postalCode': address.get('postalCode'),
+                'stProvince': address.get('stProvince'),
+            })
+
+    database.store_fetched(conn, people_rows, communications, addresses)
+    return len(people_rows)
+
+
+def as_list(value):
+    # F1's JSON is converted from XML, so a single record isn't wrapped in a list
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def name_of(value):
+    # Lookups like status come back as {"@id": ..., "name": ...}
+    return value.get('name') if isinstance(value, dict) else value
@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from . import transport
+
+logger = logging.getLogger()
+
+CENSUS_URL = "https://geocoding.geo.census.gov/geocoder/locations/address"
+CENSUS_BATCH_URL = "https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
+CENSUS_BENCHMARK = "Public_AR_Current"
+
+# Seconds a "no match" is trusted before the address is looked up again
+NO_MATCH_TTL = 7 * 24 * 3600
+
+# Seconds queued addresses wait after the backend fails before it's tried again
+BACKEND_RETRY = 60
+
+
+class Geocoder:
+    """Geocodes each distinct address at most once
+
+    Results are cached in SQLite by their normalized address, so households
+    sharing an address and later runs reuse them. Addresses can be queued
+    ahead of time and are then geocoded together in a single batch.
+
+    Each entry records the backend that answered and when. A "no match" is
+    only reused by the same backend and for NO_MATCH_TTL seconds, so a
+    gazetteer miss never stops the Census geocoder from trying later.
+    """
+
+    def __init__(self, backend, path=':memory:', batch_size=200):
+        """Create a geocoder
+
+        :param backend: where uncached addresses are looked up
+        :type backend: CensusBackend or GazetteerBackend
+        :param path: the SQLite file to cache results in
+        :type path: string
+        :param batch_size: how many queued addresses to geocode at once
+        :type batch_size: int"""
+        self.backend = backend
+        self.batch_size = batch_size
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.down_until = 0
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                backend TEXT,
+                cached_at REAL
+            )
+        """)
+
+        # Caches from before entries were stamped
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(geocodes)")}
+        for column, type in [('backend', 'TEXT'), ('cached_at', 'REAL')]:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE geocodes ADD COLUMN {column} {type}")
+        self.conn.commit()
+
+    def lookup(self, street, city, state, zip):
+        """Geocode an address, returning a Census-shaped payload"""
+        key = normalize_address(street, city, state, zip)
+        payload = self.cached(key)
+        if payload is not None:
+            with self.lock:
+                self.hits += 1
+            return payload
+
+        # Geocode this address along with everything waiting
+        with self.lock:
+            self.pending.setdefault(key, (street, city, state, zip))
+        self.flush()
+        return self.cached(key) or empty_payload()
+
+    def queue(self, street, city, state, zip):
+        """Remember an address so it is geocoded with the next batch"""
+        key = normalize_address(street, city, state, zip)
+        if self.cached(key) is not None:
+            return
+
+        with self.lock:
+            self.pending[key] = (street, city, state, zip)
+            full = len(self.pending) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Geocode every queued address in one batch"""
+        with self.flush_lock:
+            with self.lock:
+                pending = self.pending
+                self.pending = {}
+
+            # Another thread may have geocoded some of these while we waited
+            pending = {key: address for key, address in pending.items() if self.cached(key) is None}
+            if not pending:
+                return
+
+            # Hold on to everything until the backend has had time to come back
+            if time.monotonic() < self.down_until:
+                self.requeue(pending)
+                return
+
+            logger.debug(f"Geocoding a batch of {len(pending)} addresses")
+            try:
+                results = self.backend.geocode(pending)
+                answered = list(pending)
+            except Exception as e:
+                logger.warning(f"Batch geocoding failed, geocoding one address at a time: {e}")
+                results, answered = self.geocode_each(pending)
+
+            self.store({key: results.get(key) or empty_payload() for key in answered})
+            with self.lock:
+                self.misses += len(answered)
+
+    def geocode_each(self, pending):
+        """Geocode addresses one at a time, requeueing them if the backend is down"""
+        results = {}
+        answered = []
+        for key, address in pending.items():
+            try:
+                results.update(self.backend.geocode({key: address}))
+                answered.append(key)
+            except Exception as e:
+                unanswered = {key: address for key, address in pending.items() if key not in answered}
+                logger.error(f"Geocoding failed, retrying {len(unanswered)} addresses in {BACKEND_RETRY}s: {e}")
+                self.down_until = time.monotonic() + BACKEND_RETRY
+                self.requeue(unanswered)
+                break
+        return results, answered
+
+    def requeue(self, addresses):
+        with self.lock:
+            for key, address in addresses.items():
+                self.pending.setdefault(key, address)
+
+    def cached(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT payload, backend, cached_at FROM geocodes WHERE address = ?", (key,)).fetchone()
+        if not row:
+            return None
+
+        payload, backend, cached_at = json.loads(row[0]), row[1], row[2]
+        if payload['result']['addressMatches']:
+            return payload
+
+        # Only trust a recent "no match" from the backend being used now
+        if backend == self.backend.name and cached_at and time.time() - cached_at < NO_MATCH_TTL:
+            return payload
+        return None
+
+    def store(self, payloads):
+        stamp = time.time()
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO geocodes (address, payload, backend, cached_at) VALUES (?, ?, ?, ?)",
+                                  [(key, json.dumps(payload), self.backend.name, stamp) for key, payload in payloads.items()])
+            self.conn.commit()
+
+    def summary(self):
+        return f"{self.hits} cached, {self.misses} geocoded"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CensusBackend:
+    """Geocodes addresses with the US Census geocoder"""
+    name = 'census'
+
+    def __init__(self, session=None):
+        self.session = session or transport.new_session()
+
+    def geocode(self, addresses):
+        if len(addresses) == 1:
+            key, (street, city, state, zip) = next(iter(addresses.items()))
+            params = {
+                "benchmark": CENSUS_BENCHMARK,
+                "format": "json",
+                "street": street,
+                "city": city,
+                "state": state,
+                "zip": zip
+            }
+            response = self.session.get(url=CENSUS_URL, params=params)
+            return {key: json.loads(response.content.decode('utf8'))}
+
+        # The batch geocoder takes a CSV of "id, street, city, state, zip"
+        keys = list(addresses.keys())
+        upload = io.StringIO()
+        writer = csv.writer(upload)
+        for i, key in enumerate(keys):
+            writer.writerow([i] + list(addresses[key]))
+
+        response = self.session.post(
+            url=CENSUS_BATCH_URL,
+            data={"benchmark": CENSUS_BENCHMARK},
+            files={"addressFile": ("addresses.csv", upload.getvalue())}
+        )
+
+        # Rows come back as "id, input, match, exactness, matched address, lon/lat, ..."
+        results = {}
+        for row in csv.reader(io.StringIO(response.content.decode('utf8'))):
+            if len(row) < 6 or row[2] != "Match":
+                continue
+            lon, lat = row[5].split(',')
+            results[keys[int(row[0])]] = payload(row[4], float(lon), float(lat))
+
+        return results
+
+
+class GazetteerBackend:
+    """Geocodes addresses offline from a local gazetteer
+
+    The gazetteer is a CSV file, or a SQLite table named gazetteer, with the
+    columns street, city, state, zip, x (longitude), y (latitude) and an
+    optional matched_address.
+    """
+    name = 'gazetteer'
+
+    def __init__(self, path):
+        self.places = {}
+        self.by_street = {}
+        for place in read_gazetteer(path):
+            matched = place.get('matched_address') or f"{place['street']}, {place['city']}, {place['state']}, {place['zip']}"
+            result = payload(matched, float(place['x']), float(place['y']))
+
+            self.places[normalize_address(place['street'], place['city'], place['state'], place['zip'])] = result
+            self.by_street[normalize_address(place['street'], '', '', place['zip'])] = result
+        logger.info(f"Loaded {len(self.places)} places from {path}")
+
+    def geocode(self, addresses):
+        results = {}
+        for key, (street, city, state, zip) in addresses.items():
+            # Fall back to street and ZIP when the city is spelled differently
+            result = self.places.get(key) or self.by_street.get(normalize_address(street, '', '', zip))
+            if result:
+                results[key] = result
+        return results
+
+
+def read_gazetteer(path):
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, newline='') as gazetteer:
+            yield from csv.DictReader(gazetteer)
+        return
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute("SELECT * FROM gazetteer"):
+            yield dict(row)
+    finally:
+        conn.close()
+
+
+def normalize_address(street, city, state, zip):
+    parts = [street, city, state, (zip or '')[:5]]
+    return '|'.join(' '.join((part or '').lower().replace(',', ' ').split()) for part in parts)
+
+
+def payload(matched_address, x, y):
+    return {
+        'result': {
+            'addressMatches': [{
+                'matchedAddress': matched_address,
+                'coordinates': {'x': x, 'y': y}
+            }]
+        }
+    }
+
+
+def empty_payload():
+    return {'result': {'addressMatches': []}}
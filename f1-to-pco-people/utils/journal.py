@@ -0,0 +1,153 @@
+import json
+import logging
+import sqlite3
+import threading
+
+from datetime import datetime
+
+logger = logging.getLogger()
+
+# The stages a person moves through, in order
+STAGES = ['fetched', 'validated', 'sent', 'contacts_sent', 'attributes_sent']
+
+# Outcomes that leave nothing more to do for a person
+FINISHED = ['complete', 'duplicate', 'bad_name', 'empty']
+
+
+class Journal:
+    """A record of how far each person got, kept in normal.db
+
+    Writes are buffered and flushed in batches so journaling doesn't slow
+    the migration down. A resumed run skips anyone whose outcome is in
+    FINISHED and retries everyone else. A batch that can't be written is
+    kept and tried again with the next one, so a busy or locked database
+    never stops the migration.
+    """
+
+    def __init__(self, path, batch_size=200):
+        """Open the journal, creating its table if needed
+
+        :param path: the SQLite database to keep the journal in
+        :type path: string
+        :param batch_size: how many updates to buffer before writing
+        :type batch_size: int"""
+        self.batch_size = batch_size
+        self.pending = {}
+        self.write_at = batch_size
+        self.failing = False
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS migration_journal (
+                person_id INTEGER PRIMARY KEY,
+                stage TEXT,
+                pco_id TEXT,
+                outcome TEXT,
+                updated_at TEXT,
+                duplicate_keys TEXT
+            )
+        """)
+
+        # Journals from before duplicate keys were kept
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(migration_journal)")}
+        if 'duplicate_keys' not in columns:
+            self.conn.execute("ALTER TABLE migration_journal ADD COLUMN duplicate_keys TEXT")
+        self.conn.commit()
+
+    def record(self, person_id, stage=None, outcome=None, pco_id=None, keys=None):
+        """Note a person's progress
+
+        :param person_id: the F1 id of the person
+        :param stage: the stage just reached (None keeps the current one)
+        :type stage: string
+        :param outcome: why the person stopped, or None if they're carrying on
+        :type outcome: string
+        :param pco_id: the person's PCO id, once known
+        :param keys: the person's duplicate keys, so a resumed run can still
+            find duplicates of them
+        :type keys: set"""
+        with self.lock:
+            previous = self.pending.get(int(person_id), {})
+            self.pending[int(person_id)] = {
+                'stage': stage or previous.get('stage'),
+                'outcome': outcome,
+                'pco_id': pco_id or previous.get('pco_id'),
+                'keys': json.dumps(sorted(keys)) if keys is not None else previous.get('keys'),
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+
+            if len(self.pending) >= self.write_at:
+                self.write()
+
+    def flush(self):
+        with self.lock:
+            self.write()
+
+    def write(self):
+        """Write every buffered update (lock must be held)"""
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        try:
+            self.conn.executemany("""
+                INSERT INTO migration_journal (person_id, stage, pco_id, outcome, updated_at, duplicate_keys)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (person_id) DO UPDATE SET
+                    stage = COALESCE(excluded.stage, stage),
+                    pco_id = COALESCE(excluded.pco_id, pco_id),
+                    outcome = excluded.outcome,
+                    updated_at = excluded.updated_at,
+                    duplicate_keys = COALESCE(excluded.duplicate_keys, duplicate_keys)
+            """, [(person_id, entry['stage'], entry['pco_id'], entry['outcome'], entry['updated_at'], entry['keys'])
+                  for person_id, entry in batch.items()])
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+
+            # Keep the updates and try again once another batch has built up
+            self.pending = batch
+            self.write_at = len(batch) + self.batch_size
+            if not self.failing:
+                logger.error(f"Couldn't write the journal, will retry with the next batch: {e}")
+            self.failing = True
+            return
+
+        self.write_at = self.batch_size
+        if self.failing:
+            logger.info("Journal writes are working again")
+        self.failing = False
+
+    def finished(self):
+        """The ids of everyone a resumed run can skip"""
+        self.flush()
+        placeholders = ', '.join('?' * len(FINISHED))
+        rows = self.conn.execute(f"SELECT person_id FROM migration_journal WHERE outcome IN ({placeholders})", FINISHED)
+        return {row[0] for row in rows}
+
+    def pco_ids(self):
+        """The PCO id of everyone who reached PCO but didn't finish, by F1 id"""
+        self.flush()
+        placeholders = ', '.join('?' * len(FINISHED))
+        rows = self.conn.execute(f"""
+            SELECT person_id, pco_id FROM migration_journal
+            WHERE pco_id IS NOT NULL AND (outcome IS NULL OR outcome NOT IN ({placeholders}))
+        """, FINISHED)
+        return {row[0]: row[1] for row in rows}
+
+    def duplicate_keys(self, person_ids):
+        """(person id, duplicate keys) for each of person_ids that has keys recorded"""
+        self.flush()
+        person_ids = set(person_ids)
+        rows = self.conn.execute("SELECT person_id, duplicate_keys FROM migration_journal WHERE duplicate_keys IS NOT NULL ORDER BY person_id")
+        for person_id, keys in rows:
+            if person_id in person_ids:
+                yield person_id, json.loads(keys)
+
+    def close(self):
+        with self.lock:
+            self.write()
+            if self.pending:
+                logger.error(f"{len(self.pending)} journal updates couldn't be written; those people will be retried by --resume")
+            self.conn.close()
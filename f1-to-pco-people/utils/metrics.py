@@ -0,0 +1,185 @@
+import json
+import logging
+import re
+import threading
+
+from array import array
+from urllib.parse import urlparse
+
+logger = logging.getLogger()
+
+# Ids in a path are replaced so every person's requests share one endpoint
+ID_SEGMENT = re.compile(r'/\d+(?=/|\.|$)')
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+class EndpointStats:
+    """Everything recorded for one service, method and endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.latencies = array('d')
+        self.statuses = {}
+
+    def quantiles(self, qs=QUANTILES):
+        """The latencies below which each q of the requests finished"""
+        if not self.latencies:
+            return [0.0 for _ in qs]
+        latencies = sorted(self.latencies)
+        return [latencies[min(int(q * len(latencies)), len(latencies) - 1)] for q in qs]
+
+
+class Metrics:
+    """Request counts, latencies and sizes for every API the migration talks to
+
+    The API clients call record() around each request. Everything is keyed on
+    (service, method, endpoint template), so /people/v2/people/123/emails and
+    /people/v2/people/456/emails are counted together.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def stats(self, service, method, url):
+        key = (service, method.upper(), endpoint_template(url))
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointStats()
+        return self.endpoints[key]
+
+    def record(self, service, method, url, seconds, status=None, size=0):
+        """Record a finished request (status is None if it raised)
+
+        :param service: which API the request went to (e.g. 'pco' or 'f1')
+        :type service: str
+        :param method: the HTTP method
+        :type method: str
+        :param url: the URL or endpoint requested
+        :type url: str
+        :param seconds: how long the request took
+        :type seconds: float
+        :param status: the HTTP status code
+        :type status: int
+        :param size: bytes sent and received
+        :type size: int"""
+        with self.lock:
+            stats = self.stats(service, method, url)
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.bytes += size
+            stats.latencies.append(seconds)
+            if status is None:
+                stats.errors += 1
+            else:
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+                stats.rate_limited += status == 429
+
+    def retry(self, service, method, url):
+        """Record that a request is being sent again"""
+        with self.lock:
+            self.stats(service, method, url).retries += 1
+
+    def totals(self, service=None):
+        """A single EndpointStats covering every endpoint (of one service)"""
+        total = EndpointStats()
+        with self.lock:
+            for (endpoint_service, _, _), stats in self.endpoints.items():
+                if service and endpoint_service != service:
+                    continue
+                total.requests += stats.requests
+                total.errors += stats.errors
+                total.rate_limited += stats.rate_limited
+                total.retries += stats.retries
+                total.bytes += stats.bytes
+                total.seconds += stats.seconds
+                total.latencies.extend(stats.latencies)
+        return total
+
+    def status_line(self):
+        """A one line summary for a status bar"""
+        with self.lock:
+            services = sorted({key[0] for key in self.endpoints})
+
+        parts = []
+        for service in services:
+            total = self.totals(service)
+            p50, p95 = total.quantiles([0.5, 0.95])
+            parts.append(f"{service.upper()} {total.requests} req, p50 {p50:.2f}s, p95 {p95:.2f}s, "
+                         f"{total.bytes / 2 ** 20:.1f} MiB, {total.rate_limited}x429")
+        return ' | '.join(parts) or 'No requests yet'
+
+    def summary(self):
+        """Every endpoint's numbers, ready for JSON"""
+        endpoints = []
+        with self.lock:
+            for (service, method, endpoint), stats in sorted(self.endpoints.items()):
+                endpoints.append({
+                    'service': service,
+                    'method': method,
+                    'endpoint': endpoint,
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'rate_limited': stats.rate_limited,
+                    'retries': stats.retries,
+                    'bytes': stats.bytes,
+                    'seconds': round(stats.seconds, 3),
+                    'latency': {f'p{int(q * 100)}': round(latency, 4) for q, latency in zip(QUANTILES, stats.quantiles())},
+                    'statuses': {str(status): count for status, count in sorted(stats.statuses.items())},
+                })
+        return {'endpoints': endpoints}
+
+    def prometheus(self):
+        """The numbers in Prometheus' text exposition format"""
+        with self.lock:
+            endpoints = [(f'service="{service}",method="{method}",endpoint="{endpoint}"', stats)
+                         for (service, method, endpoint), stats in sorted(self.endpoints.items())]
+
+            # Each metric's samples have to be grouped under its TYPE line
+            lines = ['# TYPE api_request_duration_seconds summary']
+            for labels, stats in endpoints:
+                for q, latency in zip(QUANTILES, stats.quantiles()):
+                    lines.append(f'api_request_duration_seconds{{{labels},quantile="{q}"}} {latency:.6f}')
+                lines.append(f'api_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+                lines.append(f'api_request_duration_seconds_count{{{labels}}} {stats.requests}')
+
+            for name, field in [('api_requests_total', 'requests'), ('api_request_errors_total', 'errors'),
+                                ('api_rate_limited_total', 'rate_limited'), ('api_retries_total', 'retries'),
+                                ('api_bytes_total', 'bytes')]:
+                lines.append(f'# TYPE {name} counter')
+                lines.extend(f'{name}{{{labels}}} {getattr(stats, field)}' for labels, stats in endpoints)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the summary to path, as Prometheus text for .prom/.txt files and JSON otherwise"""
+        with open(path, mode='w') as metrics_file:
+            if path.endswith(('.prom', '.txt')):
+                metrics_file.write(self.prometheus())
+            else:
+                json.dump(self.summary(), metrics_file, indent=2)
+        logger.info(f"Wrote request metrics to {path}")
+
+
+def endpoint_template(url):
+    """The path of a URL with its ids replaced by {id}"""
+    return ID_SEGMENT.sub('/{id}', urlparse(url).path)
+
+
+def body_size(body):
+    """The size of a request or response body in bytes"""
+    if not body:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf8'))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    return len(json.dumps(body))
+
+
+# Shared by every client in the process
+metrics = Metrics()
@@ -0,0 +1,83 @@
+import json
+import logging
+import re
+import string
+
+logger = logging.getLogger()
+
+# Punctuation that can't be in a name (periods and parentheses are checked separately)
+PUNCTUATION = ''.join(char for char in string.punctuation if char not in '.()')
+
+# Rules in priority order as (reason, pattern). Each pattern is matched
+#   from the start of the word, so a reason is given the moment one applies
+DEFAULT_RULES = [
+    ('too_short', r'\.*(?:[^.]\.*)?\Z'),
+    ('too_many_periods', r'.*\..*\.'),
+    ('bad_prefix', r'[(.]'),
+    ('bad_suffix', r'.*\)\Z'),
+    ('digit', r'.*\d'),
+    ('punctuation', r'.*[' + re.escape(PUNCTUATION) + r']'),
+    ('too_many_words', r'(?:.* ){3}'),
+    ('conjunction', r'.* and '),
+]
+
+
+class NameValidator:
+    """Checks names against a set of rules compiled into one regex
+
+    Every rule becomes a named lookahead in a single alternation, so a word
+    is checked in one call to the regex engine and the name of the group
+    that matched is the reason it was rejected.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        """Compile the rules
+
+        :param rules: (reason, pattern) pairs in priority order
+        :type rules: list"""
+        self.reasons = [reason for reason, _ in rules]
+        self.regex = re.compile('|'.join(f'(?P<{reason}>(?={pattern}))' for reason, pattern in rules), re.DOTALL)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a rule set from a JSON file
+
+        The file is a list of {"reason": ..., "pattern": ...} objects in
+        priority order. A rule with only a reason uses the default pattern
+        for that reason, so the defaults can be picked and reordered.
+
+        :param path: the JSON file to load
+        :type path: str"""
+        with open(path) as rules_file:
+            entries = json.load(rules_file)
+
+        defaults = dict(DEFAULT_RULES)
+        rules = []
+        for entry in entries:
+            reason = entry['reason']
+            pattern = entry.get('pattern', defaults.get(reason))
+            if pattern is None:
+                raise ValueError(f"Name rule {reason} has no pattern and isn't a default rule")
+            rules.append((reason, pattern))
+
+        logger.info(f"Loaded {len(rules)} name rules from {path}")
+        return cls(rules)
+
+    def check(self, word):
+        """The reason a word is a bad name, or None if it's fine"""
+        match = self.regex.match(word or '')
+        return match.lastgroup if match else None
+
+    def check_many(self, words):
+        """The reason for each word in a column of names (None for good ones)"""
+        match = self.regex.match
+        return [match.lastgroup if match else None for match in map(match, (word or '' for word in words))]
+
+    def check_person(self, first_name, last_name):
+        """The reason a first or last name is bad, or None if both are fine"""
+        first_reason, last_reason = self.check_many((first_name, last_name))
+        return first_reason or last_reason
+
+
+# The validator PersonF1 uses (replaced by migrate.py when rules are given)
+validator = NameValidator()
@@ -0,0 +1,21 @@
+import phonenumbers
+
+
+def normalize(value):
+    """Lowercase and strip a string, returning None if nothing is left"""
+    if not value or not isinstance(value, str):
+        return None
+    return value.strip().lower() or None
+
+
+def national_number(number):
+    """The national number of a US phone number as a string, or None"""
+    if not number or not isinstance(number, str):
+        return None
+
+    try:
+        return str(phonenumbers.parse(number, "US").national_number)
+    except phonenumbers.NumberParseException:
+        # Fall back to the raw digits for numbers phonenumbers won't parse
+        digits = ''.join(char for char in number if char.isdigit())
+        return digits or None
@@ -1,27 +1,116 @@
 import logging
-import json
-import Levenshtein
-import math
 import os
 import phonenumbers
-import pypco
-import requests
-import streetaddress
 from datetime import datetime
-pco = pypco.PCO(
+from .addresses import canonical_address, compare_addresses
+from .clients import LazyClient
+from .directory import PeopleDirectory
+from .geocoder import CensusBackend, Geocoder
+from .pco_client import ScheduledPCO
+from .snapshot import PersonSnapshot
+
+logger = logging.getLogger()
+
+PCO_API_BASE = 'https://api.planningcenteronline.com'
+
+
+def create_pco():
+    """A PCO client using the PCO_* environment variables"""
+    return ScheduledPCO(
         os.environ["PCO_KEY"],
-        os.environ["PCO_SECRET"]
+        os.environ["PCO_SECRET"],
+        api_base=os.environ.get("PCO_API_BASE", PCO_API_BASE)
     )
 
-parser = streetaddress.StreetAddressParser()
 
-logger = logging.getLogger()
+# Only created the first time PCO is actually used
+pco = LazyClient(create_pco)
 
 GLENDALE = 35350
 BUSHWICK = 35349
 
+# Geocodes addresses for send_address (replaced by migrate.py with a persistent one)
+geocoder = Geocoder(CensusBackend())
+
+# Related records returned with a person so their details are only fetched once
+SNAPSHOT_INCLUDES = 'field_data,emails,phone_numbers,addresses'
+
+# Addresses are checked (and planned) but not created until this is turned on
+SEND_ADDRESSES = False
+
+# Every PCO field definition by id, loaded once by load_field_definitions
+field_definitions = {}
+
+# A local copy of PCO People, used by find_person once it has been prefetched
+directory = None
+
+
+def prefetch_people(progress=None):
+    """Page every PCO person into a local directory for find_person"""
+    global directory
+    people = PeopleDirectory()
+    people.load(pco, progress)
+    directory = people
+
+
+def queue_geocodes(person_f1):
+    """Queue the geocodes address_template will need for a person
+
+    Addresses are only compared when they're being sent and the person is
+    already in PCO with addresses. That's only known ahead of time from the
+    prefetched directory; anyone else is geocoded if and when they're compared."""
+    if not SEND_ADDRESSES or directory is None or not person_f1.addresses:
+        return
+
+    person_pco = directory.find(person_f1)
+    addresses_pco = [record['attributes'] for record in (person_pco or {}).get('included') or [] if record['type'] == 'Address']
+    if not addresses_pco:
+        return
+
+    for address in person_f1.addresses:
+        geocoder.queue(address.address1, address.city, address.state, address.zip)
+    for address in addresses_pco:
+        geocoder.queue(address['street'], address['city'], address['state'], address['zip'])
+
+
+def load_field_definitions(mappings):
+    """Load PCO's field definitions and check the F1 attribute mappings
+
+    :param mappings: rows of the field_mapping table
+    :type mappings: list
+    :returns: the field_data mappings that don't point at a definition"""
+    for definition in pco.iterate('/people/v2/field_definitions', per_page=100):
+        field_definitions[int(definition['data']['id'])] = definition['data']
+    logger.info(f"Loaded {len(field_definitions)} field definitions from Planning Center")
+
+    return [mapping for mapping in mappings
+            if mapping['pco_data_type'] == 'field_data' and int(mapping['pco_id']) not in field_definitions]
+
+
+def get_field_definition(field_definition_id):
+    # Fall back to fetching (and keeping) a definition that wasn't preloaded
+    if field_definition_id not in field_definitions:
+        field_definitions[field_definition_id] = pco.get(f'/people/v2/field_definitions/{field_definition_id}')['data']
+    return field_definitions[field_definition_id]
+
+
+def get_person(pco_id):
+    """A person's record by PCO id (as find_person returns it), or None if they're gone"""
+    if directory is not None:
+        return directory.get(pco_id)
+
+    try:
+        return pco.get(f'/people/v2/people/{pco_id}')
+    except Exception as e:
+        logger.warning(f"Couldn't get PCO person {pco_id}, searching for them instead: {e}")
+        return None
+
 
 def find_person(person):
+    # Search the prefetched directory instead of the API if there is one
+    if directory is not None:
+        return directory.find(person)
+
     # These go out with every request as a baseline for finding a person
     base_wheres = [
         {
@@ -50,12 +139,12 @@ def find_person(person):
     i = 0
     # Gather emails to look for
     for email in person.emails:
-        where_queries[f"search_name_or_email_or_phone_number{i}"] = email['email']
+        where_queries[f"search_name_or_email_or_phone_number{i}"] = email.email
         i += 1
 
     # Gather phones to look for
     for phone in person.phones:
-        where_queries[f"search_name_or_email_or_phone_number{i}"] = phone['number']
+        where_queries[f"search_name_or_email_or_phone_number{i}"] = phone.number
         i += 1
 
     logger.debug("Searching for people")
@@ -95,10 +184,8 @@ def find_person(person):
     return person_gathered
 
 
-def send_person_to_pco(person_f1, person_pco):
-    person_exists = person_pco is not None
-    logging.debug(f"{person_f1.full_name()} exists: {person_exists}")
-
+def person_template(person_f1, person_pco):
+    """The Person attributes to send for someone (person_pco is None if they're new)"""
     template = {
         'last_name': person_f1.last_name,
     }
@@ -115,7 +202,7 @@ def send_person_to_pco(person_f1, person_pco):
         template['gender'] = person_f1.gender[0]
 
     # Add a B-day if it exists
-    if person_f1.dob and len(person_f1.dob) > 0:
+    if person_f1.birthdate:
         template['birthdate'] = person_f1.get_dob_yyyy_mm_dd_format()
 
     # Set a new person as inactive if they are new to PCO
@@ -130,9 +217,16 @@ def send_person_to_pco(person_f1, person_pco):
     if person_f1.status in ['CTB', 'CTB Espanol', 'CTB Junior High', 'CTB High School']:
         template['primary_campus_id'] = BUSHWICK
 
+    return template
+
+
+def send_person_to_pco(person_f1, person_pco, journal=None):
+    person_exists = person_pco is not None
+    logging.debug(f"{person_f1.full_name()} exists: {person_exists}")
+
     logging.debug(f"Building template for {person_f1.full_name()}")
     # Setup the payload with the build templat
-    payload = pco.template('Person', template)
+    payload = pco.template('Person', person_template(person_f1, person_pco))
 
     logging.debug(f"{person_f1.full_name()} payload: {payload}")
 
@@ -140,230 +234,263 @@ def send_person_to_pco(person_f1, person_pco):
         person = None
         if person_exists:
             logging.warning(f"Updating {person_f1.full_name()}")
-            person = pco.patch(f'/people/v2/people/{person_pco["data"]["id"]}?include=field_data', payload)
+            person = pco.patch(f'/people/v2/people/{person_pco["data"]["id"]}?include={SNAPSHOT_INCLUDES}', payload)
         else:
             logging.warning(f"Creating {person_f1.full_name()}")
             person = pco.post('/people/v2/people', payload)
 
+            # Keep the directory aware of the new person
+            if directory is not None:
+                directory.add(person)
+
     except Exception as e:
         logging.critical(str(e))
 
-    # Extract ID and pass it to each detail function
+    # Extract ID and pass it to each detail function along with
+    #   everything the person already has in PCO
     id = person['data']['id']
+    snapshot = PersonSnapshot(person)
+    if journal:
+        journal.record(person_f1.id, 'sent', pco_id=id)
 
     logging.info("Sending phone numbers")
     for phone in person_f1.phones:
-        send_phone_number(id, phone, person_exists)
+        send_phone_number(id, phone, snapshot)
 
     logging.info("Sending emails")
     for email in person_f1.emails:
-        send_email(id, email, person_exists)
+        send_email(id, email, snapshot)
 
     logging.info("Sending addresses")
     for address in person_f1.addresses:
-        send_address(id, address, person_exists)
+        send_address(id, address, snapshot)
 
+    if journal:
+        journal.record(person_f1.id, 'contacts_sent')
     return person, person_exists
 
 
-def send_phone_number(id, phone_f1, person_exists):
+def phone_template(phone_f1, snapshot):
+    """The PhoneNumber to create, or None if PCO already has it"""
     try:
-        phone_type = phone_f1["type"]
-        phone_f1 = phone_f1["number"]
-        if not phone_f1 or len(phone_f1) == 0:
+        phone_type = phone_f1.type
+        phone_f1_basic = phone_f1.key
+        if not phone_f1_basic:
             logger.error("Invalid Phone Number")
-            return
-
-        # Parse the phone numbers
-        phone_f1_obj = phonenumbers.parse(phone_f1, "US")
-        if person_exists:
-            # Get phone numbers from PCO
-            for phone in pco.iterate(f'/people/v2/people/{id}/phone_numbers'):
-                logger.debug(phone)
-                # Parse the phone number
-                phone = phone['data']['attributes']['number']
-                phone_fmt = phonenumbers.parse(phone, "US")
-
-                # if any phone numbers match, return
-                if phone_fmt.national_number == phone_f1_obj.national_number:
-                    logger.warning(f"Phone Number: {phone_f1_obj.national_number} already exists in PCO")
-                    return
+            return None
+
+        # Check the phone numbers already in PCO
+        for phone in snapshot.phone_numbers:
+            logger.debug(phone)
+            # Parse the phone number
+            phone = phone['attributes']['number']
+            phone_fmt = phonenumbers.parse(phone, "US")
+
+            # if any phone numbers match, return
+            if str(phone_fmt.national_number) == phone_f1_basic:
+                logger.warning(f"Phone Number: {phone_f1_basic} already exists in PCO")
+                return None
     except Exception as e:
         logging.critical(str(e))
 
+    location = ""
+    if phone_type.lower() in "home phone":
+        location = "Home"
+    if any(phone_type.lower() in phone for phone in ["mobile phone", "emergency phone"]):
+        location = "Mobile"
+    if phone_type.lower() in "work phone":
+        location = "Work"
+
+    # If it reached here, the phone number doesn't exist
+    phone_f1_formatted = f"{phone_f1_basic[0:3]}-{phone_f1_basic[3:6]}-{phone_f1_basic[6:]}"
+    return {
+        "number": phone_f1_formatted,
+        "location": location
+    }
+
+
+def send_phone_number(id, phone_f1, snapshot):
     try:
-        location = ""
-        if phone_type.lower() in "home phone":
-            location = "Home"
-        if any(phone_type.lower() in phone for phone in ["mobile phone", "emergency phone"]):
-            location = "Mobile"
-        if phone_type.lower() in "work phone":
-            location = "Work"
-
-        # If it reached here, the phone number doesn't exist
+        template = phone_template(phone_f1, snapshot)
+        if not template:
+            return
+
         # Build a template for creation
-        phone_f1_basic = str(phone_f1_obj.national_number)
-        phone_f1_formatted = f"{phone_f1_basic[0:3]}-{phone_f1_basic[3:6]}-{phone_f1_basic[6:]}"
-        template = {
-            "number": phone_f1_formatted,
-            "location": location
-        }
         payload = pco.template('PhoneNumber', template)
 
-        logging.info(f"Sending Phone Number: {phone_f1_formatted}")
+        logging.info(f"Sending Phone Number: {template['number']}")
         logging.debug(f"Phone Number payload: {payload}")
         # Send the request
-        return pco.post(f'/people/v2/people/{id}/phone_numbers', payload)
+        phone = pco.post(f'/people/v2/people/{id}/phone_numbers', payload)
+        snapshot.add(phone['data'])
+        return phone
     except Exception as e:
         logging.critical(str(e))
 
 
-def send_email(id, email_f1, person_exists):
+def email_template(email_f1, snapshot):
+    """The Email to create, or None if PCO already has it"""
     try:
-        email_type = email_f1['type']
-        email_f1 = email_f1['email']
-        if not email_f1 or len(email_f1) == 0:
+        email_type = email_f1.type
+        email_key = email_f1.key
+        if not email_key:
             logger.error("Invalid email")
-            return
-
-        if person_exists:
-            # Get a list of all emails
-            for email in pco.iterate(f'/people/v2/people/{id}/emails'):
-                # if any match, return
-                if email['data']['attributes']['address'].lower() == email_f1.lower():
-                    logger.warning(f"Email: {email_f1} already exists in PCO")
-                    return
+            return None
+
+        # Check the emails already in PCO
+        for email in snapshot.emails:
+            # if any match, return
+            if email['attributes']['address'].lower() == email_key:
+                logger.warning(f"Email: {email_f1.email} already exists in PCO")
+                return None
     except Exception as e:
         logging.critical(str(e))
 
+    location = ""
+    if any(email_type.lower() in email for email in ["home email", "infellowship login"]):
+        location = "Home"
+    if email_type.lower() in "email":
+        location = "Work"
+
+    # If it reached here, the email doesn't exist
+    return {
+        'address': email_f1.email,
+        'location': location
+    }
+
+
+def send_email(id, email_f1, snapshot):
     try:
-        location = ""
-        if any(email_type.lower() in email for email in ["home email", "infellowship login"]):
-            location = "Home"
-        if email_type.lower() in "email":
-            location = "Work"
-        # If it reached here, the email doesn't exist
+        template = email_template(email_f1, snapshot)
+        if not template:
+            return
+
         # Build the request
-        template = {
-            'address': email_f1,
-            'location': location
-        }
         payload = pco.template("Email", template)
 
-        logging.info(f"Sending Email: {email_f1}")
+        logging.info(f"Sending Email: {template['address']}")
         logging.debug(f"Email payload: {payload}")
         # Add a new email
-        return pco.post(f'/people/v2/people/{id}/emails', payload)
+        email = pco.post(f'/people/v2/people/{id}/emails', payload)
+        snapshot.add(email['data'])
+        return email
     except Exception as e:
         logging.critical(str(e))
 
 
-def send_address(id, address_f1, person_exists):
+def address_template(address_f1, snapshot):
+    """The Address to create, or None if PCO already has it (or one close enough)"""
     try:
-        if not address_f1 or len(address_f1) == 0:
+        if not address_f1:
             logger.error("Invalid address")
-            return
+            return None
 
-        if person_exists:
-            # Build US Gov geo code URL
-            url = "https://geocoding.geo.census.gov/geocoder/locations/address"
+        if snapshot.addresses:
+            # Geocode every address being compared in one batch
+            geocoder.queue(address_f1.address1, address_f1.city, address_f1.state, address_f1.zip)
+            for address in snapshot.addresses:
+                address = address['attributes']
+                geocoder.queue(address["street"], address["city"], address["state"], address["zip"])
+
+            # Geocode the F1 address (cached, so shared addresses are only looked up once)
             params_f1 = {
-                "benchmark": "Public_AR_Current",
-                "format": "json",
-                "street": address_f1["address1"],
-                "city": address_f1["city"],
-                "state": address_f1["state"],
-                "zip": address_f1["zip"]
+                "street": address_f1.address1,
+                "city": address_f1.city,
+                "state": address_f1.state,
+                "zip": address_f1.zip
             }
+            address_f1_data = geocoder.lookup(**params_f1)
+            address_f1_canonical = canonical_address(f"{address_f1.address1} {address_f1.address2}", address_f1.zip, address_f1_data, address_f1.city)
 
-            # Send request
-            address_f1_data = requests.get(url=url, params=params_f1)
-            address_f1_data = address_f1_data.content
-            address_f1_data = address_f1_data.decode('utf8')
-            address_f1_data = json.loads(address_f1_data)
+            # Check the addresses already in planning center
+            candidates = []
+            for address in snapshot.addresses:
+                address = address['attributes']
 
-            # Get all addresses from planning center
-            for address in pco.iterate(f'/people/v2/people/{id}/addresses'):
-                address = address['data']['attributes']
-
-                # Build geocode URL for each address
+                # Geocode each address
                 params_pco = {
-                    "benchmark": "Public_AR_Current",
-                    "format": "json",
                     "street": address["street"],
                     "city": address["city"],
                     "state": address["state"],
                     "zip": address["zip"],
                 }
-
-                # Send the request
-                address_pco_data = requests.get(url=url, params=params_pco)
-                address_pco_data = address_pco_data.content
-                address_pco_data = address_pco_data.decode('utf8')
-                address_pco_data = json.loads(address_pco_data)
+                address_pco_data = geocoder.lookup(**params_pco)
+                candidates.append(canonical_address(address["street"], address["zip"], address_pco_data, address["city"]))
 
                 logging.debug(f"Comparing Address: {params_f1['street']}, {params_f1['city']}, {params_f1['state']} {params_f1['zip']}")
                 logging.debug(f"Comparing Address: {params_pco['street']}, {params_pco['city']}, {params_pco['state']} {params_pco['zip']}")
 
-                # Compare all addresses to each other. If within X miles, return
-                if compare_addresses(address_f1_data, address_pco_data):
-                    logging.warning(f"Address: {address_f1['address1']} {address_f1['address2']}, {address_f1['city']}, {address_f1['state']} {address_f1['zip']} already exists in PCO")
-                    return
+            # Compare the address to all of them at once. If it's close enough, return
+            match = compare_addresses(address_f1_canonical, candidates)
+            if match:
+                logging.warning(f"Address: {address_f1.address1} {address_f1.address2}, {address_f1.city}, {address_f1.state} {address_f1.zip} already exists in PCO ({', '.join(match.reasons)})")
+                return None
     except Exception as e:
         logging.critical(str(e))
 
+    # If it reached here, the address doesn't exist
+    return {
+        'street': address_f1.address1 + " " + address_f1.address2,
+        'city': address_f1.city,
+        'state': address_f1.state,
+        'zip': address_f1.zip,
+        'location': 'home'
+    }
+
+
+def send_address(id, address_f1, snapshot):
+    # Nothing is compared (or geocoded) for addresses that won't be sent
+    if not SEND_ADDRESSES:
+        return None
+
     try:
-        # If it reached here, the address doesn't exist
+        template = address_template(address_f1, snapshot)
+        if not template:
+            return
+
         # Parse the planning center address and create a template
-        template = {
-            'street': address_f1['address1'] + " " + address_f1['address2'],
-            'city': address_f1['city'],
-            'state': address_f1['state'],
-            'zip': address_f1['zip'],
-            'location': 'home'
-        }
         payload = pco.template("Address", template)
 
-        logging.info(f"Sending Address: {address_f1['address1']} {address_f1['address2']}, {address_f1['city']}, {address_f1['state']} {address_f1['zip']}")
-        logging.debug(f"Email payload: {payload}")
-        return None
+        logging.info(f"Sending Address: {template['street']}, {template['city']}, {template['state']} {template['zip']}")
+        logging.debug(f"Address payload: {payload}")
+
         # Add the new address to planning center
-        return pco.post(f'/people/v2/people/{id}/addresses', payload)
+        address = pco.post(f'/people/v2/people/{id}/addresses', payload)
+        snapshot.add(address['data'])
+        return address
     except Exception as e:
         logging.critical(str(e))
 
 
-def compare_addresses(addrs_f1, addrs_pco):
-    radius = 6371  # km
-
-    distance = Levenshtein.distance(str(addrs_f1), str(addrs_pco))
-    if distance < 5:
-        logging.debug(f"Levenshtein Distance: {distance}")
-        return True
-
-    for addr_f1 in addrs_f1['result']['addressMatches']:
-        lat_f1 = addr_f1['coordinates']['x']
-        lng_f1 = addr_f1['coordinates']['y']
-        for addr_pco in addrs_pco['result']['addressMatches']:
-            lat_pco = addr_pco['coordinates']['x']
-            lng_pco = addr_pco['coordinates']['y']
-
-            dlat = math.radians(lat_pco - lat_f1)
-            dlon = math.radians(lng_pco - lng_f1)
+def field_datum_change(attribute, mapping, snapshot):
+    """The FieldDatum for an attribute and the id of the one it replaces (or None)"""
+    value = ""
+    if attribute["startDate"]:
+        value = datetime.strptime(attribute["startDate"], '%Y-%m-%dT%H:%M:%S')
+    else:
+        value = datetime.strptime(attribute["createdDate"], '%Y-%m-%dT%H:%M:%S')
 
-            a = math.sin(dlat / 2) * math.sin(dlat / 2) + math.cos(math.radians(lat_f1)) * math.cos(math.radians(lat_pco)) * math.sin(dlon / 2) * math.sin(dlon / 2)
+    value = value.strftime('%Y-%m-%d')
+    template = {
+        "value": value,
+        "field_definition_id": mapping['pco_id']
+    }
 
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            distance = radius * c
+    # See if field data exists in planning center
+    field_datum_id = None
+    for field_datum in snapshot.field_data:
+        if int(template['field_definition_id']) == int(field_datum['relationships']['field_definition']['data']['id']):
+            field_datum_id = int(field_datum['id'])
 
-            logging.debug(f"F1 Address: {addr_f1['matchedAddress']}")
-            logging.debug(f"PCO Address:  {addr_pco['matchedAddress']}")
-            logging.debug(f"Distance between: {distance}km")
+    return field_datum_id, template
 
-            if distance < 0.5:
-                return True
 
-    return False
+def anniversary_template(attribute):
+    """The Person attributes that set a wedding anniversary"""
+    value = datetime.strptime(attribute["startDate"], '%Y-%m-%dT%H:%M:%S')
+    return {
+        'anniversary': value.strftime('%Y-%m-%d')
+    }
 
 
 def send_attribute(person, f1_attribute_id, attribute, mapping, name):
@@ -372,46 +499,128 @@ def send_attribute(person, f1_attribute_id, attribute, mapping, name):
     person_id = person['data']['id']
 
     if pco_type == "field_data":
-        value = ""
-        if attribute["startDate"]:
-            value = datetime.strptime(attribute["startDate"], '%Y-%m-%dT%H:%M:%S')
-        else:
-            value = datetime.strptime(attribute["createdDate"], '%Y-%m-%dT%H:%M:%S')
-
-        value = value.strftime('%Y-%m-%d')
-        template = {
-            "value": value,
-            "field_definition_id": mapping['pco_id']
-        }
-        payload = pco.template("FieldDatum", template)
-        logger.debug(payload)
-
-        # See if field data exists in planning center
-        field_datum_id = -1
-        for field_datum in person['included']:
-            if template['field_definition_id'] == int(field_datum['relationships']['field_definition']['data']['id']):
-                field_datum_id = int(field_datum['id'])
-    
+        field_datum_id, template = field_datum_change(attribute, mapping, PersonSnapshot(person))
+        logger.debug(template)
+
         try:
-            field_definition = pco.get(f'/people/v2/field_definitions/{template["field_definition_id"]}')
-            if field_datum_id > 0:
-                logging.info(f"Updating Planning Center Custom Field - {field_definition['data']['attributes']['name']}")
-                pco.patch(f'/people/v2/field_data/{field_datum_id}', payload)
-            else:
-                logging.info(f"Creating Planning Center Custom Field - {field_definition['data']['attributes']['name']}")
-                pco.post(f'/people/v2/people/{person_id}/field_data', payload)
+            send_field_datum(person_id, field_datum_id, template)
         except Exception as e:
             logging.critical(str(e))
     if pco_type == "wed_anniversary":
-        value = datetime.strptime(attribute["startDate"], '%Y-%m-%dT%H:%M:%S')
-        value = value.strftime('%Y-%m-%d')
-        template = {
-            'anniversary': value
-        }
-
         try:
-            payload = pco.template('Person', template)
+            payload = pco.template('Person', anniversary_template(attribute))
             logging.info(f"Sending {name}'s Wedding Anniversary to Planning Center")
             person = pco.patch(f'/people/v2/people/{person["data"]["id"]}', payload)
         except Exception as e:
             logging.critical(str(e))
+
+
+def send_field_datum(person_id, field_datum_id, template):
+    payload = pco.template("FieldDatum", template)
+    field_definition = get_field_definition(int(template["field_definition_id"]))
+    if field_datum_id:
+        logging.info(f"Updating Planning Center Custom Field - {field_definition['attributes']['name']}")
+        return pco.patch(f'/people/v2/field_data/{field_datum_id}', payload)
+
+    logging.info(f"Creating Planning Center Custom Field - {field_definition['attributes']['name']}")
+    return pco.post(f'/people/v2/people/{person_id}/field_data', payload)
+
+
+def plan_person(person_f1, person_pco, attributes=()):
+    """Work out every change send_person_to_pco and send_attribute would make
+
+    Nothing is sent. The person's existing details come from person_pco
+    (a directory record with everything in directory.INCLUDES), so a plan
+    can be made for everyone before anything is written.
+
+    :param person_f1: the person to plan
+    :type person_f1: PersonF1
+    :param person_pco: their PCO record, or None if they're new
+    :type person_pco: dict
+    :param attributes: (F1 attribute, field mapping) pairs to send
+    :type attributes: list
+    :returns: a JSON-ready plan for apply_plan"""
+    snapshot = PersonSnapshot(person_pco)
+
+    plan = {
+        'f1_id': person_f1.id,
+        'name': person_f1.full_name(),
+        'pco_id': person_pco['data']['id'] if person_pco else None,
+        'person': person_template(person_f1, person_pco),
+        'phone_numbers': [],
+        'emails': [],
+        'addresses': [],
+        'field_data': [],
+        'anniversary': None,
+    }
+
+    for phone in person_f1.phones:
+        template = phone_template(phone, snapshot)
+        if template and template not in plan['phone_numbers']:
+            plan['phone_numbers'].append(template)
+
+    for email in person_f1.emails:
+        template = email_template(email, snapshot)
+        if template and template not in plan['emails']:
+            plan['emails'].append(template)
+
+    if SEND_ADDRESSES:
+        for address in person_f1.addresses:
+            template = address_template(address, snapshot)
+            if template and template not in plan['addresses']:
+                plan['addresses'].append(template)
+
+    for attribute, mapping in attributes:
+        if mapping['pco_data_type'] == 'field_data':
+            field_datum_id, template = field_datum_change(attribute, mapping, snapshot)
+            plan['field_data'].append({'id': field_datum_id, 'template': template})
+        if mapping['pco_data_type'] == 'wed_anniversary':
+            plan['anniversary'] = anniversary_template(attribute)['anniversary']
+
+    return plan
+
+
+def apply_plan(plan, journal=None):
+    """Make the changes in a plan from plan_person
+
+    Every decision was made when the plan was, so nothing is read from PCO
+    first. Only the writes themselves are sent.
+
+    :returns: the id of the PCO person and whether they already existed"""
+    f1_id = plan['f1_id']
+    person_exists = plan['pco_id'] is not None
+
+    person = dict(plan['person'])
+    if plan['anniversary']:
+        person['anniversary'] = plan['anniversary']
+    payload = pco.template('Person', person)
+
+    if person_exists:
+        logging.warning(f"Updating {plan['name']}")
+        id = pco.patch(f"/people/v2/people/{plan['pco_id']}", payload)['data']['id']
+    else:
+        logging.warning(f"Creating {plan['name']}")
+        id = pco.post('/people/v2/people', payload)['data']['id']
+    if journal:
+        journal.record(f1_id, 'sent', pco_id=id)
+
+    for template in plan['phone_numbers']:
+        logging.info(f"Sending Phone Number: {template['number']}")
+        pco.post(f'/people/v2/people/{id}/phone_numbers', pco.template('PhoneNumber', template))
+
+    for template in plan['emails']:
+        logging.info(f"Sending Email: {template['address']}")
+        pco.post(f'/people/v2/people/{id}/emails', pco.template('Email', template))
+
+    for template in plan['addresses']:
+        logging.info(f"Sending Address: {template['street']}, {template['city']}, {template['state']} {template['zip']}")
+        pco.post(f'/people/v2/people/{id}/addresses', pco.template('Address', template))
+    if journal:
+        journal.record(f1_id, 'contacts_sent')
+
+    for field_datum in plan['field_data']:
+        send_field_datum(id, field_datum['id'], field_datum['template'])
+    if journal:
+        journal.record(f1_id, 'attributes_sent', 'complete')
+
+    return id, person_exists
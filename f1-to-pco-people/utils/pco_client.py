@@ -0,0 +1,192 @@
+import heapq
+import itertools
+import logging
+import pypco
+import re
+import threading
+import time
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from . import transport
+from .metrics import body_size, metrics
+
+logger = logging.getLogger()
+
+# PCO allows 100 requests every 20 seconds until its headers say otherwise
+DEFAULT_LIMIT = 100
+DEFAULT_PERIOD = 20
+
+# Lower numbers go first: people are created before their details,
+#   and details before attributes
+PRIORITIES = [
+    ('POST', re.compile(r'/people/v2/people/?$'), 0),
+    ('PATCH', re.compile(r'/people/v2/people/\d+/?$'), 1),
+    ('POST', re.compile(r'/people/v2/people/\d+/(phone_numbers|emails|addresses)/?$'), 2),
+    ('POST', re.compile(r'/field_data/?$'), 4),
+    ('PATCH', re.compile(r'/people/v2/field_data/\d+/?$'), 4),
+]
+DEFAULT_PRIORITY = 3
+
+# 429s a request is retried through before the last one is returned
+MAX_RATE_LIMIT_RETRIES = 10
+
+
+class RateLimitScheduler:
+    """A token bucket shared by every thread talking to PCO
+
+    Tokens refill at limit / period per second. Waiting requests are let
+    through in priority order, and the bucket is kept in step with the
+    X-PCO-API-Request-Rate-* headers and any 429 Retry-After.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, period=DEFAULT_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.paused_until = 0
+
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.tickets = itertools.count()
+
+    def acquire(self, priority=DEFAULT_PRIORITY):
+        """Block until a request with this priority may be sent"""
+        with self.condition:
+            ticket = (priority, next(self.tickets))
+            heapq.heappush(self.waiting, ticket)
+            while True:
+                self.refill()
+                wait = self.wait_time()
+                if self.waiting[0] == ticket and wait <= 0:
+                    heapq.heappop(self.waiting)
+                    self.tokens -= 1
+                    self.condition.notify_all()
+                    return
+
+                self.condition.wait(timeout=min(max(wait, 0.01), 1))
+
+    def observe(self, response):
+        """Adjust the bucket using a PCO response"""
+        headers = response.headers
+        with self.condition:
+            if headers.get('X-PCO-API-Request-Rate-Limit'):
+                self.limit = int(headers['X-PCO-API-Request-Rate-Limit'])
+            if headers.get('X-PCO-API-Request-Rate-Period'):
+                self.period = int(headers['X-PCO-API-Request-Rate-Period'])
+
+            # Never believe there are more tokens than PCO says are left
+            if headers.get('X-PCO-API-Request-Rate-Count'):
+                remaining = self.limit - int(headers['X-PCO-API-Request-Rate-Count'])
+                self.refill()
+                self.tokens = min(self.tokens, max(remaining, 0))
+
+            if response.status_code == 429:
+                retry_after = retry_after_seconds(headers.get('Retry-After'), self.period)
+                logger.warning(f"Rate limited by Planning Center, pausing for {retry_after:g}s")
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                self.tokens = 0
+
+            self.condition.notify_all()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.period)
+        self.updated = now
+
+    def wait_time(self):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * self.period / self.limit
+
+
+class ScheduledPCO(pypco.PCO):
+    """A pypco client whose requests all go through a RateLimitScheduler
+
+    Requests are sent on a pooled keep-alive session rather than pypco's
+    bare requests.request. Safe to share between threads. Hooks into pypco
+    1.0's private request methods, so keep pypco pinned.
+    """
+
+    def __init__(self, *args, scheduler=None, session=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.session = session or transport.new_session()
+
+    def _do_request(self, method, url, payload=None, upload=None, **params):
+        self.scheduler.acquire(request_priority(method, url))
+        started = time.monotonic()
+        try:
+            response = self._send(method, url, payload, upload, **params)
+        except Exception:
+            metrics.record('pco', method, url, time.monotonic() - started, size=body_size(payload))
+            raise
+
+        metrics.record('pco', method, url, time.monotonic() - started, response.status_code,
+                       body_size(payload) + len(response.content))
+        self.scheduler.observe(response)
+        return response
+
+    def _send(self, method, url, payload=None, upload=None, **params):
+        # pypco's _do_request, on our session
+        request_params = {
+            'headers': {
+                'User-Agent': 'pypco',
+                'Authorization': self._auth_header,
+            },
+            'params': params,
+            'json': payload,
+            'timeout': self.upload_timeout if upload else self.timeout,
+        }
+
+        if not upload:
+            return self.session.request(method, url, **request_params)
+
+        with open(upload, 'rb') as upload_fh:
+            request_params['files'] = {'file': upload_fh}
+            return self.session.request(method, url, **request_params)
+
+    def _do_ratelimit_managed_request(self, method, url, payload=None, upload=None, **params):
+        # The scheduler has already paused every thread on a 429, so just try again
+        for _ in range(MAX_RATE_LIMIT_RETRIES):
+            response = self._do_timeout_managed_request(method, url, payload, upload, **params)
+            if response.status_code != 429:
+                return response
+            metrics.retry('pco', method, url)
+
+        # pypco raises for the last 429 like any other error response
+        logger.error(f"Still rate limited by Planning Center after {MAX_RATE_LIMIT_RETRIES} tries: {method} {url}")
+        return response
+
+
+def retry_after_seconds(value, default):
+    """Seconds to wait from a Retry-After header, which is delay-seconds or an HTTP-date"""
+    if not value:
+        return default
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Couldn't read Retry-After '{value}', waiting {default}s")
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+def request_priority(method, url):
+    path = urlparse(url).path
+    for priority_method, pattern, priority in PRIORITIES:
+        if method == priority_method and pattern.search(path):
+            return priority
+    return DEFAULT_PRIORITY
@@ -0,0 +1,51 @@
+import json
+import logging
+import threading
+
+logger = logging.getLogger()
+
+
+class PlanWriter:
+    """Writes each person's plan as one line of compact JSON
+
+    Plans are written from the planner threads, so writes are serialized.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, mode='w')
+        self.lock = threading.Lock()
+        self.people = 0
+        self.creates = 0
+        self.writes = 0
+
+    def write(self, plan):
+        """Write a plan from pco.plan_person"""
+        line = json.dumps(plan, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + '\n')
+            self.people += 1
+            self.creates += plan['pco_id'] is None
+            self.writes += plan_writes(plan)
+
+    def summary(self):
+        return (f"{self.people} people ({self.creates} new, {self.people - self.creates} updated), "
+                f"{self.writes} writes planned in {self.path}")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_plan(path):
+    """Yield each person's plan from a file written by PlanWriter"""
+    with open(path) as plan_file:
+        for line in plan_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def plan_writes(plan):
+    """How many requests applying a plan takes"""
+    return (1 + len(plan['phone_numbers']) + len(plan['emails']) +
+            len(plan['addresses']) + len(plan['field_data']))
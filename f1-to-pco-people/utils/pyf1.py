@@ -1,16 +1,22 @@
 import urllib
 import logging
+import time
 
 from rauth import OAuth1Session, OAuth1Service
 from base64 import b64encode
+from . import transport
+from .metrics import metrics
 
 logger = logging.getLogger()
 
+# CT fellowshipone base URL
+BASE_URL = "https://christny.fellowshiponeapi.com"
+
 
 class F1API(OAuth1Session):
     """A class for initializaint the F1 api session"""
 
-    def __init__(self, clientKey, clientSecret, username, password):
+    def __init__(self, clientKey, clientSecret, username, password, baseUrl=BASE_URL):
         """Class Constructor assigns class variables and attempts authentication
 
         :param clientKey: Oauth1 client key
@@ -19,10 +25,11 @@ class F1API(OAuth1Session):
         :type clientSecret: string
         :param username: FellowshipOne username
         :type username: string
-        :param password: FellowshipOne password :type password: string"""
+        :param password: FellowshipOne password :type password: string
+        :param baseUrl: the FellowshipOne API (or a stand-in for it)
+        :type baseUrl: string"""
 
-        # CT fellowshipone base URL
-        self.baseUrl = "https://christny.fellowshiponeapi.com"
+        self.baseUrl = baseUrl.rstrip('/')
 
         # Hash credentials
         credential_string = "{} {}".format(username, password)
@@ -51,7 +58,11 @@ class F1API(OAuth1Session):
                 oauth_token,
                 oauth_tokensecret
         )
-        self.session = session
+        # Pooled so every worker thread keeps its own connection open
+        self.session = transport.configure_session(session)
+
+        # An optional ResponseCache consulted before every GET
+        self.cache = None
 
     def get(self, endpoint, urlParams=[], **kwargs):
         for key in urlParams:
@@ -59,14 +70,30 @@ class F1API(OAuth1Session):
             endpoint = endpoint.replace('{{{}}}'.format(key), urlParam)
         request_url = "%s%s" % (self.baseUrl, endpoint)
 
-        response = self.session.get(
-                request_url,
-                header_auth=True,
-                headers={"Accept": "application/json"},
-                **kwargs
-        )
+        if self.cache:
+            cached = self.cache.get(endpoint, kwargs.get('params'))
+            if cached:
+                return cached
+
+        # Newer requests pass params=None through, which rauth can't sign
+        kwargs['params'] = kwargs.get('params') or {}
+
+        started = time.monotonic()
+        try:
+            response = self.session.get(
+                    request_url,
+                    header_auth=True,
+                    headers={"Accept": "application/json"},
+                    **kwargs
+            )
+        except Exception:
+            metrics.record('f1', 'GET', endpoint, time.monotonic() - started)
+            raise
+        metrics.record('f1', 'GET', endpoint, time.monotonic() - started, response.status_code, len(response.content))
 
         if response.status_code < 300:
+            if self.cache:
+                self.cache.put(endpoint, kwargs.get('params'), response)
             return response
 
         logger.debug(f"Error: {response.status_code}")
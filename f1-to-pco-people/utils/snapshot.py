@@ -0,0 +1,35 @@
+import threading
+
+# The related records a snapshot keeps, by their JSON:API type
+TYPES = {
+    'PhoneNumber': 'phone_numbers',
+    'Email': 'emails',
+    'Address': 'addresses',
+    'FieldDatum': 'field_data',
+}
+
+
+class PersonSnapshot:
+    """The contact details a PCO person has, fetched once per person
+
+    The snapshot is built from the records included with the person's
+    PATCH (or is empty for a new person) and is kept up to date as new
+    details are posted, so no send_* function has to list them again.
+    """
+
+    def __init__(self, person=None):
+        self.phone_numbers = []
+        self.emails = []
+        self.addresses = []
+        self.field_data = []
+        self.lock = threading.Lock()
+
+        for record in (person or {}).get('included') or []:
+            self.add(record)
+
+    def add(self, record):
+        """Add a JSON:API resource (e.g. the 'data' of a POST response)"""
+        if not record or record.get('type') not in TYPES:
+            return
+        with self.lock:
+            getattr(self, TYPES[record['type']]).append(record)
@@ -0,0 +1,90 @@
+import logging
+import random
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger()
+
+# Connections kept open to each host. migrate.py raises this to cover
+#   every worker thread so no thread waits on (or reopens) a connection
+POOL_SIZE = 10
+
+# Idempotent requests are retried on connection errors and these statuses.
+#   429s are left to the callers, which already know how to wait them out
+RETRIES = 3
+RETRY_STATUSES = [500, 502, 503, 504]
+BACKOFF_FACTOR = 0.5
+
+# Seconds to wait for a response when the caller doesn't say
+TIMEOUT = 60
+
+
+class JitteredRetry(Retry):
+    """Exponential backoff with full jitter
+
+    Threads that failed together would otherwise all retry at the same
+    moment and fail together again.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """An HTTPAdapter with a default timeout, which requests doesn't have"""
+
+    def __init__(self, *args, timeout=TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def configure(pool_size=None):
+    """Set the pool size used by sessions created from now on"""
+    global POOL_SIZE
+    if pool_size:
+        POOL_SIZE = max(int(pool_size), 1)
+
+
+def adapter(pool_size=None, retries=RETRIES):
+    """A keep-alive connection pool with jittered retries"""
+    pool_size = pool_size or POOL_SIZE
+    retry = JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=BACKOFF_FACTOR,
+        raise_on_status=False,
+    )
+    return TimeoutAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+
+def configure_session(session, pool_size=None, retries=RETRIES):
+    """Mount pooled adapters on an existing session (e.g. an OAuth session)
+
+    :param session: the session to set up
+    :type session: requests.Session
+    :param pool_size: connections kept open per host (defaults to POOL_SIZE)
+    :type pool_size: int
+    :param retries: how many times to retry idempotent requests
+    :type retries: int
+    :returns: the session"""
+    for prefix in ['https://', 'http://']:
+        session.mount(prefix, adapter(pool_size, retries))
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def new_session(pool_size=None, retries=RETRIES):
+    """A pooled, keep-alive session"""
+    return configure_session(requests.Session(), pool_size, retries)
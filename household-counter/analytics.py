@@ -0,0 +1,114 @@
+import numpy
+import pandas
+
+from datetime import date
+from households import MINIMUM_ADULT_AGE
+
+COLUMNS = ['household_id', 'person_id', 'status', 'birthdate', 'campus_id']
+
+# Default age bands for the band report: [0, 13), [13, 18), ...
+AGE_BANDS = [0, 13, 18, 30, 50, 65]
+
+
+class HouseholdFrame:
+    """Household members loaded once into columns
+
+    Ages are computed for everyone in one vectorized pass when the frame is
+    built, so any report (a different adult age, by campus, by age band)
+    is a groupby over arrays that are already in memory.
+    """
+
+    def __init__(self, members, today=None):
+        """Build the frame
+
+        :param members: one row per household member with COLUMNS
+        :type members: pandas.DataFrame
+        :param today: the date ages are computed on (defaults to today)
+        :type today: datetime.date"""
+        today = today or date.today()
+        self.members = members.reset_index(drop=True)
+
+        # Age in whole years, the same as relativedelta(today, birthdate).years
+        birthdate = pandas.to_datetime(self.members['birthdate'], errors='coerce')
+        before_birthday = (birthdate.dt.month > today.month) | ((birthdate.dt.month == today.month) & (birthdate.dt.day > today.day))
+        self.members['age'] = today.year - birthdate.dt.year - before_birthday.astype(int)
+        self.members['active'] = (self.members['status'] == 'active').to_numpy()
+
+        # A household counts if anyone in it is active
+        households = self.members.groupby('household_id')
+        active_people = households['active'].sum()
+        self.active_households = active_people.index[active_people > 0]
+        self.active_members = self.members[self.members['household_id'].isin(self.active_households)]
+        self.campuses = household_campuses(self.active_members)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Build a frame from pages of households with their people included"""
+        rows = []
+        for page in pages:
+            people = {person['id']: person for person in page.get('included', []) if person['type'] == 'Person'}
+            for household in page['data']:
+                for member in household['relationships']['people']['data']:
+                    person = people.get(member['id'])
+                    if not person:
+                        continue
+                    campus = person.get('relationships', {}).get('primary_campus', {}).get('data')
+                    rows.append((household['id'], person['id'], person['attributes']['status'],
+                                 person['attributes']['birthdate'], campus['id'] if campus else None))
+        return cls(pandas.DataFrame(rows, columns=COLUMNS))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Build a frame from a snapshot.Snapshot"""
+        members = pandas.read_sql_query("""
+            SELECT household_members.household_id, people.id AS person_id, people.status, people.birthdate, people.campus_id
+            FROM household_members JOIN people ON people.id = household_members.person_id
+        """, snapshot.conn)
+        return cls(members)
+
+    def active_people(self):
+        """The number of active people in households"""
+        return int(self.active_members['active'].sum())
+
+    def size_histogram(self, minimum_age=MINIMUM_ADULT_AGE):
+        """{household size: number of households}, counting members at least minimum_age
+
+        Members without a birthdate are counted, as the original counter did."""
+        counted = self.active_members['age'].isna() | (self.active_members['age'] >= minimum_age)
+        sizes = counted.groupby(self.active_members['household_id']).sum()
+        return histogram(sizes)
+
+    def size_histogram_by_campus(self, minimum_age=MINIMUM_ADULT_AGE):
+        """{campus id: size histogram} using each household's most common campus"""
+        counted = self.active_members['age'].isna() | (self.active_members['age'] >= minimum_age)
+        sizes = counted.groupby(self.active_members['household_id']).sum()
+        campuses = self.campuses.reindex(sizes.index).fillna('none')
+        return {campus: histogram(campus_sizes) for campus, campus_sizes in sizes.groupby(campuses)}
+
+    def size_histogram_by_age_band(self, bands=AGE_BANDS):
+        """{band label: size histogram} counting only the members in each band
+
+        Members without a birthdate aren't in any band."""
+        edges = list(bands) + [numpy.inf]
+        labels = [band_label(low, high) for low, high in zip(edges, edges[1:])]
+        band = pandas.cut(self.active_members['age'], edges, right=False, labels=labels)
+
+        counts = pandas.crosstab(self.active_members['household_id'], band).reindex(self.active_households, fill_value=0)
+        return {label: histogram(counts[label]) if label in counts else {} for label in labels}
+
+
+def household_campuses(members):
+    """The most common campus among each household's members"""
+    with_campus = members.dropna(subset=['campus_id'])
+    counts = with_campus.groupby(['household_id', 'campus_id']).size().reset_index(name='members')
+    counts = counts.sort_values(['household_id', 'members'], ascending=[True, False])
+    return counts.drop_duplicates('household_id').set_index('household_id')['campus_id']
+
+
+def histogram(sizes):
+    counts = sizes.astype(int).value_counts().sort_index()
+    return {int(size): int(households) for size, households in counts.items()}
+
+
+def band_label(low, high):
+    return f"{int(low)}+" if high == numpy.inf else f"{int(low)}-{int(high) - 1}"
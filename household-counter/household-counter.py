@@ -1,91 +1,103 @@
+import argparse
 import enlighten
 import os
 import pypco
-import requests
-import time
-
-from dateutil.relativedelta import relativedelta
-from datetime import date
-
-LARGE_FAMILY_SIZE=7
-MINIMUM_ADULT_AGE=16
-
-pco = pypco.PCO(
-        os.environ["PCO_KEY"],
-        os.environ["PCO_SECRET"]
-    )
-
-# Collect the number of people in PCO
-response = pco.get('https://api.planningcenteronline.com/people/v2/people?where[status]=active&per_page=0')
-people = response['meta']['total_count']
-
-print(f"There are {people} active profiles in PCO People\n")
-
-url = "https://api.planningcenteronline.com/people/v2/households?include=people"
-response = pco.get(url)
-household_total = response['meta']['total_count']
-
-# Setup Progress Bar
-manager = enlighten.get_manager()
-progress = manager.counter(total=household_total, desc='Retrieving from PCO', unit='households')
-
-# Loop through households
-household_counts = {}
-household_total = 0
-while True:
-    # Get the next 25 households
-    response = pco.get(url)
-
-    for household in response['data']:
-        active = False
-        household_member_count = 0
-        # Check each household person to make sure someone is active
-        for household_person in household['relationships']['people']['data']:
-            for person in response['included']:
-                # Ensure that SOMEONE in the household is active
-                if person['id'] == household_person['id'] and person['attributes']['status'] == 'active':
-                    active = True
-                    # keep a running total of all active household members
-                    household_total += 1
-
-                # Check that the person's age is greateer than MINIMUM_ADULT_AGE
-                if person['id'] == household_person['id']:
-                    if person['attributes']['birthdate'] != None:
-                        age = relativedelta(date.today(), date.fromisoformat(person['attributes']['birthdate'])).years
-
-                        if age < MINIMUM_ADULT_AGE:
-                            continue
-                    # Age Appropriate Counter
-                    household_member_count += 1
-
-        # If a household is deemed active, record it's size
-        if active:
-            if household_member_count not in household_counts:
-                household_counts[household_member_count] = 0
-            household_counts[household_member_count] += 1
-                
-            """
-            # If the family is large, print a link for verification
-            if household_member_count >= LARGE_FAMILY_SIZE:
-                primary_url = 'https://people.planningcenteronline.com/people/AC'
-                id_number = household['relationships']['primary_contact']['data']['id']
-                print(f"Large household ({household_member_count}) - {primary_url}{id_number}")
-            """
-        progress.update()
-
-    if 'next' not in response['links']:
-        break
-
-    # On to the next set of households
-    url = response['links']['next']
-
-# Print out the results (and grab a running total of people over the MINIMUM_ADULT_AGE)
-adult_total = 0
-for count in range(max(household_counts.keys())):
-    if count in household_counts:
-        print(f"There are {household_counts[count]} households with {count} people over the age of {MINIMUM_ADULT_AGE}")
-
-        adult_total += int(count) * household_counts[count]
-
-print(f"\nThere are {adult_total} active people in households over the age of {MINIMUM_ADULT_AGE}")
-print(f"There are {household_total} active people in households")
+
+from analytics import AGE_BANDS, HouseholdFrame
+from households import MINIMUM_ADULT_AGE, count_active_people, count_households, fetch_pages
+from snapshot import Snapshot
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-a", "--adult-age", dest="adult_age", type=int, default=MINIMUM_ADULT_AGE)
+parser.add_argument("-w", "--workers", dest="workers", type=int, default=8,
+                    help="Number of pages fetched from PCO at the same time")
+parser.add_argument("-s", "--snapshot", dest="snapshot",
+                    help="Keep a SQLite snapshot and only fetch what changed since the last run")
+parser.add_argument("--full", dest="full", action="store_true",
+                    help="Refresh the whole snapshot instead of only what changed")
+parser.add_argument("-t", "--thresholds", dest="thresholds", type=int, nargs="+",
+                    help="Report household sizes for each of these adult ages")
+parser.add_argument("-c", "--by-campus", dest="by_campus", action="store_true",
+                    help="Report household sizes for each campus")
+parser.add_argument("-b", "--age-bands", dest="age_bands", type=int, nargs="*",
+                    help=f"Report household sizes for each age band (default {AGE_BANDS})")
+
+
+def main():
+    args = parser.parse_args()
+
+    pco = pypco.PCO(
+            os.environ["PCO_KEY"],
+            os.environ["PCO_SECRET"],
+            api_base=os.environ.get("PCO_API_BASE", "https://api.planningcenteronline.com")
+        )
+
+    # Collect the number of people in PCO
+    people = count_active_people(pco)
+
+    print(f"There are {people} active profiles in PCO People\n")
+
+    # Setup Progress Bar
+    manager = enlighten.get_manager()
+    progress = manager.counter(desc='Retrieving from PCO', unit='households')
+
+    reporting = args.thresholds or args.by_campus or args.age_bands is not None
+
+    if args.snapshot:
+        # Update the local snapshot and count from it
+        snapshot = Snapshot(args.snapshot)
+        try:
+            snapshot.refresh(pco, args.workers, args.full, progress)
+            if reporting:
+                frame = HouseholdFrame.from_snapshot(snapshot)
+            else:
+                household_counts, household_total = snapshot.count_households(args.adult_age)
+        finally:
+            snapshot.close()
+    else:
+        # Loop through households
+        pages = fetch_pages(pco, args.workers, progress=progress)
+        if reporting:
+            frame = HouseholdFrame.from_pages(pages)
+        else:
+            household_counts, household_total = count_households(pages, args.adult_age)
+
+    if not reporting:
+        print_results(household_counts, household_total, args.adult_age)
+        return
+
+    # Slice the loaded data as many ways as were asked for
+    for threshold in args.thresholds or [args.adult_age]:
+        print_results(frame.size_histogram(threshold), frame.active_people(), threshold)
+        print()
+
+    if args.by_campus:
+        for campus, household_counts in frame.size_histogram_by_campus(args.adult_age).items():
+            print(f"Campus {campus}:")
+            print_histogram(household_counts, f"people over the age of {args.adult_age}")
+            print()
+
+    if args.age_bands is not None:
+        for band, household_counts in frame.size_histogram_by_age_band(args.age_bands or AGE_BANDS).items():
+            print(f"Ages {band}:")
+            print_histogram(household_counts, f"people aged {band}")
+            print()
+
+
+def print_results(household_counts, household_total, minimum_adult_age):
+    # Print out the results (and grab a running total of people over the minimum_adult_age)
+    print_histogram(household_counts, f"people over the age of {minimum_adult_age}")
+    adult_total = sum(int(count) * households for count, households in household_counts.items())
+
+    print(f"\nThere are {adult_total} active people in households over the age of {minimum_adult_age}")
+    print(f"There are {household_total} active people in households")
+
+
+def print_histogram(household_counts, description):
+    for count in range(max(household_counts.keys(), default=0) + 1):
+        if count in household_counts:
+            print(f"There are {household_counts[count]} households with {count} {description}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from dateutil.relativedelta import relativedelta
+from datetime import date
+
+HOUSEHOLDS_URL = '/people/v2/households'
+PER_PAGE = 100
+LARGE_FAMILY_SIZE = 7
+MINIMUM_ADULT_AGE = 16
+
+
+def fetch_pages(pco, workers=8, per_page=PER_PAGE, progress=None, url=HOUSEHOLDS_URL, include='people', **params):
+    """Yield every page of households, with their people included
+
+    The first page tells us how many households there are, so every other
+    page is requested by offset on a pool of workers. Pages come back in
+    order.
+
+    :param pco: the PCO client
+    :type pco: pypco.PCO
+    :param workers: how many pages to fetch at once
+    :type workers: int
+    :param per_page: households per page (PCO allows up to 100)
+    :type per_page: int
+    :param progress: an optional counter updated for each household
+    :type progress: enlighten.Counter
+    :param url: the collection to page through
+    :type url: string
+    :param include: related records to include, if any
+    :type include: string
+    :param params: extra query parameters, such as where filters"""
+    if include:
+        params['include'] = include
+
+    first = get_page(pco, url, 0, per_page, params)
+    total = first['meta']['total_count']
+    if progress:
+        progress.total = total
+        progress.update(len(first['data']))
+    yield first
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        pages = executor.map(lambda offset: get_page(pco, url, offset, per_page, params), range(per_page, total, per_page))
+        for page in pages:
+            if progress:
+                progress.update(len(page['data']))
+            yield page
+
+
+def get_page(pco, url, offset, per_page, params):
+    return pco.get(url, per_page=str(per_page), offset=str(offset), **params)
+
+
+def count_households(pages, minimum_adult_age=MINIMUM_ADULT_AGE):
+    """Count active households by the number of members at least minimum_adult_age
+
+    :param pages: pages of households with their people included
+    :type pages: iterable
+    :returns: ({household size: number of households}, active people in households)"""
+    household_counts = {}
+    household_total = 0
+    today = date.today()
+    for page in pages:
+        # Index the included people so each member is a single lookup
+        people = {person['id']: person for person in page.get('included', []) if person['type'] == 'Person'}
+
+        for household in page['data']:
+            active = False
+            household_member_count = 0
+            for household_person in household['relationships']['people']['data']:
+                person = people.get(household_person['id'])
+                if not person:
+                    continue
+
+                # Ensure that SOMEONE in the household is active
+                if person['attributes']['status'] == 'active':
+                    active = True
+                    # keep a running total of all active household members
+                    household_total += 1
+
+                # Check that the person's age is greater than minimum_adult_age
+                if person['attributes']['birthdate'] is not None:
+                    age = relativedelta(today, date.fromisoformat(person['attributes']['birthdate'])).years
+                    if age < minimum_adult_age:
+                        continue
+
+                # Age Appropriate Counter
+                household_member_count += 1
+
+            # If a household is deemed active, record it's size
+            if active:
+                household_counts[household_member_count] = household_counts.get(household_member_count, 0) + 1
+
+                """
+                # If the family is large, print a link for verification
+                if household_member_count >= LARGE_FAMILY_SIZE:
+                    primary_url = 'https://people.planningcenteronline.com/people/AC'
+                    id_number = household['relationships']['primary_contact']['data']['id']
+                    print(f"Large household ({household_member_count}) - {primary_url}{id_number}")
+                """
+
+    return household_counts, household_total
+
+
+def count_active_people(pco):
+    response = pco.get('/people/v2/people', **{'where[status]': 'active', 'per_page': '0'})
+    return response['meta']['total_count']
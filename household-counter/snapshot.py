@@ -0,0 +1,127 @@
+import sqlite3
+
+from dateutil.relativedelta import relativedelta
+from datetime import date, datetime, timezone
+from households import MINIMUM_ADULT_AGE, fetch_pages
+
+PEOPLE_URL = '/people/v2/people'
+
+
+class Snapshot:
+    """A local copy of PCO's households and people kept in SQLite
+
+    The first refresh pulls every household. Later refreshes only ask for
+    households and people updated since the last one, so a weekly report
+    takes a few pages. Deletions can't be seen through updated_at, so run a
+    full refresh every so often.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS people (
+                id TEXT PRIMARY KEY,
+                status TEXT,
+                birthdate TEXT,
+                campus_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS households (
+                id TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS household_members (
+                household_id TEXT NOT NULL,
+                person_id TEXT NOT NULL,
+                PRIMARY KEY (household_id, person_id)
+            );
+            CREATE INDEX IF NOT EXISTS household_members_person_id ON household_members (person_id);
+            CREATE TABLE IF NOT EXISTS snapshot_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def last_refresh(self):
+        row = self.conn.execute("SELECT value FROM snapshot_meta WHERE key = 'last_refresh'").fetchone()
+        return row[0] if row else None
+
+    def refresh(self, pco, workers=8, full=False, progress=None):
+        """Bring the snapshot up to date
+
+        :param pco: the PCO client
+        :type pco: pypco.PCO
+        :param workers: how many pages to fetch at once
+        :type workers: int
+        :param full: pull every household even if there was an earlier refresh
+        :type full: bool
+        :returns: the number of households fetched"""
+        started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        since = None if full else self.last_refresh()
+
+        if since is None:
+            self.clear()
+            households = self.apply_households(fetch_pages(pco, workers, progress=progress))
+        else:
+            updated = {'where[updated_at][gte]': since}
+            households = self.apply_households(fetch_pages(pco, workers, progress=progress, **updated))
+
+            # People can change (e.g. become inactive) without their household changing
+            for page in fetch_pages(pco, workers, url=PEOPLE_URL, include=None, **updated):
+                self.apply_people(page['data'])
+
+        self.conn.execute("INSERT OR REPLACE INTO snapshot_meta (key, value) VALUES ('last_refresh', ?)", (started,))
+        self.conn.commit()
+        return households
+
+    def clear(self):
+        self.conn.executescript("""
+            DELETE FROM household_members;
+            DELETE FROM households;
+            DELETE FROM people;
+        """)
+
+    def apply_households(self, pages):
+        households = 0
+        for page in pages:
+            self.apply_people([person for person in page.get('included', []) if person['type'] == 'Person'])
+            for household in page['data']:
+                # Replace the household's members with the current list
+                self.conn.execute("INSERT OR IGNORE INTO households (id) VALUES (?)", (household['id'],))
+                self.conn.execute("DELETE FROM household_members WHERE household_id = ?", (household['id'],))
+                self.conn.executemany("INSERT OR IGNORE INTO household_members (household_id, person_id) VALUES (?, ?)",
+                                      [(household['id'], member['id']) for member in household['relationships']['people']['data']])
+                households += 1
+        return households
+
+    def apply_people(self, people):
+        self.conn.executemany("INSERT OR REPLACE INTO people (id, status, birthdate, campus_id) VALUES (?, ?, ?, ?)",
+                              [(person['id'], person['attributes']['status'], person['attributes']['birthdate'], campus_id(person))
+                               for person in people])
+
+    def count_households(self, minimum_adult_age=MINIMUM_ADULT_AGE):
+        """Count households the same way households.count_households does
+
+        :returns: ({household size: number of households}, active people in households)"""
+        # Anyone born on or before the cutoff is at least minimum_adult_age
+        cutoff = (date.today() - relativedelta(years=minimum_adult_age)).isoformat()
+        rows = self.conn.execute("""
+            SELECT SUM(people.birthdate IS NULL OR people.birthdate <= ?) AS adults,
+                   SUM(people.status = 'active') AS active_people
+            FROM household_members JOIN people ON people.id = household_members.person_id
+            GROUP BY household_members.household_id
+            HAVING active_people > 0
+        """, (cutoff,))
+
+        household_counts = {}
+        household_total = 0
+        for adults, active_people in rows:
+            household_counts[adults] = household_counts.get(adults, 0) + 1
+            household_total += active_people
+        return household_counts, household_total
+
+    def close(self):
+        self.conn.close()
+
+
+def campus_id(person):
+    campus = person.get('relationships', {}).get('primary_campus', {}).get('data')
+    return campus['id'] if campus else None
@@ -0,0 +1,60 @@
+"""An in-memory stand-in for the parts of PCO household-counter pages through"""
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+OLD = '2020-01-01T00:00:00Z'
+
+
+def years_ago(years):
+    return (date.today() - relativedelta(years=years)).isoformat()
+
+
+class FakePCO:
+    def __init__(self):
+        self.people = {}
+        self.households = {}
+        self.requests = []
+
+    def person(self, person_id, status='active', birthdate=None, campus=None, updated_at=OLD):
+        self.people[person_id] = {
+            'type': 'Person', 'id': person_id,
+            'attributes': {'status': status, 'birthdate': birthdate, 'updated_at': updated_at},
+            'relationships': {'primary_campus': {'data': {'type': 'Campus', 'id': campus} if campus else None}},
+        }
+
+    def household(self, household_id, members, updated_at=OLD):
+        self.households[household_id] = {
+            'type': 'Household', 'id': household_id, 'attributes': {'updated_at': updated_at},
+            'relationships': {'people': {'data': [{'type': 'Person', 'id': member} for member in members]}},
+        }
+
+    def get(self, url, per_page='25', offset='0', include=None, **params):
+        self.requests.append((url, int(offset)))
+        records = list((self.households if url == '/people/v2/households' else self.people).values())
+        if params.get('where[status]'):
+            records = [record for record in records if record['attributes']['status'] == params['where[status]']]
+        since = params.get('where[updated_at][gte]')
+        if since:
+            records = [record for record in records if record['attributes']['updated_at'] >= since]
+
+        page = records[int(offset):int(offset) + int(per_page)]
+        document = {'data': page, 'meta': {'total_count': len(records)}}
+        if include == 'people':
+            members = {member['id'] for household in page for member in household['relationships']['people']['data']}
+            document['included'] = [self.people[member] for member in sorted(members) if member in self.people]
+        return document
+
+
+def sample_pco():
+    """Three households: one active with a child, one inactive, one active with no birthdate on file"""
+    pco = FakePCO()
+    pco.person('1', birthdate='1980-05-01', campus='A')
+    pco.person('2', status='inactive', birthdate=years_ago(5), campus='A')
+    pco.person('3', status='inactive', birthdate='1970-01-01', campus='B')
+    pco.person('4', birthdate=None, campus='B')
+    pco.person('5', birthdate=years_ago(20), campus='B')
+    pco.household('10', ['1', '2'])
+    pco.household('11', ['3'])
+    pco.household('12', ['4', '5'])
+    return pco
@@ -0,0 +1,40 @@
+from datetime import date
+
+import pandas
+
+from analytics import COLUMNS, HouseholdFrame
+from fake_pco import sample_pco
+from households import count_households, fetch_pages
+from snapshot import Snapshot
+
+
+def test_the_size_histogram_matches_the_counter():
+    pco = sample_pco()
+    frame = HouseholdFrame.from_pages(fetch_pages(pco))
+    for age in (0, 16, 30, 60):
+        assert (frame.size_histogram(age), frame.active_people()) == count_households(fetch_pages(pco), age)
+
+
+def test_ages_turn_over_on_the_birthday():
+    members = pandas.DataFrame([
+        ('1', '1', 'active', '2000-06-15', None),
+        ('2', '2', 'active', '2000-06-16', None),
+        ('3', '3', 'active', '2000-02-29', None),
+    ], columns=COLUMNS)
+    frame = HouseholdFrame(members, today=date(2016, 6, 15))
+    assert frame.members['age'].tolist() == [16, 15, 16]
+    assert frame.size_histogram(16) == {0: 1, 1: 2}
+
+
+def test_reports_by_campus_and_age_band(tmp_path):
+    snapshot = Snapshot(str(tmp_path / "snapshot.db"))
+    snapshot.refresh(sample_pco())
+    frame = HouseholdFrame.from_snapshot(snapshot)
+    snapshot.close()
+
+    # Household 10's only campus member is at A; household 12 is at B
+    assert frame.size_histogram_by_campus(16) == {'A': {1: 1}, 'B': {2: 1}}
+
+    # No one is 65 or over, so that band has no households at all
+    bands = frame.size_histogram_by_age_band([0, 18, 65])
+    assert bands == {'0-17': {0: 1, 1: 1}, '18-64': {1: 2}, '65+': {}}
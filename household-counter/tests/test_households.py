@@ -0,0 +1,35 @@
+from fake_pco import FakePCO, sample_pco
+from households import count_active_people, count_households, fetch_pages
+
+
+class Progress:
+    def __init__(self):
+        self.total = None
+        self.count = 0
+
+    def update(self, count=1):
+        self.count += count
+
+
+def test_every_page_is_fetched_in_order():
+    pco = FakePCO()
+    for household_id in range(230):
+        pco.person(str(household_id))
+        pco.household(str(household_id), [str(household_id)])
+
+    progress = Progress()
+    pages = list(fetch_pages(pco, workers=4, per_page=100, progress=progress))
+    assert [household['id'] for page in pages for household in page['data']] == [str(i) for i in range(230)]
+    assert sorted(offset for _, offset in pco.requests) == [0, 100, 200]
+    assert (progress.total, progress.count) == (230, 230)
+
+
+def test_an_empty_pco_is_one_page():
+    assert [page['data'] for page in fetch_pages(FakePCO())] == [[]]
+
+
+def test_households_are_counted_by_adults():
+    pco = sample_pco()
+    assert count_households(fetch_pages(pco, per_page=2)) == ({1: 1, 2: 1}, 3)
+    assert count_households(fetch_pages(pco), minimum_adult_age=30) == ({1: 2}, 3)
+    assert count_active_people(pco) == 3
@@ -0,0 +1,44 @@
+from fake_pco import FakePCO, sample_pco
+from households import count_households, fetch_pages
+from snapshot import Snapshot
+
+LATER = '2999-01-01T00:00:00Z'
+
+
+def test_a_snapshot_counts_like_the_pages_do(tmp_path):
+    pco = sample_pco()
+    snapshot = Snapshot(str(tmp_path / "snapshot.db"))
+    assert snapshot.refresh(pco, workers=2) == 3
+    for age in (16, 30):
+        assert snapshot.count_households(age) == count_households(fetch_pages(pco), age)
+    snapshot.close()
+
+
+def test_later_refreshes_only_fetch_what_changed(tmp_path):
+    pco = sample_pco()
+    path = str(tmp_path / "snapshot.db")
+    snapshot = Snapshot(path)
+    snapshot.refresh(pco)
+
+    # Person 3 becomes active and person 6 joins household 12
+    pco.person('3', birthdate='1970-01-01', updated_at=LATER)
+    pco.person('6', birthdate='1990-01-01', updated_at=LATER)
+    pco.household('12', ['4', '5', '6'], updated_at=LATER)
+    pco.requests = []
+
+    snapshot = Snapshot(path)
+    assert snapshot.refresh(pco) == 1
+    assert snapshot.count_households() == ({1: 2, 3: 1}, 5)
+    assert snapshot.count_households() == count_households(fetch_pages(pco))
+    assert ('/people/v2/households', 0) in pco.requests
+
+    # A full refresh starts again from nothing
+    assert snapshot.refresh(pco, full=True) == 3
+    snapshot.close()
+
+
+def test_an_empty_snapshot_counts_nothing(tmp_path):
+    snapshot = Snapshot(str(tmp_path / "snapshot.db"))
+    snapshot.refresh(FakePCO())
+    assert snapshot.count_households() == ({}, 0)
+    snapshot.close()
@@ -0,0 +1,253 @@
+#!/usr/local/bin/python3
+"""A local stand-in for the parts of the FellowshipOne API these scripts use
+
+    python make_normal_db.py --scale 50k --duplicate-rate 0.05 -o ../f1-to-pco-people/data_files/normal.db
+    python f1_server.py --scale 50k --duplicate-rate 0.05 --latency 0.1 --error-rate 0.01
+    F1_BASE_URL=http://localhost:8002 F1_KEY_P=x F1_SECRET_P=x F1_USER=x F1_PASS=x python migrate.py ...
+
+The people are generated the same way make_normal_db.py generates them,
+so the same scale, seed and duplicate rate give the people normal.db lists.
+Any credentials are accepted. Requests are counted by endpoint; GET /__stats
+returns the counts and they're printed when the server stops.
+"""
+import argparse
+import json
+import random
+import re
+import secrets
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from synthetic import ANNIVERSARY_ATTRIBUTE, ATTRIBUTES, FIELD_DEFINITIONS, SCALES, generate_people
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--host", dest="host", default="127.0.0.1")
+parser.add_argument("--port", dest="port", type=int, default=8002)
+parser.add_argument("--scale", dest="scale", choices=SCALES.keys(), default="1k",
+                    help="Number of synthetic people to generate")
+parser.add_argument("-n", "--people", dest="people", type=int,
+                    help="Generate exactly this many people instead of --scale")
+parser.add_argument("--duplicate-rate", dest="duplicate_rate", type=float, default=0.05,
+                    help="Fraction of people that duplicate someone earlier")
+parser.add_argument("--seed", dest="seed", type=int, default=0)
+parser.add_argument("--latency", dest="latency", type=float, default=0.0,
+                    help="Seconds added to every response")
+parser.add_argument("--jitter", dest="jitter", type=float, default=0.0,
+                    help="Up to this many seconds are randomly added on top of --latency")
+parser.add_argument("--error-rate", dest="error_rate", type=float, default=0.0,
+                    help="Fraction of requests answered with a 500")
+
+# Ids in a path are replaced so requests are counted by endpoint
+ID_SEGMENT = re.compile(r'/\d+(?=/|\.|$)')
+
+PERSON_PATH = re.compile(r'/v1/People/(\d+)(?:/(Communications|Addresses|Attributes))?\.json')
+
+SEARCH_PATH = '/v1/People/Search.json'
+DEFAULT_RECORDS_PER_PAGE = 20
+MAX_RECORDS_PER_PAGE = 1000
+
+COMMUNICATION_TYPES = {'Mobile Phone': 3, 'Home Phone': 1, 'Email': 4, 'Home Email': 9}
+STATUS_IDS = {'CTG': 110, 'CTB': 111, 'CTB Espanol': 112, 'CTG High School': 113, 'Visitor': 114, 'Member': 115}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Set by main()
+    people = {}
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if url.path == '/__stats':
+            with self.stats_lock:
+                stats = {f"{method} {endpoint}": count for (method, endpoint), count in sorted(self.stats.items())}
+            return self.respond(200, json.dumps(stats))
+
+        with self.stats_lock:
+            self.stats[(method, ID_SEGMENT.sub('/{id}', url.path))] += 1
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if url.path == '/v1/PortalUser/AccessToken':
+            # Tokens aren't checked, so any credentials work
+            tokens = urlencode({'oauth_token': secrets.token_hex(16), 'oauth_token_secret': secrets.token_hex(16)})
+            return self.respond(200, tokens, 'application/x-www-form-urlencoded')
+
+        if self.error_rate and random.random() < self.error_rate:
+            return self.respond(500, json.dumps({'error': 'Injected error'}))
+
+        status, document = route(self.people, url.path, query)
+        self.respond(status, json.dumps(document))
+
+    def respond(self, status, content, content_type='application/json'):
+        content = content.encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def route(people, path, query):
+    """(status, document) for a GET"""
+    if path == SEARCH_PATH:
+        return 200, search(people, query)
+
+    match = PERSON_PATH.fullmatch(path)
+    person = people.get(int(match.group(1))) if match else None
+    if person is None:
+        return 404, {'error': 'Not Found'}
+
+    resource = match.group(2)
+    if resource is None:
+        return 200, {'person': render_person(person)}
+    if resource == 'Communications':
+        return 200, {'communications': {'communication': render_communications(person)}}
+    if resource == 'Addresses':
+        return 200, {'addresses': {'address': render_addresses(person)}}
+    return 200, {'attributes': {'attribute': render_attributes(person)}}
+
+
+def search(people, query):
+    """People Search by id list and/or lastUpdatedDate, paged like F1 pages it"""
+    if query.get('id'):
+        ids = [int(person_id) for person_id in query['id'].split(',') if person_id.strip()]
+        matches = [people[person_id] for person_id in ids if person_id in people]
+    else:
+        matches = list(people.values())
+    if query.get('lastUpdatedDate'):
+        since = query['lastUpdatedDate'][:10]
+        matches = [person for person in matches if person.last_updated.date().isoformat() >= since]
+
+    records_per_page = min(int(query.get('recordsPerPage') or DEFAULT_RECORDS_PER_PAGE), MAX_RECORDS_PER_PAGE)
+    page = max(int(query.get('page') or 1), 1)
+    page_people = matches[(page - 1) * records_per_page:page * records_per_page]
+    pages = -(-len(matches) // records_per_page)
+
+    includes = query.get('include', '').split(',')
+    results = []
+    for person in page_people:
+        result = render_person(person)
+        if 'communications' in includes:
+            result['communications'] = {'communication': render_communications(person)}
+        if 'addresses' in includes:
+            result['addresses'] = {'address': render_addresses(person)}
+        results.append(result)
+
+    return {'results': {
+        '@count': str(len(results)),
+        '@pageNumber': str(page),
+        '@totalRecords': str(len(matches)),
+        '@additionalPages': str(max(pages - page, 0)),
+        'person': results,
+    }}
+
+
+def render_person(person):
+    return {
+        '@id': str(person.id),
+        '@uri': f"/v1/People/{person.id}",
+        '@householdID': str(person.household_id),
+        'firstName': person.first_name,
+        'middleName': person.middle_name or None,
+        'lastName': person.last_name,
+        'goesByName': person.goes_by_name or None,
+        'gender': person.gender,
+        'dateOfBirth': f"{person.birthdate.isoformat()}T00:00:00" if person.birthdate else None,
+        'maritalStatus': person.marital_status,
+        'status': {'@id': str(STATUS_IDS[person.status]), 'name': person.status},
+        'lastUpdatedDate': person.last_updated.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def render_communications(person):
+    communications = [('Telephone', number, type) for number, type in person.phones]
+    communications += [('Email', email, type) for email, type in person.emails]
+    return [{
+        '@id': f"{person.id}{index}",
+        'communicationGeneralType': general_type,
+        'communicationValue': value,
+        'communicationType': {'@id': str(COMMUNICATION_TYPES[type]), 'name': type},
+        'preferred': str(index == 0).lower(),
+    } for index, (general_type, value, type) in enumerate(communications)]
+
+
+def render_addresses(person):
+    return [{
+        '@id': f"{person.id}{index}",
+        'address1': address1,
+        'address2': address2 or None,
+        'address3': None,
+        'city': city,
+        'postalCode': zip,
+        'stProvince': state,
+        'addressType': {'@id': '1', 'name': 'Primary'},
+    } for index, (address1, address2, city, state, zip) in enumerate(person.addresses)]
+
+
+def render_attributes(person):
+    attributes = []
+    for index, (attribute_id, start_date) in enumerate(person.attributes):
+        if attribute_id == ANNIVERSARY_ATTRIBUTE:
+            group, name = 'Personal', 'Wedding Anniversary'
+        else:
+            group, name = 'Ministry', FIELD_DEFINITIONS[ATTRIBUTES[attribute_id]]
+        attributes.append({
+            '@id': f"{person.id}{index}",
+            'attributeGroup': {'@id': '1', 'name': group, 'attribute': {'@id': str(attribute_id), 'name': name}},
+            'startDate': f"{start_date.isoformat()}T00:00:00",
+            'endDate': None,
+            'comment': None,
+            'createdDate': person.last_updated.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+    return attributes
+
+
+def main():
+    args = parser.parse_args()
+
+    count = args.people or SCALES[args.scale]
+    Handler.people = {person.id: person for person in generate_people(count, args.seed, args.duplicate_rate)}
+    Handler.latency = args.latency
+    Handler.jitter = args.jitter
+    Handler.error_rate = args.error_rate
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Serving {len(Handler.people)} people on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for (method, endpoint), count in sorted(Handler.stats.items()):
+            print(f"{count:>8} {method} {endpoint}")
+
+
+if __name__ == '__main__':
+    main()
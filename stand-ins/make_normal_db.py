@@ -0,0 +1,117 @@
+#!/usr/local/bin/python3
+"""Generate a normal.db of synthetic FellowshipOne people
+
+    python make_normal_db.py --scale 50k --duplicate-rate 0.05 -o ../f1-to-pco-people/data_files/normal.db
+
+The people table lists everyone f1_server.py serves when it's run with the
+same scale, seed and duplicate rate. With --fetched the fetched_* tables are
+filled too, the way --bulk-fetch leaves them, so migrate.py -l runs without
+any F1 requests.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from synthetic import ANNIVERSARY_ATTRIBUTE, ATTRIBUTES, SCALES, generate_people
+
+# The migration's own schema for the fetched_* tables
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'f1-to-pco-people'))
+from utils.database import FETCHED_TABLES  # noqa: E402
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-o", "--output", dest="output", default="normal.db")
+parser.add_argument("--scale", dest="scale", choices=SCALES.keys(), default="1k",
+                    help="Number of synthetic people to generate")
+parser.add_argument("-n", "--people", dest="people", type=int,
+                    help="Generate exactly this many people instead of --scale")
+parser.add_argument("--duplicate-rate", dest="duplicate_rate", type=float, default=0.05,
+                    help="Fraction of people that duplicate someone earlier")
+parser.add_argument("--seed", dest="seed", type=int, default=0)
+parser.add_argument("--fetched", dest="fetched", action="store_true",
+                    help="Also fill the fetched_* tables with everyone's details")
+parser.add_argument("--replace", dest="replace", action="store_true",
+                    help="Overwrite the output file if it already exists")
+
+TABLES = """
+    CREATE TABLE people (
+        id INTEGER,
+        household_id INTEGER
+    );
+    CREATE TABLE field_mapping (
+        f1_id INTEGER,
+        pco_id INTEGER,
+        pco_data_type TEXT,
+        f1_field TEXT
+    );
+"""
+
+# Rows inserted per transaction
+BATCH_SIZE = 10000
+
+
+def field_mapping_rows():
+    rows = [(attribute_id, pco_id, 'field_data', 'start_date') for attribute_id, pco_id in ATTRIBUTES.items()]
+    rows.append((ANNIVERSARY_ATTRIBUTE, None, 'wed_anniversary', 'start_date'))
+    return rows
+
+
+def person_rows(person):
+    """(people, fetched_people, fetched_communications, fetched_addresses) rows for a person"""
+    communications = [(person.id, 'Telephone', number, type) for number, type in person.phones]
+    communications += [(person.id, 'Email', email, type) for email, type in person.emails]
+    return (
+        (person.id, person.household_id),
+        (person.id, person.household_id, person.first_name, person.middle_name, person.last_name,
+         person.goes_by_name, person.gender,
+         f"{person.birthdate.isoformat()}T00:00:00" if person.birthdate else None,
+         person.status, person.marital_status, person.last_updated.strftime('%Y-%m-%dT%H:%M:%S')),
+        communications,
+        [(person.id, address1, address2, None, city, zip, state) for address1, address2, city, state, zip in person.addresses],
+    )
+
+
+def write_batch(conn, batch, fetched):
+    conn.executemany("INSERT INTO people VALUES (?, ?)", [rows[0] for rows in batch])
+    if fetched:
+        conn.executemany("INSERT INTO fetched_people VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [rows[1] for rows in batch])
+        conn.executemany("INSERT INTO fetched_communications VALUES (?, ?, ?, ?)", [row for rows in batch for row in rows[2]])
+        conn.executemany("INSERT INTO fetched_addresses VALUES (?, ?, ?, ?, ?, ?, ?)", [row for rows in batch for row in rows[3]])
+    conn.commit()
+
+
+def main():
+    args = parser.parse_args()
+    count = args.people or SCALES[args.scale]
+
+    if os.path.exists(args.output) and os.path.getsize(args.output):
+        if not args.replace:
+            parser.error(f"{args.output} already exists (use --replace to overwrite it)")
+        os.remove(args.output)
+
+    started = time.monotonic()
+    conn = sqlite3.connect(args.output)
+    conn.executescript(TABLES)
+    conn.executescript(FETCHED_TABLES)
+    conn.executemany("INSERT INTO field_mapping VALUES (?, ?, ?, ?)", field_mapping_rows())
+
+    households = set()
+    duplicates = 0
+    batch = []
+    for person in generate_people(count, args.seed, args.duplicate_rate):
+        households.add(person.household_id)
+        duplicates += person.duplicate_of is not None
+        batch.append(person_rows(person))
+        if len(batch) >= BATCH_SIZE:
+            write_batch(conn, batch, args.fetched)
+            batch = []
+    write_batch(conn, batch, args.fetched)
+    conn.close()
+
+    print(f"Wrote {count} people ({duplicates} duplicates) in {len(households)} households "
+          f"to {args.output} in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
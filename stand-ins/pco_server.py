@@ -0,0 +1,487 @@
+#!/usr/local/bin/python3
+"""A local stand-in for the parts of the PCO People v2 API these scripts use
+
+    python pco_server.py --people 50000 --latency 0.05 --rate-limit 100
+    PCO_API_BASE=http://localhost:8001 PCO_KEY=x PCO_SECRET=x python migrate.py ...
+
+People, households and their details are generated from a seed, so every
+run starts from the same data. Requests are counted by endpoint; GET
+/__stats returns the counts and they're printed when the server stops.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from synthetic import FIELD_DEFINITIONS, generate_people
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--host", dest="host", default="127.0.0.1")
+parser.add_argument("--port", dest="port", type=int, default=8001)
+parser.add_argument("-n", "--people", dest="people", type=int, default=1000,
+                    help="Number of synthetic people to generate")
+parser.add_argument("--duplicate-rate", dest="duplicate_rate", type=float, default=0.05,
+                    help="Duplicate rate make_normal_db.py was run with, so the same people are generated")
+parser.add_argument("--overlap", dest="overlap", type=float, default=0.5,
+                    help="Fraction of the synthetic people already in PCO (the rest are left for the migration to create)")
+parser.add_argument("--seed", dest="seed", type=int, default=0)
+parser.add_argument("--latency", dest="latency", type=float, default=0.0,
+                    help="Seconds added to every response")
+parser.add_argument("--jitter", dest="jitter", type=float, default=0.0,
+                    help="Up to this many seconds are randomly added on top of --latency")
+parser.add_argument("--rate-limit", dest="rate_limit", type=int, default=100,
+                    help="Requests allowed per --rate-period before answering 429 (0 turns it off)")
+parser.add_argument("--rate-period", dest="rate_period", type=int, default=20)
+
+# Ids in a path are replaced so requests are counted by endpoint
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+# The related collections a person has, by JSON:API type
+PERSON_DETAILS = {
+    'emails': 'Email',
+    'phone_numbers': 'PhoneNumber',
+    'addresses': 'Address',
+    'field_data': 'FieldDatum',
+}
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+CAMPUSES = ['35350', '35349']
+
+
+class Store:
+    """Every resource the stand-in serves, kept in memory
+
+    Details are indexed by person and people by last name, so a request
+    only touches the records it returns. Updates replace a record's
+    attributes (and a person's detail lists) instead of changing them in
+    place, so requests can filter and render what they've looked up
+    without holding the lock.
+    """
+
+    def __init__(self):
+        self.people = {}
+        self.households = {}
+        self.field_definitions = {}
+        self.details = {name: {} for name in PERSON_DETAILS}
+        self.person_detail_ids = {name: {} for name in PERSON_DETAILS}
+        self.last_names = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def generate(cls, count, overlap=0.5, seed=0, duplicate_rate=0.0):
+        """Seed a store with the synthetic people (only overlap of them are kept)"""
+        store = cls()
+        rand = random.Random(seed)
+        for definition_id, name in FIELD_DEFINITIONS.items():
+            store.field_definitions[str(definition_id)] = {
+                'type': 'FieldDefinition',
+                'id': str(definition_id),
+                'attributes': {'name': name, 'data_type': 'date', 'slug': None, 'tab_id': 1},
+            }
+
+        for person in generate_people(count, seed, duplicate_rate):
+            if person.duplicate_of or rand.random() >= overlap:
+                continue
+
+            person_id = store.add_person({
+                'first_name': person.goes_by_name or person.first_name,
+                'given_name': person.first_name if person.goes_by_name else None,
+                'last_name': person.last_name,
+                'birthdate': person.birthdate.isoformat() if person.birthdate else None,
+                'gender': person.gender[0],
+                'status': rand.choice(['active', 'active', 'inactive']),
+            }, campus=rand.choice(CAMPUSES + [None]))
+
+            # Leave some details off so the migration has something to add
+            for number, _ in person.phones[:1]:
+                store.add_detail('phone_numbers', person_id, {'number': number, 'location': 'Mobile'})
+            for address, _ in person.emails[:1]:
+                store.add_detail('emails', person_id, {'address': address, 'location': 'Home'})
+            for street, street2, city, state, zip in person.addresses:
+                store.add_detail('addresses', person_id, {'street': f"{street} {street2}".strip(), 'city': city,
+                                                          'state': state, 'zip': zip, 'location': 'Home'})
+
+            household_id = str(person.household_id)
+            household = store.households.setdefault(household_id, {
+                'type': 'Household',
+                'id': household_id,
+                'attributes': {'name': f"{person.last_name} Household", 'member_count': 0, 'updated_at': now()},
+                'people': [],
+            })
+            household['people'].append(person_id)
+            household['attributes']['member_count'] += 1
+        return store
+
+    def next_id(self):
+        return str(next(self.ids))
+
+    def add_person(self, attributes, campus=None):
+        person_id = self.next_id()
+        stamp = now()
+        self.people[person_id] = {
+            'type': 'Person',
+            'id': person_id,
+            'attributes': dict({'given_name': None, 'birthdate': None, 'gender': None, 'status': 'active',
+                                'anniversary': None, 'created_at': stamp, 'updated_at': stamp}, **attributes),
+            'campus': campus,
+        }
+        self.index_last_name(person_id, None, self.people[person_id]['attributes'].get('last_name'))
+        return person_id
+
+    def update_person(self, person, attributes):
+        previous = person['attributes'].get('last_name')
+        person['attributes'] = dict(person['attributes'], **attributes, updated_at=now())
+        self.index_last_name(person['id'], previous, person['attributes'].get('last_name'))
+
+    def index_last_name(self, person_id, previous, last_name):
+        if previous == last_name and previous is not None:
+            return
+        if previous is not None:
+            key = previous.lower()
+            self.last_names[key] = [other for other in self.last_names.get(key, []) if other != person_id]
+        if last_name is not None:
+            key = last_name.lower()
+            self.last_names[key] = self.last_names.get(key, []) + [person_id]
+
+    def add_detail(self, collection, person_id, attributes, relationships=None):
+        detail_id = self.next_id()
+        self.details[collection][detail_id] = {
+            'type': PERSON_DETAILS[collection],
+            'id': detail_id,
+            'attributes': dict(attributes, created_at=now(), updated_at=now()),
+            'person_id': person_id,
+            'relationships': relationships or {},
+        }
+        detail_ids = self.person_detail_ids[collection]
+        detail_ids[person_id] = detail_ids.get(person_id, ()) + (detail_id,)
+        self.touch(person_id)
+        return detail_id
+
+    def update_detail(self, detail, attributes):
+        detail['attributes'] = dict(detail['attributes'], **attributes, updated_at=now())
+        self.touch(detail['person_id'])
+
+    def touch(self, person_id):
+        if person_id in self.people:
+            person = self.people[person_id]
+            person['attributes'] = dict(person['attributes'], updated_at=now())
+
+    def person_details(self, person_id, collection):
+        details = self.details[collection]
+        return [details[detail_id] for detail_id in self.person_detail_ids[collection].get(person_id, ())]
+
+    def find_people(self, query):
+        """The people a query could match (narrowed by where[last_name] when it's given)"""
+        with self.lock:
+            if 'where[last_name]' in query:
+                return [self.people[person_id] for person_id in self.last_names.get(query['where[last_name]'].lower(), [])]
+            return list(self.people.values())
+
+    def render_person(self, person):
+        relationships = {
+            collection: {'data': [{'type': detail['type'], 'id': detail['id']} for detail in self.person_details(person['id'], collection)]}
+            for collection in PERSON_DETAILS
+        }
+        relationships['primary_campus'] = {'data': {'type': 'Campus', 'id': person['campus']} if person['campus'] else None}
+        return {'type': 'Person', 'id': person['id'], 'attributes': person['attributes'], 'relationships': relationships}
+
+    def render_detail(self, detail):
+        return {'type': detail['type'], 'id': detail['id'], 'attributes': detail['attributes'],
+                'relationships': dict(detail['relationships'], person={'data': {'type': 'Person', 'id': detail['person_id']}})}
+
+    def render_household(self, household):
+        members = [{'type': 'Person', 'id': person_id} for person_id in household['people']]
+        return {'type': 'Household', 'id': household['id'], 'attributes': household['attributes'],
+                'relationships': {'people': {'data': members},
+                                  'primary_contact': {'data': members[0] if members else None}}}
+
+
+class RateLimiter:
+    """A fixed window of requests, reported with PCO's rate limit headers"""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.window = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        """(allowed, count in this window, seconds until the next window)"""
+        with self.lock:
+            now = time.monotonic()
+            window = int(now // self.period)
+            if window != self.window:
+                self.window = window
+                self.count = 0
+            self.count += 1
+            retry_after = int(self.period - now % self.period) + 1
+            return not self.limit or self.count <= self.limit, self.count, retry_after
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Set by main()
+    store = None
+    limiter = None
+    latency = 0.0
+    jitter = 0.0
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+        if path == '/__stats':
+            with self.stats_lock:
+                stats = {f"{method} {endpoint}": count for (method, endpoint), count in sorted(self.stats.items())}
+            return self.respond(200, stats)
+
+        with self.stats_lock:
+            self.stats[(method, ID_SEGMENT.sub('/{id}', path))] += 1
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        allowed, count, retry_after = self.limiter.take()
+        headers = {
+            'X-PCO-API-Request-Rate-Limit': str(self.limiter.limit or 1000000),
+            'X-PCO-API-Request-Rate-Period': str(self.limiter.period),
+            'X-PCO-API-Request-Rate-Count': str(count),
+        }
+        if not allowed:
+            headers['Retry-After'] = str(retry_after)
+            return self.respond(429, errors('429', 'Too Many Requests'), headers)
+
+        try:
+            status, document = route(self.store, method, path, query, body, f"http://{self.headers.get('Host')}")
+        except (KeyError, ValueError) as e:
+            status, document = 400, errors('400', f"Bad request: {e}")
+        self.respond(status, document, headers)
+
+    def respond(self, status, document, headers=None):
+        content = json.dumps(document).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/vnd.api+json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def route(store, method, path, query, body, base_url=''):
+    """(status, JSON:API document) for a request
+
+    The store's lock is only held to look records up and change them.
+    Filtering, paging and rendering happen outside it.
+    """
+    parts = path.strip('/').split('/')
+    if parts[:2] != ['people', 'v2'] or len(parts) < 3:
+        return 404, errors('404', 'Not Found')
+    collection, rest = parts[2], parts[3:]
+    attributes = (body.get('data') or {}).get('attributes') or {}
+    includes = [include for include in query.get('include', '').split(',') if include]
+    url = base_url + path
+
+    if collection == 'people':
+        if not rest:
+            if method == 'POST':
+                with store.lock:
+                    person = store.people[store.add_person(attributes)]
+                return 201, {'data': store.render_person(person), 'included': [], 'meta': {}}
+            people = filter_records(store.find_people(query), query, store)
+            return 200, page(people, query, url, store.render_person,
+                             lambda person: person_includes(store, person['id'], includes))
+
+        with store.lock:
+            person = store.people.get(rest[0])
+            if person is not None and len(rest) == 1 and method == 'PATCH':
+                store.update_person(person, attributes)
+        if person is None:
+            return 404, errors('404', 'Not Found')
+
+        if len(rest) == 1:
+            return 200, {'data': store.render_person(person), 'included': person_includes(store, person['id'], includes), 'meta': {}}
+
+        detail_collection = rest[1]
+        if detail_collection not in PERSON_DETAILS:
+            return 404, errors('404', 'Not Found')
+        if method == 'POST':
+            relationships = {}
+            if detail_collection == 'field_data':
+                definition_id = str(attributes.pop('field_definition_id'))
+                relationships['field_definition'] = {'data': {'type': 'FieldDefinition', 'id': definition_id}}
+            with store.lock:
+                detail = store.details[detail_collection][store.add_detail(detail_collection, person['id'], attributes, relationships)]
+            return 201, {'data': store.render_detail(detail), 'included': [], 'meta': {}}
+        details = filter_records(store.person_details(person['id'], detail_collection), query)
+        return 200, page(details, query, url, store.render_detail)
+
+    if collection in PERSON_DETAILS:
+        if not rest:
+            with store.lock:
+                details = list(store.details[collection].values())
+            return 200, page(filter_records(details, query), query, url, store.render_detail)
+
+        with store.lock:
+            detail = store.details[collection].get(rest[0])
+            if detail is not None and method == 'PATCH':
+                store.update_detail(detail, attributes)
+        if detail is None:
+            return 404, errors('404', 'Not Found')
+        return 200, {'data': store.render_detail(detail), 'included': [], 'meta': {}}
+
+    if collection == 'households':
+        if rest:
+            household = store.households.get(rest[0])
+            if household is None:
+                return 404, errors('404', 'Not Found')
+            return 200, {'data': store.render_household(household), 'included': household_includes(store, household, includes), 'meta': {}}
+        households = filter_records(list(store.households.values()), query)
+        return 200, page(households, query, url, store.render_household,
+                         lambda household: household_includes(store, household, includes))
+
+    if collection == 'field_definitions':
+        if rest:
+            definition = store.field_definitions.get(rest[0])
+            if definition is None:
+                return 404, errors('404', 'Not Found')
+            return 200, {'data': definition, 'included': [], 'meta': {}}
+        definitions = list(store.field_definitions.values())
+        return 200, page(filter_records(definitions, query), query, url, lambda definition: definition)
+
+    return 404, errors('404', 'Not Found')
+
+
+def person_includes(store, person_id, includes):
+    return [store.render_detail(detail) for collection in includes if collection in PERSON_DETAILS
+            for detail in store.person_details(person_id, collection)]
+
+
+def household_includes(store, household, includes):
+    if 'people' not in includes:
+        return []
+    return [store.render_person(store.people[person_id]) for person_id in household['people'] if person_id in store.people]
+
+
+def filter_records(records, query, store=None):
+    """Apply where[attribute] and where[attribute][gte|gt|lte|lt] filters to stored records"""
+    for key, value in query.items():
+        match = re.fullmatch(r'where\[(\w+)\](?:\[(\w+)\])?', key)
+        if not match:
+            continue
+        attribute, operator = match.groups()
+
+        if attribute == 'search_name_or_email_or_phone_number':
+            records = [record for record in records if matches_search(store, record, value)]
+        elif operator:
+            compare = {'gte': lambda a, b: a >= b, 'gt': lambda a, b: a > b,
+                       'lte': lambda a, b: a <= b, 'lt': lambda a, b: a < b}[operator]
+            records = [record for record in records
+                       if record['attributes'].get(attribute) is not None and compare(str(record['attributes'][attribute]), value)]
+        else:
+            records = [record for record in records if str(record['attributes'].get(attribute) or '').lower() == value.lower()]
+    return records
+
+
+def matches_search(store, record, value):
+    value = value.lower()
+    digits = ''.join(char for char in value if char.isdigit())
+    attributes = record['attributes']
+    name = f"{attributes.get('first_name') or ''} {attributes.get('last_name') or ''}".lower()
+    if value in name:
+        return True
+    if store is None:
+        return False
+    if any(value == (email['attributes']['address'] or '').lower() for email in store.person_details(record['id'], 'emails')):
+        return True
+    return bool(digits) and any(digits[-10:] in ''.join(char for char in phone['attributes']['number'] if char.isdigit())
+                                for phone in store.person_details(record['id'], 'phone_numbers'))
+
+
+def page(records, query, url, render, included_for=None):
+    """A page of records using PCO's per_page/offset paging
+
+    Only the records on the page are rendered. links.next keeps the rest of
+    the query string, the way the real API's does."""
+    per_page = min(int(query.get('per_page', DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+    offset = int(query.get('offset', 0))
+    on_page = records[offset:offset + per_page]
+    data = [render(record) for record in on_page]
+
+    included = []
+    if included_for:
+        seen = set()
+        for record in on_page:
+            for include in included_for(record):
+                if (include['type'], include['id']) not in seen:
+                    seen.add((include['type'], include['id']))
+                    included.append(include)
+
+    links = {'self': f"{url}?{urlencode(query)}" if query else url}
+    if per_page and offset + per_page < len(records):
+        links['next'] = f"{url}?{urlencode(dict(query, offset=offset + per_page, per_page=per_page))}"
+    return {'data': data, 'included': included, 'links': links,
+            'meta': {'total_count': len(records), 'count': len(data)}}
+
+
+def errors(status, title):
+    return {'errors': [{'status': status, 'title': title}]}
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def main():
+    args = parser.parse_args()
+
+    Handler.store = Store.generate(args.people, args.overlap, args.seed, args.duplicate_rate)
+    Handler.limiter = RateLimiter(args.rate_limit, args.rate_period)
+    Handler.latency = args.latency
+    Handler.jitter = args.jitter
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Serving {len(Handler.store.people)} people in {len(Handler.store.households)} households "
+          f"on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for (method, endpoint), count in sorted(Handler.stats.items()):
+            print(f"{count:>8} {method} {endpoint}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import random
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+               'David', 'Barbara', 'Jose', 'Maria', 'Luis', 'Ana', 'Carlos', 'Rosa', 'Daniel', 'Grace',
+               'Samuel', 'Ruth', 'Joseph', 'Esther', 'Andrew', 'Lydia', 'Peter', 'Hannah', 'Paul', 'Sarah']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson']
+NICKNAMES = {'William': 'Bill', 'Robert': 'Bob', 'Elizabeth': 'Liz', 'Michael': 'Mike', 'Jennifer': 'Jen', 'Joseph': 'Joe'}
+STREETS = ['Myrtle Ave', 'Knickerbocker Ave', 'Wyckoff Ave', 'Cypress Ave', 'Onderdonk Ave', 'Seneca Ave',
+           'Cooper Ave', 'Fresh Pond Rd', 'Central Ave', 'Irving Ave', 'Putnam Ave', 'Linden St']
+CITIES = [('Brooklyn', 'NY', '11237'), ('Brooklyn', 'NY', '11221'), ('Ridgewood', 'NY', '11385'),
+          ('Glendale', 'NY', '11385'), ('Queens', 'NY', '11379')]
+STATUSES = ['CTG', 'CTB', 'CTB Espanol', 'CTG High School', 'Visitor', 'Member']
+
+# The PCO field definitions (and the F1 attributes mapped to them) in data_files/field_mapping.csv
+FIELD_DEFINITIONS = {292971: 'Baptism', 292972: 'Membership', 292973: 'Growth Track', 309087: 'Serving',
+                     301971: 'Starting Point', 301972: 'Next Steps', 302542: 'Volunteer', 345185: 'Retreat'}
+ATTRIBUTES = {901560: 292971, 901561: 292972, 901562: 292973, 901563: 309087, 263915: 345185,
+              697673: 301972, 829215: 302542, 789919: 301971}
+ANNIVERSARY_ATTRIBUTE = 297426
+
+# The sizes make_normal_db.py and the stand-ins are usually run at
+SCALES = {'1k': 1000, '50k': 50000, '500k': 500000}
+
+Person = namedtuple('Person', ['id', 'household_id', 'first_name', 'middle_name', 'last_name', 'goes_by_name',
+                               'gender', 'birthdate', 'status', 'marital_status', 'last_updated',
+                               'phones', 'emails', 'addresses', 'attributes', 'duplicate_of'])
+
+
+def generate_people(count, seed=0, duplicate_rate=0.0, first_id=10000000):
+    """Yield count reproducible people, some of them duplicates of earlier ones
+
+    Households get one to six members who share a last name and an address.
+    A duplicate repeats an earlier person's name with one of their details
+    (birthdate, email, phone or address), the way F1 duplicates look.
+
+    :param count: how many people to make
+    :type count: int
+    :param seed: the random seed, so the same arguments give the same people
+    :type seed: int
+    :param duplicate_rate: the fraction of people that duplicate someone earlier
+    :type duplicate_rate: float
+    :param first_id: the id given to the first person
+    :type first_id: int"""
+    rand = random.Random(seed)
+    recent = []
+    household = None
+    for index in range(count):
+        person_id = first_id + index
+
+        if recent and rand.random() < duplicate_rate:
+            person = duplicate(rand, rand.choice(recent), person_id)
+        else:
+            if household is None or household['left'] == 0:
+                city, state, zip = rand.choice(CITIES)
+                household = {
+                    'id': first_id // 2 + index,
+                    'last_name': rand.choice(LAST_NAMES),
+                    'address': (f"{rand.randint(1, 2500)} {rand.choice(STREETS)}", rand.choice(['', '', f"Apt {rand.randint(1, 6)}"]),
+                                city, state, zip),
+                    'left': rand.randint(1, 6),
+                }
+            household['left'] -= 1
+            person = new_person(rand, person_id, household)
+
+        recent.append(person)
+        del recent[:-1000]
+        yield person
+
+
+def new_person(rand, person_id, household):
+    first_name = rand.choice(FIRST_NAMES)
+    last_name = household['last_name']
+    birthdate = date(1935, 1, 1) + timedelta(days=rand.randint(0, 365 * 85))
+    last_updated = datetime(2005, 1, 1) + timedelta(seconds=rand.randint(0, 15 * 365 * 86400))
+
+    phones = [(f"({rand.choice(['718', '347', '917'])}) {rand.randint(200, 999)}-{rand.randint(0, 9999):04}", rand.choice(['Mobile Phone', 'Home Phone']))
+              for _ in range(rand.choice([0, 1, 1, 2]))]
+    emails = [(f"{first_name}.{last_name}{rand.randint(1, 999)}@example.com".lower(), rand.choice(['Email', 'Home Email']))
+              for _ in range(rand.choice([0, 1, 1, 1, 2]))]
+    attributes = [(attribute_id, (last_updated - timedelta(days=rand.randint(0, 2000))).date())
+                  for attribute_id in rand.sample(list(ATTRIBUTES), rand.randint(0, 3))]
+    marital_status = rand.choice(['Married', 'Single', 'Widowed', None])
+    if marital_status == 'Married':
+        attributes.append((ANNIVERSARY_ATTRIBUTE, date(1960, 1, 1) + timedelta(days=rand.randint(0, 365 * 60))))
+
+    return Person(
+        id=person_id,
+        household_id=household['id'],
+        first_name=first_name,
+        middle_name=rand.choice(['', '', 'A', 'Lynn', 'Jose']),
+        last_name=last_name,
+        goes_by_name=NICKNAMES.get(first_name, '') if rand.random() < 0.3 else '',
+        gender=rand.choice(['Male', 'Female']),
+        birthdate=birthdate if rand.random() < 0.85 else None,
+        status=rand.choice(STATUSES),
+        marital_status=marital_status,
+        last_updated=last_updated,
+        phones=phones,
+        emails=emails,
+        addresses=[household['address']] if rand.random() < 0.9 else [],
+        attributes=attributes,
+        duplicate_of=None,
+    )
+
+
+def duplicate(rand, original, person_id):
+    # Keep the name and one identifying detail, drop the rest
+    kept = rand.choice([kind for kind in ['birthdate', 'phones', 'emails', 'addresses'] if getattr(original, kind)] or ['birthdate'])
+    return original._replace(
+        id=person_id,
+        birthdate=original.birthdate if kept == 'birthdate' else None,
+        phones=original.phones if kept == 'phones' else [],
+        emails=original.emails if kept == 'emails' else [],
+        addresses=original.addresses if kept == 'addresses' else [],
+        attributes=[],
+        duplicate_of=original.id,
+    )